@@ -0,0 +1,12 @@
+-- GuideSphere - Banco de preguntas pregenerado (scripts/build_question_bank)
+--
+-- Al regenerar el banco de un material, las preguntas que ya usó algún
+-- examen (exam_instance_questions.bank_id) no se pueden borrar: se retiran.
+-- /exams/generate solo sortea entre las activas.
+ALTER TABLE question_bank ADD COLUMN IF NOT EXISTS retired_at TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_question_bank_material_active
+  ON question_bank (material_id) WHERE retired_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_exam_instance_questions_bank
+  ON exam_instance_questions (bank_id);
@@ -0,0 +1,23 @@
+-- GuideSphere - Caché persistente de preguntas generadas (services/question_set_cache)
+--
+-- Una fila por (hash del texto, nº de preguntas, modelo, versión del prompt):
+-- regenerar el examen de un documento sin cambios es una consulta, no otra
+-- llamada al modelo. Las filas sin uso en EVAL_QSET_CACHE_DAYS días, o las
+-- que pasan de EVAL_QSET_CACHE_MAX, se borran (las menos usadas recientemente).
+CREATE TABLE IF NOT EXISTS question_set_cache (
+  key            TEXT PRIMARY KEY,          -- = fingerprint de la generación
+  text_sha256    CHAR(64) NOT NULL,
+  question_count SMALLINT NOT NULL,
+  model          TEXT NOT NULL,
+  prompt_version TEXT NOT NULL,
+  result         JSONB NOT NULL,
+  hits           INT NOT NULL DEFAULT 0,
+  created_at     TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  last_used_at   TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_question_set_cache_last_used
+  ON question_set_cache (last_used_at);
+
+-- Huella de la generación con la que se armó cada quiz
+ALTER TABLE quiz ADD COLUMN IF NOT EXISTS fingerprint TEXT;
@@ -0,0 +1,11 @@
+-- GuideSphere - Resumen materializado del panel de administración
+--
+-- Una sola fila con el resultado de /admin/stats/overview; la recalcula
+-- services/admin_stats cada EVAL_ADMIN_STATS_REFRESH_SEC segundos o
+-- POST /admin/stats/refresh. El panel solo lee esta fila.
+CREATE TABLE IF NOT EXISTS admin_stats_snapshot (
+  id           SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+  data         JSONB NOT NULL,
+  refreshed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  duration_ms  INT
+);
@@ -0,0 +1,42 @@
+-- GuideSphere - Agregados de calificación por curso (repositories/rating_repo)
+--
+-- Suma y número de calificaciones por curso, para no recorrer course_rating
+-- en cada vista de curso. Los mantiene la misma transacción que hace el
+-- upsert de POST /course-rating/{course_id}; los borrados (en cascada al
+-- eliminar un usuario) los descuenta el trigger de abajo.
+CREATE TABLE IF NOT EXISTS course_rating_stats (
+  course_id    UUID PRIMARY KEY REFERENCES course(id) ON DELETE CASCADE,
+  rating_sum   BIGINT NOT NULL DEFAULT 0,
+  rating_count INT NOT NULL DEFAULT 0,
+  updated_at   TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Carga inicial (y reconciliación: se puede volver a ejecutar)
+INSERT INTO course_rating_stats (course_id, rating_sum, rating_count)
+SELECT course_id, SUM(rating), COUNT(*)
+FROM course_rating
+GROUP BY course_id
+ON CONFLICT (course_id) DO UPDATE
+  SET rating_sum = EXCLUDED.rating_sum,
+      rating_count = EXCLUDED.rating_count,
+      updated_at = NOW();
+UPDATE course_rating_stats s
+SET rating_sum = 0, rating_count = 0, updated_at = NOW()
+WHERE rating_count <> 0
+  AND NOT EXISTS (SELECT 1 FROM course_rating r WHERE r.course_id = s.course_id);
+
+CREATE OR REPLACE FUNCTION course_rating_stats_on_delete() RETURNS trigger AS $$
+BEGIN
+  UPDATE course_rating_stats
+  SET rating_sum = rating_sum - OLD.rating,
+      rating_count = rating_count - 1,
+      updated_at = NOW()
+  WHERE course_id = OLD.course_id;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_course_rating_stats_delete ON course_rating;
+CREATE TRIGGER trg_course_rating_stats_delete
+  AFTER DELETE ON course_rating
+  FOR EACH ROW EXECUTE FUNCTION course_rating_stats_on_delete();
@@ -0,0 +1,7 @@
+-- GuideSphere - Paginación por cursor de GET /certificates/me
+--
+-- Los certificados de un usuario se recorren por (issued_at, id)
+-- descendente (ver repositories/certificate_repo); este índice sirve la
+-- página y el ETag (máximo issued_at y cantidad) sin leer la tabla.
+CREATE INDEX IF NOT EXISTS idx_course_certificate_user_issued
+  ON course_certificate (user_id, issued_at DESC, id DESC);
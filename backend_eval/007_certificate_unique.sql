@@ -0,0 +1,30 @@
+-- GuideSphere - Un certificado por (user_id, course_id)
+--
+-- La emisión (repositories/certificate_repo.issue_certificate) es un solo
+-- INSERT ... ON CONFLICT (user_id, course_id) DO NOTHING, que necesita un
+-- índice único en ese par. El esquema principal ya trae la restricción
+-- course_certificate_user_id_course_id_key; esto la asegura en bases que no
+-- la tengan (quedándose con el certificado más antiguo si hubiera repetidos).
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1
+    FROM pg_index i
+    WHERE i.indrelid = 'course_certificate'::regclass
+      AND i.indisunique
+      AND i.indnkeyatts = 2
+      AND (SELECT array_agg(a.attname::text ORDER BY a.attname)
+           FROM pg_attribute a
+           WHERE a.attrelid = i.indrelid AND a.attnum = ANY (i.indkey))
+          = ARRAY['course_id', 'user_id']
+  ) THEN
+    DELETE FROM course_certificate cc
+    USING course_certificate older
+    WHERE older.user_id = cc.user_id
+      AND older.course_id = cc.course_id
+      AND (older.issued_at, older.id) < (cc.issued_at, cc.id);
+
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_course_certificate_user_course
+      ON course_certificate (user_id, course_id);
+  END IF;
+END $$;
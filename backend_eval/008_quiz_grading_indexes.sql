@@ -0,0 +1,8 @@
+-- GuideSphere - Índices para leer y corregir quizzes
+--
+-- load_quiz y la corrección en una sentencia de POST /exam/submit
+-- (repositories/exam_repo.grade_and_record_attempt) recorren las preguntas
+-- de un quiz y las opciones de cada pregunta; sin estos índices cada
+-- submit lee quiz_question y quiz_option completas.
+CREATE INDEX IF NOT EXISTS idx_quiz_question_quiz ON quiz_question (quiz_id);
+CREATE INDEX IF NOT EXISTS idx_quiz_option_question ON quiz_option (question_id);
@@ -1,6 +1,25 @@
 # backend_eval/db.py
+"""
+Pool de conexiones asyncpg compartido por todo backend_eval.
+
+El pool se crea una sola vez en el arranque (lifespan de FastAPI en main.py)
+y los routers lo usan a través de la dependencia `get_conn`. El código que no
+es un handler (repositorios, servicios) usa `acquire()`.
+
+Configuración por entorno:
+  - EVAL_DB_DSN / DATABASE_URL / DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASS
+  - EVAL_DB_POOL_MIN               (por defecto 2)
+  - EVAL_DB_POOL_MAX               (por defecto 10)
+  - EVAL_DB_ACQUIRE_TIMEOUT        (segundos, por defecto 10)
+  - EVAL_DB_STATEMENT_CACHE_SIZE   (por defecto 100; 0 si hay pgbouncer en modo transaction)
+"""
+import asyncio
 import os
-import asyncpg  # si ya está importado, no lo dupliques
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import asyncpg
+from fastapi import HTTPException
 
 DB_HOST = os.getenv("DB_HOST", "db")
 DB_PORT = int(os.getenv("DB_PORT", "5432"))
@@ -8,8 +27,91 @@ DB_NAME = os.getenv("DB_NAME", "guidesphere")
 DB_USER = os.getenv("DB_USER", "postgres")
 DB_PASS = os.getenv("DB_PASS", "postgres")
 
-DB_DSN = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+DEFAULT_DSN = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+DB_DSN = os.getenv(
+    "EVAL_DB_DSN",
+    os.getenv("DATABASE_URL", DEFAULT_DSN),
+)
+
+POOL_MIN_SIZE = int(os.getenv("EVAL_DB_POOL_MIN", "2"))
+POOL_MAX_SIZE = int(os.getenv("EVAL_DB_POOL_MAX", "10"))
+ACQUIRE_TIMEOUT = float(os.getenv("EVAL_DB_ACQUIRE_TIMEOUT", "10"))
+STATEMENT_CACHE_SIZE = int(os.getenv("EVAL_DB_STATEMENT_CACHE_SIZE", "100"))
+
+_pool: Optional[asyncpg.Pool] = None
+
+
+async def init_pool() -> asyncpg.Pool:
+    """Crea el pool global (idempotente)."""
+    global _pool
+    if _pool is None:
+        _pool = await asyncpg.create_pool(
+            dsn=DB_DSN,
+            min_size=POOL_MIN_SIZE,
+            max_size=POOL_MAX_SIZE,
+            statement_cache_size=STATEMENT_CACHE_SIZE,
+        )
+    return _pool
+
+
+async def close_pool() -> None:
+    """Cierra el pool global, si existe."""
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.close()
+
+
+def get_pool() -> asyncpg.Pool:
+    if _pool is None:
+        raise RuntimeError("El pool de PostgreSQL no está inicializado.")
+    return _pool
+
+
+def _saturated() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Base de datos saturada, intenta de nuevo en unos segundos.",
+    )
+
+
+@asynccontextmanager
+async def acquire() -> AsyncIterator[asyncpg.Connection]:
+    """
+    Toma una conexión del pool y la devuelve al salir.
+    Si el pool está agotado más de ACQUIRE_TIMEOUT segundos, lanza 503.
+    """
+    pool = get_pool()
+    try:
+        conn = await pool.acquire(timeout=ACQUIRE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise _saturated()
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
+
+
+async def get_conn() -> AsyncIterator[asyncpg.Connection]:
+    """
+    Dependencia FastAPI: una conexión del pool por request (ver acquire).
+    """
+    async with acquire() as conn:
+        yield conn
 
 
-async def get_connection():
-    return await asyncpg.connect(dsn=DB_DSN)
+def pool_stats() -> Dict[str, object]:
+    """Estado del pool para /health."""
+    if _pool is None:
+        return {"initialized": False}
+    return {
+        "initialized": True,
+        "size": _pool.get_size(),
+        "idle": _pool.get_idle_size(),
+        "in_use": _pool.get_size() - _pool.get_idle_size(),
+        "min_size": _pool.get_min_size(),
+        "max_size": _pool.get_max_size(),
+        "acquire_timeout": ACQUIRE_TIMEOUT,
+        "statement_cache_size": STATEMENT_CACHE_SIZE,
+    }
@@ -1,4 +1,6 @@
 # backend_eval/main.py
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -7,11 +9,48 @@ from routers.exam_fixed import router as exam_fixed_router
 from routers.exam_from_document import router as exam_from_document_router
 from routers.exam_from_video import router as exam_from_video_router
 from routers.exam_view import router as exam_view_router
+from routers.exam_jobs import router as exam_jobs_router
 from routers.course_rating import router as course_rating_router
 from routers.certificates import router as certificates_router
 from routers.admin_stats import router as admin_stats_router
+from routers.admin_schema import router as admin_schema_router
+from routers.admin_question_bank import router as admin_question_bank_router
+from db import init_pool, close_pool, pool_stats
+from repositories.certificate_repo import email_user_cache
+from repositories.rating_repo import rating_cache
+from services.admin_stats import admin_stats
+from services.quiz_cache import quiz_cache
+from services.schema_registry import schema_registry
+from services.jobs import job_manager
+from services.doc_reader import shutdown_pdf_pool
+from services.openai_client import openai_client
+from services.question_set_cache import question_set_cache
+from services.text_cache import text_cache
+from services.transcription_pool import transcription_pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Un único pool de PostgreSQL para todos los routers
+    await init_pool()
+    # Qué tablas opcionales existen: se sondea una vez aquí, no por request
+    await schema_registry.refresh()
+    # Procesos de transcripción (Whisper) fuera del event loop
+    transcription_pool.start()
+    # Resumen del panel de administración, recalculado en segundo plano
+    admin_stats.start()
+    try:
+        yield
+    finally:
+        await admin_stats.stop()
+        await job_manager.shutdown()
+        transcription_pool.shutdown()
+        shutdown_pdf_pool()
+        await openai_client.close()
+        await close_pool()
+
 
-app = FastAPI(title="GuideSphere Eval API")
+app = FastAPI(title="GuideSphere Eval API", lifespan=lifespan)
 
 # CORS abierto para desarrollo
 app.add_middleware(
@@ -25,7 +64,19 @@ app.add_middleware(
 
 @app.get("/health")
 async def health():
-    return {"ok": True}
+    return {
+        "ok": True,
+        "db_pool": pool_stats(),
+        "quiz_cache": quiz_cache.stats(),
+        "jobs": job_manager.stats(),
+        "text_cache": text_cache.stats(),
+        "transcription": transcription_pool.stats(),
+        "openai": openai_client.stats(),
+        "question_set_cache": question_set_cache.stats(),
+        "admin_stats": admin_stats.stats(),
+        "rating_cache": rating_cache.stats(),
+        "email_user_cache": email_user_cache.stats(),
+    }
 
 # Routers principales
 app.include_router(evaluations.router)
@@ -33,6 +84,7 @@ app.include_router(exams.router)
 app.include_router(exam_fixed_router)
 app.include_router(exam_from_document_router)
 app.include_router(exam_from_video_router)
+app.include_router(exam_jobs_router)
 app.include_router(exam_view_router)
 
 # ⚠️ Usamos SOLO el submit viejo que el frontend entiende
@@ -43,4 +95,6 @@ app.include_router(exam_submit.router)
 app.include_router(course_rating_router)
 app.include_router(certificates_router)
 app.include_router(admin_stats_router)
+app.include_router(admin_schema_router)
+app.include_router(admin_question_bank_router)
 
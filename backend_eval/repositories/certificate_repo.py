@@ -0,0 +1,163 @@
+# backend_eval/repositories/certificate_repo.py
+"""
+Certificados de curso: emisión al aprobar y lecturas de GET /certificates/me.
+
+- issue_certificate emite con un solo INSERT ... ON CONFLICT DO NOTHING
+  sobre el índice único (user_id, course_id) (007_certificate_unique.sql):
+  dos submits aprobados a la vez no pueden duplicar el certificado.
+
+- Paginación por cursor sobre (issued_at, id) descendente, con el índice
+  de 006_certificates_keyset.sql: cada página cuesta lo mismo sin importar
+  cuántos certificados haya antes.
+- La versión de la lista (último issued_at y cantidad) alimenta el ETag:
+  se obtiene del índice y permite responder 304 sin armar la página.
+- Caché email → user_id para los clientes que solo mandan X-User-Email.
+
+Configuración por entorno:
+  - EVAL_EMAIL_CACHE_SIZE   (entradas, por defecto 1024)
+  - EVAL_EMAIL_CACHE_TTL    (segundos, por defecto 300)
+"""
+import base64
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import asyncpg
+
+from services.ttl_cache import TTLCache
+from services.schema_registry import schema_registry
+
+logger = logging.getLogger(__name__)
+
+EMAIL_CACHE_SIZE = int(os.getenv("EVAL_EMAIL_CACHE_SIZE", "1024"))
+EMAIL_CACHE_TTL = float(os.getenv("EVAL_EMAIL_CACHE_TTL", "300"))
+
+# {email: {"user_id": str}}
+email_user_cache = TTLCache(maxsize=EMAIL_CACHE_SIZE, ttl=EMAIL_CACHE_TTL)
+
+
+async def resolve_user_id(conn: asyncpg.Connection, email: str) -> Optional[str]:
+    """user_id de un email, o None si no existe (lo que no se guarda en caché)."""
+
+    async def load() -> Optional[Dict[str, Any]]:
+        user_id = await conn.fetchval("SELECT id FROM user_account WHERE email = $1", email)
+        return {"user_id": str(user_id)} if user_id else None
+
+    found = await email_user_cache.get_or_load(email, load)
+    return found["user_id"] if found else None
+
+
+async def issue_certificate(
+    conn: asyncpg.Connection,
+    *,
+    user_id: str,
+    content_id: str,
+    attempt_id: str,
+    score_percent: float,
+) -> bool:
+    """
+    Emite el certificado del curso al que pertenece `content_id`, una sola
+    vez por user+course. Devuelve True si lo creó ahora; False si ya lo
+    tenía, si el contenido no pertenece a un curso o si no hay tabla.
+
+    Corre en un savepoint: un error de la base se registra y devuelve False
+    sin abortar la transacción del submit (el intento se guarda igual).
+    """
+    if not await schema_registry.table_exists("course_certificate", conn):
+        return False
+    try:
+        async with conn.transaction():
+            cert_id = await conn.fetchval(
+                """
+                INSERT INTO course_certificate (user_id, course_id, attempt_id, score_percent)
+                SELECT $1::uuid, ci.course_id, $3::uuid, $4
+                FROM content_item ci
+                WHERE ci.id = $2::uuid AND ci.course_id IS NOT NULL
+                ON CONFLICT (user_id, course_id) DO NOTHING
+                RETURNING id
+                """,
+                user_id, content_id, attempt_id, score_percent,
+            )
+    except asyncpg.PostgresError:
+        logger.exception("No se pudo emitir el certificado (attempt %s)", attempt_id)
+        return False
+    return cert_id is not None
+
+
+# ----- cursor -----
+
+def encode_cursor(issued_at: datetime, cert_id: str) -> str:
+    raw = f"{issued_at.isoformat()}|{cert_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Inverso de encode_cursor; ValueError si el cursor no es válido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        issued_at, cert_id = raw.split("|", 1)
+        return datetime.fromisoformat(issued_at), cert_id
+    except Exception as e:
+        raise ValueError("cursor inválido") from e
+
+
+# ----- consultas -----
+
+async def certificates_version(
+    conn: asyncpg.Connection,
+    user_id: str,
+) -> Tuple[Optional[datetime], int]:
+    """(issued_at más reciente, cantidad) de los certificados del usuario."""
+    row = await conn.fetchrow(
+        """
+        SELECT MAX(issued_at) AS newest, COUNT(*) AS total
+        FROM course_certificate
+        WHERE user_id = $1
+        """,
+        user_id,
+    )
+    return row["newest"], int(row["total"])
+
+
+async def certificates_page(
+    conn: asyncpg.Connection,
+    user_id: str,
+    *,
+    limit: Optional[int],
+    cursor: Optional[str] = None,
+) -> Tuple[List[asyncpg.Record], Optional[str]]:
+    """
+    Una página de certificados, del más reciente al más antiguo, y el
+    cursor de la siguiente (None si es la última). Sin `limit`, todos.
+    """
+    fetch_limit = None if limit is None else limit + 1  # LIMIT NULL = sin límite
+    if cursor:
+        after_issued, after_id = decode_cursor(cursor)
+        keyset_sql = "AND (cc.issued_at, cc.id) < ($3, $4::uuid)"
+        args: List[Any] = [user_id, fetch_limit, after_issued, after_id]
+    else:
+        keyset_sql = ""
+        args = [user_id, fetch_limit]
+
+    rows = await conn.fetch(
+        f"""
+        SELECT
+          cc.id,
+          cc.course_id,
+          c.title AS course_title,
+          cc.score_percent,
+          cc.issued_at
+        FROM course_certificate cc
+        JOIN course c ON c.id = cc.course_id
+        WHERE cc.user_id = $1 {keyset_sql}
+        ORDER BY cc.issued_at DESC, cc.id DESC
+        LIMIT $2
+        """,
+        *args,
+    )
+    if limit is None or len(rows) <= limit:
+        return list(rows), None
+    rows = rows[:limit]
+    last = rows[-1]
+    return list(rows), encode_cursor(last["issued_at"], str(last["id"]))
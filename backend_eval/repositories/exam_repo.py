@@ -1,43 +1,12 @@
 # backend_eval/repositories/exam_repo.py
-import os
 import uuid
-from typing import List, Dict
+from typing import Any, List, Dict, Optional, Tuple
 
 import asyncpg
 
-# ==========================================================
-# CONFIGURACIÓN DE CONEXIÓN A POSTGRES
-# ==========================================================
-# Prioridad:
-#   1) EVAL_DB_DSN
-#   2) DATABASE_URL
-#   3) Construido desde DB_HOST / DB_PORT / DB_NAME / DB_USER / DB_PASS
-#
-# En Docker:
-#   DB_HOST = db
-#   DB_PORT = 5432
-#   DB_NAME = guidesphere
-#   DB_USER = postgres
-#   DB_PASS = postgres
-# ==========================================================
-
-DB_HOST = os.getenv("DB_HOST", "db")
-DB_PORT = int(os.getenv("DB_PORT", "5432"))
-DB_NAME = os.getenv("DB_NAME", "guidesphere")
-DB_USER = os.getenv("DB_USER", "postgres")
-DB_PASS = os.getenv("DB_PASS", "postgres")
-
-DEFAULT_DSN = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-
-DB_DSN = os.getenv(
-    "EVAL_DB_DSN",
-    os.getenv("DATABASE_URL", DEFAULT_DSN),
-)
-
-
-async def _get_conn():
-    """Crea una conexión nueva a PostgreSQL usando asyncpg."""
-    return await asyncpg.connect(dsn=DB_DSN)
+from db import acquire
+from services.quiz_cache import quiz_cache
+from services.schema_registry import schema_registry
 
 
 # ==========================================================
@@ -54,64 +23,286 @@ async def save_generated_quiz(
     """
     Crea (o reemplaza) el quiz asociado a content_id con las preguntas generadas.
     NO crea content_item; exige que content_id exista en content_item.
-    """
-    quiz_id = str(uuid.uuid4())
-    conn = await _get_conn()
-
-    try:
-        # 0) Validar que el content_id exista
-        exists = await conn.fetchval(
-            "SELECT 1 FROM content_item WHERE id = $1",
-            content_id,
-        )
-        if not exists:
-            raise RuntimeError(f"content_id inexistente: {content_id}")
 
-        # 1) Si ya hay un quiz para ese content_id, reemplazarlo
-        prev_quiz_id = await conn.fetchval(
-            "SELECT id FROM quiz WHERE content_id = $1",
-            content_id,
+    Con la columna quiz.fingerprint (003_question_set_cache.sql) se guarda la
+    huella de la generación; si el quiz actual ya tiene la misma huella (mismo
+    texto, número de preguntas y generador) se deja tal cual.
+    """
+    async with acquire() as conn:
+        has_fingerprint = fingerprint is not None and await schema_registry.column_exists(
+            "quiz", "fingerprint", conn
         )
-        if prev_quiz_id:
-            await conn.execute(
-                "DELETE FROM quiz WHERE id = $1",
-                prev_quiz_id,
+        if has_fingerprint:
+            current = await conn.fetchval(
+                "SELECT id FROM quiz WHERE content_id = $1 AND fingerprint = $2",
+                content_id,
+                fingerprint,
             )
+            if current is not None:
+                return str(current)
 
-        # 2) Crear el nuevo quiz
-        await conn.execute(
-            """
-            INSERT INTO quiz (id, content_id, time_limit_sec, attempts_allowed, randomize_order)
-            VALUES ($1, $2, NULL, 3, FALSE)
-            """,
-            quiz_id,
-            content_id,
-        )
+        # Todo el reemplazo es atómico: o queda el quiz nuevo completo o el anterior
+        async with conn.transaction():
+            quiz_id = await replace_quiz(conn, content_id=content_id, questions=questions)
+            if has_fingerprint:
+                await conn.execute(
+                    "UPDATE quiz SET fingerprint = $2 WHERE id = $1",
+                    quiz_id,
+                    fingerprint,
+                )
 
-        # 3) Insertar preguntas y opciones
-        for q in (questions or []):
-            q_id = str(uuid.uuid4())
-            await conn.execute(
-                "INSERT INTO quiz_question (id, quiz_id, prompt) VALUES ($1, $2, $3)",
-                q_id,
-                quiz_id,
-                q.get("prompt", "") or "",
-            )
+    quiz_cache.invalidate(content_id)
+    return quiz_id
 
-            for opt in q.get("options", []):
-                o_id = str(uuid.uuid4())
-                await conn.execute(
-                    """
-                    INSERT INTO quiz_option (id, question_id, label, is_correct)
-                    VALUES ($1, $2, $3, $4)
-                    """,
-                    o_id,
+
+def _build_quiz_rows(quiz_id: str, questions: List[Dict]) -> tuple[list, list]:
+    """Arma las filas de quiz_question y quiz_option en memoria."""
+    question_rows: list = []
+    option_rows: list = []
+    for q in (questions or []):
+        q_id = str(uuid.uuid4())
+        question_rows.append((q_id, quiz_id, q.get("prompt", "") or ""))
+        for opt in q.get("options", []):
+            option_rows.append(
+                (
+                    str(uuid.uuid4()),
                     q_id,
                     (opt.get("label") or opt.get("text") or ""),
                     bool(opt.get("is_correct")),
                 )
+            )
+    return question_rows, option_rows
 
-        return quiz_id
 
-    finally:
-        await conn.close()
+async def replace_quiz(
+    conn: asyncpg.Connection,
+    *,
+    content_id: str,
+    questions: List[Dict],
+) -> str:
+    """
+    Reemplaza el quiz de content_id usando una conexión ya abierta.
+    Debe llamarse dentro de una transacción (ver save_generated_quiz).
+
+    Preguntas y opciones se escriben con executemany (un solo viaje cada una),
+    así el costo en round trips no crece con el número de preguntas.
+    """
+    quiz_id = str(uuid.uuid4())
+
+    # 0) Validar que el content_id exista
+    exists = await conn.fetchval(
+        "SELECT 1 FROM content_item WHERE id = $1",
+        content_id,
+    )
+    if not exists:
+        raise RuntimeError(f"content_id inexistente: {content_id}")
+
+    # 1) Si ya hay un quiz para ese content_id, reemplazarlo
+    #    (preguntas y opciones se borran en cascada)
+    await conn.execute(
+        "DELETE FROM quiz WHERE content_id = $1",
+        content_id,
+    )
+
+    # 2) Crear el nuevo quiz
+    await conn.execute(
+        """
+        INSERT INTO quiz (id, content_id, time_limit_sec, attempts_allowed, randomize_order)
+        VALUES ($1, $2, NULL, 3, FALSE)
+        """,
+        quiz_id,
+        content_id,
+    )
+
+    # 3) Insertar preguntas y opciones en bloque
+    question_rows, option_rows = _build_quiz_rows(quiz_id, questions)
+    if question_rows:
+        await conn.executemany(
+            "INSERT INTO quiz_question (id, quiz_id, prompt) VALUES ($1, $2, $3)",
+            question_rows,
+        )
+    if option_rows:
+        await conn.executemany(
+            """
+            INSERT INTO quiz_option (id, question_id, label, is_correct)
+            VALUES ($1, $2, $3, $4)
+            """,
+            option_rows,
+        )
+
+    return quiz_id
+
+
+# ==========================================================
+# LECTURA DE QUIZ (con caché compartida)
+# ==========================================================
+async def load_quiz(conn: asyncpg.Connection, content_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Lee el quiz de content_id con preguntas y opciones en una sola consulta.
+
+    Devuelve None si no hay quiz, o:
+        {
+          "quiz_id": str,
+          "questions": [
+            {"id": str, "prompt": str, "correct": str | None,
+             "options": [{"id": str, "text": str, "is_correct": bool}, ...]},
+            ...
+          ]
+        }
+    """
+    rows = await conn.fetch(
+        """
+        SELECT
+          q.id          AS quiz_id,
+          qq.id         AS qid,
+          qq.prompt     AS prompt,
+          qo.id         AS oid,
+          qo.label      AS text,
+          qo.is_correct AS is_correct
+        FROM quiz q
+        LEFT JOIN quiz_question qq ON qq.quiz_id = q.id
+        LEFT JOIN quiz_option   qo ON qo.question_id = qq.id
+        WHERE q.content_id = $1
+        ORDER BY qq.prompt, qo.label
+        """,
+        content_id,
+    )
+    if not rows:
+        return None
+
+    questions: Dict[str, Dict[str, Any]] = {}
+    for r in rows:
+        if r["qid"] is None:
+            continue
+        qid = str(r["qid"])
+        q = questions.get(qid)
+        if q is None:
+            q = questions[qid] = {
+                "id": qid,
+                "prompt": r["prompt"],
+                "correct": None,
+                "options": [],
+            }
+        if r["oid"] is not None:
+            oid = str(r["oid"])
+            is_ok = bool(r["is_correct"])
+            q["options"].append({"id": oid, "text": r["text"], "is_correct": is_ok})
+            if is_ok:
+                q["correct"] = oid
+
+    return {
+        "quiz_id": str(rows[0]["quiz_id"]),
+        "questions": list(questions.values()),
+    }
+
+
+async def get_quiz(
+    content_id: str,
+    conn: Optional[asyncpg.Connection] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Como load_quiz, pero pasando por quiz_cache (no modificar el resultado).
+    Sin `conn`, solo se toma una conexión del pool si hay que ir a la BD.
+    """
+
+    async def _load() -> Optional[Dict[str, Any]]:
+        if conn is not None:
+            return await load_quiz(conn, content_id)
+        async with acquire() as c:
+            return await load_quiz(c, content_id)
+
+    return await quiz_cache.get_or_load(content_id, _load)
+
+
+# ==========================================================
+# INTENTOS: RESPUESTAS EN BLOQUE
+# ==========================================================
+async def insert_exam_answers(
+    conn: asyncpg.Connection,
+    *,
+    attempt_id: str,
+    answer_records: List[Tuple[str, str, bool]],
+) -> None:
+    """
+    Guarda todas las respuestas de un intento con un solo INSERT (unnest).
+    answer_records: [(question_id, option_id, is_correct), ...]
+    """
+    if not answer_records:
+        return
+    await conn.execute(
+        """
+        INSERT INTO exam_answer (id, attempt_id, question_id, option_id, is_correct)
+        SELECT a.id, $1, a.question_id, a.option_id, a.is_correct
+        FROM unnest($2::uuid[], $3::uuid[], $4::uuid[], $5::bool[])
+             AS a(id, question_id, option_id, is_correct)
+        """,
+        attempt_id,
+        [str(uuid.uuid4()) for _ in answer_records],
+        [qid for qid, _, _ in answer_records],
+        [oid for _, oid, _ in answer_records],
+        [is_ok for _, _, is_ok in answer_records],
+    )
+
+
+async def grade_and_record_attempt(
+    conn: asyncpg.Connection,
+    *,
+    attempt_id: str,
+    content_id: str,
+    user_id: Optional[str],
+    answers: Dict[str, str],
+    pass_threshold: float,
+) -> Optional[asyncpg.Record]:
+    """
+    Corrige y guarda un intento con una sola sentencia: las respuestas
+    ({question_id: option_id}) viajan como dos arrays, se cruzan con las
+    opciones del quiz en la BD y en la misma consulta se insertan
+    exam_attempt y exam_answer.
+
+    Solo se guardan respuestas a opciones que existen en esa pregunta (el
+    resto cuenta como incorrecta). Devuelve None si content_id no tiene
+    quiz, o (attempt_id, quiz_id, total, correct, score_percent, passed).
+    """
+    return await conn.fetchrow(
+        """
+        WITH qz AS (
+          SELECT id FROM quiz WHERE content_id = $2::uuid
+        ),
+        qs AS (
+          SELECT qq.id FROM quiz_question qq JOIN qz ON qq.quiz_id = qz.id
+        ),
+        graded AS (
+          SELECT qs.id AS question_id, qo.id AS option_id, qo.is_correct
+          FROM unnest($4::text[], $5::text[]) AS s(question_id, option_id)
+          JOIN qs          ON qs.id::text = s.question_id
+          JOIN quiz_option qo ON qo.question_id = qs.id AND qo.id::text = s.option_id
+        ),
+        totals AS (
+          SELECT (SELECT COUNT(*) FROM qs)                       AS total,
+                 (SELECT COUNT(*) FROM graded WHERE is_correct)  AS correct
+        ),
+        att AS (
+          INSERT INTO exam_attempt (id, user_id, quiz_id, content_id, score_percent, passed)
+          SELECT $1::uuid, $3::uuid, qz.id, $2::uuid,
+                 CASE WHEN t.total > 0 THEN 100.0 * t.correct / t.total ELSE 0 END,
+                 t.total > 0 AND 100.0 * t.correct / t.total >= $6
+          FROM qz, totals t
+          RETURNING id, quiz_id, passed
+        ),
+        ans AS (
+          INSERT INTO exam_answer (id, attempt_id, question_id, option_id, is_correct)
+          SELECT gen_random_uuid(), att.id, g.question_id, g.option_id, g.is_correct
+          FROM graded g, att
+        )
+        SELECT att.id AS attempt_id, att.quiz_id, t.total, t.correct,
+               CASE WHEN t.total > 0 THEN 100.0 * t.correct / t.total ELSE 0 END AS score_percent,
+               att.passed
+        FROM att, totals t
+        """,
+        attempt_id,
+        content_id,
+        user_id,
+        list(answers.keys()),
+        list(answers.values()),
+        pass_threshold,
+    )
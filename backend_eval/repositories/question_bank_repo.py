@@ -0,0 +1,95 @@
+# backend_eval/repositories/question_bank_repo.py
+"""
+Acceso a question_bank (ver 002_question_bank.sql).
+
+El banco de cada material se reemplaza entero y de forma atómica: se borran
+las preguntas activas que ningún examen usó, se retiran las que sí (no se
+pueden borrar por la FK de exam_instance_questions) y se insertan las nuevas.
+"""
+import json
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+
+LETTERS = "ABCD"
+
+
+def bank_rows(material_id: str, topic: str, questions: List[Dict[str, Any]]) -> List[tuple]:
+    """
+    Filas de question_bank para preguntas con el formato de generate_questions.
+    Se omiten las que no tienen exactamente 4 opciones y una sola correcta.
+    """
+    rows: List[tuple] = []
+    for q in questions:
+        options = q.get("options") or []
+        correct = [i for i, o in enumerate(options) if o.get("is_correct")]
+        if len(options) != len(LETTERS) or len(correct) != 1:
+            continue
+        meta = q.get("meta") or {}
+        rows.append((
+            material_id,
+            (topic or "")[:120] or None,
+            int(q.get("difficulty") or 1),
+            q.get("prompt") or "",
+            *[o.get("text") or "" for o in options],
+            LETTERS[correct[0]],
+            json.dumps(meta, ensure_ascii=False),
+        ))
+    return rows
+
+
+async def active_fingerprint(conn: asyncpg.Connection, material_id: str) -> Optional[str]:
+    """Huella del banco activo del material (meta.bank), o None si no tiene."""
+    return await conn.fetchval(
+        """
+        SELECT meta->>'bank'
+        FROM question_bank
+        WHERE material_id = $1::uuid AND retired_at IS NULL
+        LIMIT 1
+        """,
+        material_id,
+    )
+
+
+async def replace_bank(conn: asyncpg.Connection, material_id: str, rows: List[tuple]) -> Dict[str, int]:
+    """
+    Reemplaza las preguntas activas de `material_id` por `rows` (ver bank_rows).
+    Debe llamarse dentro de una transacción.
+    """
+    deleted = await conn.fetchval(
+        """
+        WITH d AS (
+          DELETE FROM question_bank qb
+          WHERE qb.material_id = $1::uuid
+            AND qb.retired_at IS NULL
+            AND NOT EXISTS (
+              SELECT 1 FROM exam_instance_questions eiq WHERE eiq.bank_id = qb.id
+            )
+          RETURNING 1
+        )
+        SELECT count(*) FROM d
+        """,
+        material_id,
+    )
+    retired = await conn.execute(
+        """
+        UPDATE question_bank SET retired_at = NOW()
+        WHERE material_id = $1::uuid AND retired_at IS NULL
+        """,
+        material_id,
+    )
+    if rows:
+        await conn.executemany(
+            """
+            INSERT INTO question_bank
+              (material_id, topic, difficulty, question,
+               option_a, option_b, option_c, option_d, correct, meta)
+            VALUES ($1::uuid, $2, $3, $4, $5, $6, $7, $8, $9, $10::jsonb)
+            """,
+            rows,
+        )
+    return {
+        "deleted": int(deleted or 0),
+        "retired": int(retired.split()[-1]),
+        "inserted": len(rows),
+    }
@@ -0,0 +1,216 @@
+# backend_eval/repositories/rating_repo.py
+"""
+Calificaciones de cursos: upsert y resumen (promedio, cantidad y la
+calificación del usuario).
+
+El promedio sale de course_rating_stats (005_course_rating_stats.sql),
+que guarda suma y cantidad por curso y se actualiza en la misma
+transacción que el upsert. Delante hay una caché en memoria por course_id
+con TTL corto que el upsert invalida. Sin la tabla (migración sin
+aplicar) se calcula con AVG/COUNT como antes.
+
+Configuración por entorno:
+  - EVAL_RATING_CACHE_SIZE   (cursos, por defecto 1024)
+  - EVAL_RATING_CACHE_TTL    (segundos, por defecto 30)
+"""
+import os
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+
+from services.ttl_cache import TTLCache
+from services.schema_registry import schema_registry
+
+RATING_CACHE_SIZE = int(os.getenv("EVAL_RATING_CACHE_SIZE", "1024"))
+RATING_CACHE_TTL = float(os.getenv("EVAL_RATING_CACHE_TTL", "30"))
+
+# {course_id: {"avg_rating": float, "ratings_count": int}}
+rating_cache = TTLCache(maxsize=RATING_CACHE_SIZE, ttl=RATING_CACHE_TTL)
+
+
+def _aggregate(rating_sum: Optional[int], rating_count: Optional[int]) -> Dict[str, Any]:
+    count = int(rating_count or 0)
+    # Redondeo a 2 decimales "hacia arriba" en el medio, como el
+    # AVG(rating)::numeric(3,2) de antes (25/8 = 3.125 -> 3.13)
+    avg = (
+        (Decimal(int(rating_sum or 0)) / count).quantize(Decimal("0.01"), ROUND_HALF_UP)
+        if count else Decimal(0)
+    )
+    return {
+        "avg_rating": float(avg),
+        "ratings_count": count,
+    }
+
+
+async def upsert_rating(
+    conn: asyncpg.Connection,
+    *,
+    user_id: str,
+    course_id: str,
+    rating: int,
+    comment: Optional[str],
+) -> None:
+    """
+    Crea o actualiza la calificación de (user_id, course_id) y ajusta los
+    agregados del curso: una calificación nueva suma 1 a la cantidad; un
+    cambio solo suma la diferencia con la anterior.
+    """
+    if not await schema_registry.table_exists("course_rating_stats", conn):
+        await conn.execute(
+            """
+            INSERT INTO course_rating (user_id, course_id, rating, comment)
+            VALUES ($1, $2, $3, $4)
+            ON CONFLICT (user_id, course_id)
+            DO UPDATE SET rating = EXCLUDED.rating,
+                          comment = EXCLUDED.comment,
+                          updated_at = now()
+            """,
+            user_id, course_id, rating, comment,
+        )
+        rating_cache.invalidate(course_id)
+        return
+
+    async with conn.transaction():
+        # Bloquea la fila de agregados del curso (creándola si hace falta):
+        # las calificaciones concurrentes del mismo curso se aplican de a una
+        # y cada una ve la calificación anterior ya confirmada.
+        await conn.execute(
+            """
+            INSERT INTO course_rating_stats (course_id) VALUES ($1)
+            ON CONFLICT (course_id) DO UPDATE SET updated_at = now()
+            """,
+            course_id,
+        )
+        await conn.execute(
+            """
+            WITH prev AS (
+              SELECT rating FROM course_rating
+              WHERE user_id = $1 AND course_id = $2
+            ),
+            up AS (
+              INSERT INTO course_rating (user_id, course_id, rating, comment)
+              VALUES ($1, $2, $3, $4)
+              ON CONFLICT (user_id, course_id)
+              DO UPDATE SET rating = EXCLUDED.rating,
+                            comment = EXCLUDED.comment,
+                            updated_at = now()
+              RETURNING rating
+            )
+            UPDATE course_rating_stats s
+            SET rating_sum = s.rating_sum + up.rating - COALESCE((SELECT rating FROM prev), 0),
+                rating_count = s.rating_count + CASE WHEN EXISTS (SELECT 1 FROM prev) THEN 0 ELSE 1 END,
+                updated_at = now()
+            FROM up
+            WHERE s.course_id = $2
+            """,
+            user_id, course_id, rating, comment,
+        )
+    rating_cache.invalidate(course_id)
+
+
+async def get_rating_summary(
+    conn: asyncpg.Connection,
+    course_id: str,
+    user_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    {"course_id", "avg_rating", "ratings_count", "user_rating", "user_comment"}.
+
+    Sin el agregado en caché, agregado y calificación del usuario salen de
+    una sola consulta; con él, no hay consulta (o solo la del usuario).
+    """
+    loaded: Dict[str, Any] = {}
+
+    async def load() -> Dict[str, Any]:
+        if await schema_registry.table_exists("course_rating_stats", conn):
+            aggregate_sql = """
+                SELECT rating_sum AS s, rating_count AS n
+                FROM course_rating_stats WHERE course_id = k.course_id
+            """
+        else:
+            aggregate_sql = """
+                SELECT SUM(rating) AS s, COUNT(*) AS n
+                FROM course_rating WHERE course_id = k.course_id
+            """
+        row = await conn.fetchrow(
+            f"""
+            SELECT a.s, a.n, ur.rating AS user_rating, ur.comment AS user_comment
+            FROM (SELECT $1::uuid AS course_id) k
+            LEFT JOIN LATERAL ({aggregate_sql}) a ON TRUE
+            LEFT JOIN course_rating ur
+              ON ur.course_id = k.course_id AND ur.user_id = $2::uuid
+            """,
+            course_id, user_id,
+        )
+        loaded["user"] = (
+            {"rating": row["user_rating"], "comment": row["user_comment"]}
+            if row["user_rating"] is not None else None
+        )
+        return _aggregate(row["s"], row["n"])
+
+    aggregate = await rating_cache.get_or_load(course_id, load)
+
+    if "user" in loaded:
+        user_row = loaded["user"]
+    elif user_id:
+        user_row = await conn.fetchrow(
+            "SELECT rating, comment FROM course_rating WHERE course_id = $1 AND user_id = $2",
+            course_id, user_id,
+        )
+    else:
+        user_row = None
+
+    return {
+        "course_id": course_id,
+        **aggregate,
+        "user_rating": int(user_row["rating"]) if user_row else None,
+        "user_comment": user_row["comment"] if user_row else None,
+    }
+
+
+async def get_rating_summaries(
+    conn: asyncpg.Connection,
+    course_ids: List[str],
+    user_id: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Resúmenes de varios cursos (mismo formato que get_rating_summary, en el
+    orden de `course_ids`) con una sola consulta agrupada. Los ids
+    repetidos se devuelven una vez; un curso sin calificaciones sale en 0.
+    """
+    ids = list(dict.fromkeys(course_ids))
+    if not ids:
+        return []
+
+    if await schema_registry.table_exists("course_rating_stats", conn):
+        aggregate_sql = """
+            SELECT course_id, rating_sum AS s, rating_count AS n
+            FROM course_rating_stats WHERE course_id = ANY($1::uuid[])
+        """
+    else:
+        aggregate_sql = """
+            SELECT course_id, SUM(rating) AS s, COUNT(*) AS n
+            FROM course_rating WHERE course_id = ANY($1::uuid[])
+            GROUP BY course_id
+        """
+    rows = await conn.fetch(
+        f"""
+        SELECT k.course_id, a.s, a.n, ur.rating AS user_rating, ur.comment AS user_comment
+        FROM unnest($1::uuid[]) WITH ORDINALITY AS k(course_id, ord)
+        LEFT JOIN ({aggregate_sql}) a ON a.course_id = k.course_id
+        LEFT JOIN course_rating ur
+          ON ur.course_id = k.course_id AND ur.user_id = $2::uuid
+        ORDER BY k.ord
+        """,
+        ids, user_id,
+    )
+    return [
+        {
+            "course_id": course_id,
+            **_aggregate(r["s"], r["n"]),
+            "user_rating": int(r["user_rating"]) if r["user_rating"] is not None else None,
+            "user_comment": r["user_comment"],
+        }
+        for course_id, r in zip(ids, rows)
+    ]
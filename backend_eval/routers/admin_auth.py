@@ -0,0 +1,25 @@
+# backend_eval/routers/admin_auth.py
+import asyncpg
+from fastapi import Depends, Header, HTTPException
+
+from db import get_conn
+
+ADMIN_ROLES = ("admin", "superadmin")
+
+
+async def require_admin(
+    x_user_id: str = Header(..., alias="X-User-Id"),
+    conn: asyncpg.Connection = Depends(get_conn),
+) -> str:
+    """
+    Dependencia para rutas de administración: exige role = 'admin' o
+    'superadmin' y devuelve el user_id.
+    """
+    role = await conn.fetchval(
+        "SELECT role FROM user_account WHERE id = $1",
+        x_user_id,
+    )
+    role_lc = (role or "").lower()
+    if role_lc not in ADMIN_ROLES:
+        raise HTTPException(status_code=403, detail="No autorizado")
+    return x_user_id
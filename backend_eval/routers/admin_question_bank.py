@@ -0,0 +1,48 @@
+# backend_eval/routers/admin_question_bank.py
+from __future__ import annotations
+
+import asyncpg
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+
+from db import get_conn
+from routers.admin_auth import require_admin
+from services.jobs import job_manager
+from services.question_bank import QB_PER_ITEM, build_course_bank
+
+router = APIRouter(prefix="/admin/question-bank", tags=["admin-question-bank"])
+
+
+class BankJobResponse(BaseModel):
+    ok: bool
+    job_id: str
+    status: str
+
+
+@router.post("/{course_id}/build", response_model=BankJobResponse, status_code=202)
+async def build_question_bank(
+    course_id: str,
+    per_item: int = Query(QB_PER_ITEM, ge=5, le=1000),
+    seed: int = Query(0, ge=0),
+    force: bool = Query(False),
+    dry_run: bool = Query(False),
+    conn: asyncpg.Connection = Depends(get_conn),
+    _admin_id: str = Depends(require_admin),
+):
+    """
+    Pregenera el banco de preguntas de todos los contenidos del curso
+    (ver services/question_bank). Corre en segundo plano: responde 202 con
+    un job_id que se consulta en GET /exam/jobs/{job_id}.
+    """
+    exists = await conn.fetchval("SELECT 1 FROM course WHERE id = $1::uuid", course_id)
+    if not exists:
+        raise HTTPException(status_code=404, detail=f"Curso inexistente: {course_id}")
+
+    job = job_manager.submit(
+        "question-bank",
+        lambda: build_course_bank(
+            course_id, per_item=per_item, seed=seed, force=force, dry_run=dry_run
+        ),
+        key=f"question-bank:{course_id}",
+    )
+    return BankJobResponse(ok=True, job_id=job.id, status=job.status)
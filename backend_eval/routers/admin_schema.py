@@ -0,0 +1,28 @@
+# backend_eval/routers/admin_schema.py
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends
+
+from routers.admin_auth import require_admin
+from services.schema_registry import schema_registry
+
+router = APIRouter(prefix="/admin/schema", tags=["admin-schema"])
+
+
+@router.get("")
+async def get_schema_capabilities(
+    _admin_id: str = Depends(require_admin),
+) -> Dict[str, Any]:
+    """Tablas opcionales detectadas y cuándo se sondearon por última vez."""
+    return schema_registry.snapshot()
+
+
+@router.post("/refresh")
+async def refresh_schema_capabilities(
+    _admin_id: str = Depends(require_admin),
+) -> Dict[str, Any]:
+    """Vuelve a sondear el esquema (por ejemplo, tras aplicar una migración)."""
+    await schema_registry.refresh()
+    return schema_registry.snapshot()
@@ -1,17 +1,27 @@
 # backend_eval/routers/certificates.py
 from __future__ import annotations
 
+import hashlib
 from typing import List, Optional
 from datetime import datetime
 
 import asyncpg
-from fastapi import APIRouter, Header, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from pydantic import BaseModel
 
-from repositories.exam_repo import DB_DSN
+from db import get_conn
+from repositories.certificate_repo import (
+    certificates_page,
+    certificates_version,
+    resolve_user_id,
+)
 
 router = APIRouter(prefix="/certificates", tags=["certificates"])
 
+# Tamaño de página cuando se pagina (limit / cursor)
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
 
 class CertificateItem(BaseModel):
     id: str
@@ -24,17 +34,35 @@ class CertificateItem(BaseModel):
 class CertificatesResponse(BaseModel):
     ok: bool
     items: List[CertificateItem]
+    # Cursor de la página siguiente (None si es la última)
+    next_cursor: Optional[str] = None
+
+
+def _etag(user_id: str, newest: Optional[datetime], total: int, cursor: Optional[str], limit: Optional[int]) -> str:
+    newest_key = newest.isoformat() if newest else "-"
+    digest = hashlib.sha1(f"{user_id}|{newest_key}|{total}|{cursor or ''}|{limit}".encode()).hexdigest()
+    return f'"{digest[:32]}"'
 
 
 @router.get("/me", response_model=CertificatesResponse)
 async def get_my_certificates(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
     x_user_id: Optional[str] = Header(None, alias="X-User-Id"),
     x_user_email: Optional[str] = Header(None, alias="X-User-Email"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    conn: asyncpg.Connection = Depends(get_conn),
 ):
     """
-    Devuelve los certificados del usuario actual.
+    Devuelve los certificados del usuario actual, del más reciente al más
+    antiguo: todos (como siempre) o, con `limit` o `cursor`, de a `limit`
+    por página (PAGE_SIZE si solo viene el cursor).
     - Preferimos X-User-Id.
     - Si no viene, intentamos resolverlo por X-User-Email.
+    - Para la página siguiente se pasa `cursor=<next_cursor>`.
+    - La respuesta lleva ETag (según el último issued_at y la cantidad de
+      certificados); con If-None-Match igual se responde 304 sin cuerpo.
     """
 
     if not x_user_id and not x_user_email:
@@ -43,49 +71,41 @@ async def get_my_certificates(
             detail="Falta el header X-User-Id o X-User-Email",
         )
 
-    conn = await asyncpg.connect(dsn=DB_DSN)
-    try:
-        user_id = x_user_id
+    user_id = x_user_id
 
-        # Si no tenemos id pero sí email, lo buscamos
-        if not user_id and x_user_email:
-            user_id = await conn.fetchval(
-                "SELECT id FROM user_account WHERE email = $1",
-                x_user_email,
+    # Si no tenemos id pero sí email, lo buscamos (con caché)
+    if not user_id and x_user_email:
+        user_id = await resolve_user_id(conn, x_user_email)
+        if not user_id:
+            raise HTTPException(
+                status_code=404,
+                detail="Usuario no encontrado para ese email.",
             )
-            if not user_id:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Usuario no encontrado para ese email.",
-                )
-
-        rows = await conn.fetch(
-            """
-            SELECT
-              cc.id,
-              cc.course_id,
-              c.title AS course_title,
-              cc.score_percent,
-              cc.issued_at
-            FROM course_certificate cc
-            JOIN course c ON c.id = cc.course_id
-            WHERE cc.user_id = $1
-            ORDER BY cc.issued_at DESC
-            """,
-            user_id,
-        )
 
-        items = [
-            CertificateItem(
-                id=str(r["id"]),
-                course_id=str(r["course_id"]),
-                course_title=r["course_title"],
-                score_percent=float(r["score_percent"]),
-                issued_at=r["issued_at"],
-            )
-            for r in rows
-        ]
+    if cursor and limit is None:
+        limit = PAGE_SIZE
+
+    newest, total = await certificates_version(conn, user_id)
+    etag = _etag(user_id, newest, total, cursor, limit)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag in (t.strip() for t in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        rows, next_cursor = await certificates_page(conn, user_id, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="cursor inválido.")
+
+    items = [
+        CertificateItem(
+            id=str(r["id"]),
+            course_id=str(r["course_id"]),
+            course_title=r["course_title"],
+            score_percent=float(r["score_percent"]),
+            issued_at=r["issued_at"],
+        )
+        for r in rows
+    ]
 
-        return CertificatesResponse(ok=True, items=items)
-    finally:
-        await conn.close()
+    response.headers.update(headers)
+    return CertificatesResponse(ok=True, items=items, next_cursor=next_cursor)
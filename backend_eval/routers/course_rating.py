@@ -5,10 +5,11 @@ from __future__ import annotations
 from typing import Optional, List
 
 import asyncpg
-from fastapi import APIRouter, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header
 from pydantic import BaseModel
 
-from repositories.exam_repo import DB_DSN
+from db import get_conn
+from repositories.rating_repo import get_rating_summaries, get_rating_summary, upsert_rating
 
 router = APIRouter(prefix="/course-rating", tags=["course-rating"])
 
@@ -32,8 +33,36 @@ class RatingSummary(BaseModel):
     user_comment: Optional[str] = None
 
 
-async def _get_conn() -> asyncpg.Connection:
-    return await asyncpg.connect(dsn=DB_DSN)
+class SummariesRequest(BaseModel):
+    course_ids: List[str]
+
+
+# Tope de cursos por pedido (una página de catálogo)
+MAX_SUMMARIES = 200
+
+
+# Va antes de POST /{course_id}: si no, "summaries" se tomaría como course_id
+@router.post("/summaries", response_model=List[RatingSummary])
+async def get_course_rating_summaries(
+    payload: SummariesRequest,
+    x_user_id: Optional[str] = Header(None, alias="X-User-Id"),
+    conn: asyncpg.Connection = Depends(get_conn),
+):
+    """
+    Resumen de ratings de varios cursos a la vez (páginas de catálogo), en
+    el orden pedido y con una sola consulta.
+
+    Requiere:
+      - Body: { "course_ids": ["...", ...] }
+      - Header opcional: X-User-Id (agrega user_rating / user_comment)
+    """
+    if len(payload.course_ids) > MAX_SUMMARIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {MAX_SUMMARIES} cursos por pedido.",
+        )
+    summaries = await get_rating_summaries(conn, payload.course_ids, x_user_id)
+    return [RatingSummary(**s) for s in summaries]
 
 
 @router.post("/{course_id}", response_model=RatingOut)
@@ -41,6 +70,7 @@ async def set_course_rating(
     course_id: str,
     payload: RatingPayload,
     x_user_id: Optional[str] = Header(None, alias="X-User-Id"),
+    conn: asyncpg.Connection = Depends(get_conn),
 ):
     """
     Crea o actualiza la calificación de un curso para el usuario actual.
@@ -57,95 +87,46 @@ async def set_course_rating(
             status_code=400, detail="rating debe estar entre 1 y 5."
         )
 
-    conn = await _get_conn()
-    try:
-        # Verificar que el curso existe
-        exists = await conn.fetchval(
-            "SELECT 1 FROM course WHERE id = $1",
-            course_id,
-        )
-        if not exists:
-            raise HTTPException(
-                status_code=404, detail="Curso inexistente."
-            )
-
-        # UPSERT: si ya existe (user_id, course_id), actualiza; si no, crea
-        await conn.execute(
-            """
-            INSERT INTO course_rating (user_id, course_id, rating, comment)
-            VALUES ($1, $2, $3, $4)
-            ON CONFLICT (user_id, course_id)
-            DO UPDATE SET rating = EXCLUDED.rating,
-                          comment = EXCLUDED.comment,
-                          updated_at = now()
-            """,
-            x_user_id,
-            course_id,
-            payload.rating,
-            payload.comment,
+    # Verificar que el curso existe
+    exists = await conn.fetchval(
+        "SELECT 1 FROM course WHERE id = $1",
+        course_id,
+    )
+    if not exists:
+        raise HTTPException(
+            status_code=404, detail="Curso inexistente."
         )
 
-        return RatingOut(
-            ok=True,
-            rating=payload.rating,
-            comment=payload.comment,
-        )
+    # UPSERT: si ya existe (user_id, course_id), actualiza; si no, crea.
+    # También ajusta los agregados del curso (ver repositories/rating_repo).
+    await upsert_rating(
+        conn,
+        user_id=x_user_id,
+        course_id=course_id,
+        rating=payload.rating,
+        comment=payload.comment,
+    )
 
-    finally:
-        await conn.close()
+    return RatingOut(
+        ok=True,
+        rating=payload.rating,
+        comment=payload.comment,
+    )
 
 
 @router.get("/{course_id}/summary", response_model=RatingSummary)
 async def get_course_rating_summary(
     course_id: str,
     x_user_id: Optional[str] = Header(None, alias="X-User-Id"),
+    conn: asyncpg.Connection = Depends(get_conn),
 ):
     """
     Devuelve resumen de ratings de un curso:
       - promedio
       - cantidad de ratings
       - rating del usuario actual (si viene X-User-Id)
-    """
-    conn = await _get_conn()
-    try:
-        row = await conn.fetchrow(
-            """
-            SELECT
-              AVG(rating)::numeric(3,2) AS avg_rating,
-              COUNT(*)                  AS ratings_count
-            FROM course_rating
-            WHERE course_id = $1
-            """,
-            course_id,
-        )
 
-        avg_rating = float(row["avg_rating"]) if row["avg_rating"] is not None else 0.0
-        ratings_count = int(row["ratings_count"])
-
-        user_rating = None
-        user_comment = None
-
-        if x_user_id:
-            urow = await conn.fetchrow(
-                """
-                SELECT rating, comment
-                FROM course_rating
-                WHERE course_id = $1 AND user_id = $2
-                """,
-                course_id,
-                x_user_id,
-            )
-            if urow:
-                user_rating = int(urow["rating"])
-                user_comment = urow["comment"]
-
-        return RatingSummary(
-            course_id=course_id,
-            avg_rating=avg_rating,
-            ratings_count=ratings_count,
-            user_rating=user_rating,
-            user_comment=user_comment,
-        )
-
-    finally:
-        await conn.close()
+    Promedio y cantidad salen de los agregados mantenidos en
+    course_rating_stats, con caché en memoria de TTL corto.
+    """
+    return RatingSummary(**await get_rating_summary(conn, course_id, x_user_id))
@@ -1,14 +1,14 @@
 # backend_eval/routers/exam_from_document.py
 import os
-import shutil
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
-from typing import List, Dict
-import asyncpg
+from typing import List
 
-from services.doc_reader import get_text_from_document
-from services.quiz_generator import generate_questions
-from repositories.exam_repo import save_generated_quiz, DB_DSN
+from db import acquire
+from services.doc_reader import get_text_from_path
+from services.media_resolver import APP_DOCS_DIR, link_into, media_resolver
+from services.quiz_generator import generate_questions, text_budget
+from repositories.exam_repo import get_quiz, save_generated_quiz
 
 router = APIRouter()
 
@@ -47,8 +47,8 @@ async def create_exam_from_document(
 ):
     try:
         # 1) Validar que el content_id exista y tenga un document_asset
-        conn = await asyncpg.connect(dsn=DB_DSN)
-        try:
+        #    (la conexión vuelve al pool antes de leer/generar)
+        async with acquire() as conn:
             row = await conn.fetchrow(
                 """
                 SELECT ci.id, ci.type, ci.title, da.uri
@@ -58,8 +58,6 @@ async def create_exam_from_document(
                 """,
                 content_id,
             )
-        finally:
-            await conn.close()
 
         if not row:
             raise HTTPException(
@@ -74,59 +72,38 @@ async def create_exam_from_document(
                 detail="No hay documento asociado a este contenido.",
             )
 
-        # 2) Localizar el archivo físico del documento
+        # 2) Localizar el archivo físico del documento (se lee en su sitio).
         #    Antes de dockerizar, el core lo grababa en /docs o /uploads;
-        #    ahora probamos todas las variantes razonables.
-        docs_dir = "/app/docs"
-        os.makedirs(docs_dir, exist_ok=True)
-
-        candidate_paths: List[str] = []
-
-        # a) Ruta tal y como viene en la columna uri (ej: /uploads/docs/xxxxx.pdf o /docs/xxxxx.pdf)
-        candidate_paths.append(os.path.join("/app", doc_uri.lstrip("/")))
-
-        # b) Si uri fuera relativo
-        if not doc_uri.startswith("/"):
-            candidate_paths.append(os.path.join(docs_dir, doc_uri))
-
-        # c) Rutas típicas por doc_id y extensión
-        for ext in [".pdf", ".docx", ".doc"]:
-            candidate_paths.append(os.path.join(docs_dir, f"{doc_id}{ext}"))
-            candidate_paths.append(os.path.join("/app/uploads", f"{doc_id}{ext}"))
-            candidate_paths.append(os.path.join("/app/uploads/docs", f"{doc_id}{ext}"))
-
-        source_path = None
-        for p in candidate_paths:
-            if os.path.exists(p):
-                source_path = p
-                break
-
-        if not source_path:
+        #    media_resolver prueba las variantes y recuerda el resultado.
+        found = media_resolver.resolve(doc_uri, doc_id=doc_id, relative_dir=APP_DOCS_DIR)
+        if not found.path:
             # Error real: no encontramos el documento en ninguna ruta razonable
             raise HTTPException(
                 status_code=404,
                 detail=(
                     f"Documento no encontrado para doc_id={doc_id}. "
-                    f"Probadas rutas: {', '.join(sorted(set(candidate_paths)))}"
+                    f"Probadas rutas: {', '.join(sorted(set(found.tried)))}"
                 ),
             )
+        source_path = found.path
 
-        # 3) Copiarlo a /app/docs con nombre doc_id.ext, que es lo que usa doc_reader
+        # 3) Mantener /app/docs/<doc_id>.ext como ubicación canónica con un
+        #    enlace (hardlink/symlink), sin duplicar el archivo
         _, ext = os.path.splitext(source_path)
-        if not ext:
-            ext = ".pdf"
-        dest_path = os.path.join(docs_dir, f"{doc_id}{ext}")
-
-        if not os.path.exists(dest_path):
-            shutil.copyfile(source_path, dest_path)
+        try:
+            link_into(source_path, os.path.join(APP_DOCS_DIR, f"{doc_id}{ext or '.pdf'}"))
+        except OSError:
+            pass  # solo es una comodidad; el texto se lee de source_path
 
-        # 4) Extraer texto del documento (doc_reader mira en /app/docs/doc_id.ext)
+        # 4) Extraer texto del documento
         try:
-            text = await get_text_from_document(doc_id)
+            # Solo lo que el generador va a usar (ver text_budget)
+            text = await get_text_from_path(source_path, budget=text_budget(count))
         except FileNotFoundError:
+            media_resolver.forget(doc_uri, doc_id=doc_id)
             raise HTTPException(
                 status_code=404,
-                detail=f"Documento no encontrado para doc_id={doc_id} en {dest_path}.",
+                detail=f"Documento no encontrado para doc_id={doc_id} en {source_path}.",
             )
         except Exception as e:
             # Cualquier error específico del lector se considera 422 (input inválido)
@@ -167,57 +144,22 @@ async def create_exam_from_document(
 
 @router.get("/exam/by-content/{content_id}", response_model=ExamByContentResponse)
 async def exam_by_content(content_id: str):
-    conn = await asyncpg.connect(dsn=DB_DSN)
     try:
-        # Buscar un quiz asociado a ese content_id
-        quiz_id = await conn.fetchval(
-            "SELECT id FROM quiz WHERE content_id = $1 LIMIT 1",
-            content_id,
-        )
-        if not quiz_id:
+        # Quiz armado (preguntas + opciones), servido desde quiz_cache
+        quiz = await get_quiz(content_id)
+        if not quiz:
             raise HTTPException(
                 status_code=404,
                 detail="No existe un quiz para este contenido.",
             )
 
-        rows = await conn.fetch(
-            """
-            SELECT
-              qq.id      AS qid,
-              qq.prompt,
-              qo.id      AS oid,
-              qo.label   AS text,
-              qo.is_correct
-            FROM quiz_question qq
-            LEFT JOIN quiz_option qo ON qo.question_id = qq.id
-            WHERE qq.quiz_id = $1
-            ORDER BY qq.prompt, qo.label
-            """,
-            quiz_id,
-        )
-
-        by_q: Dict[str, Dict] = {}
-        for r in rows:
-            qid = str(r["qid"])
-            if qid not in by_q:
-                by_q[qid] = {
-                    "id": qid,
-                    "prompt": r["prompt"],
-                    "options": [],
-                }
-            if r["oid"] is not None:
-                by_q[qid]["options"].append(
-                    {
-                        "id": str(r["oid"]),
-                        "text": r["text"],
-                        "is_correct": bool(r["is_correct"]),
-                    }
-                )
-
         return {
             "ok": True,
-            "quiz_id": str(quiz_id),
-            "questions": list(by_q.values()),
+            "quiz_id": quiz["quiz_id"],
+            "questions": [
+                {"id": q["id"], "prompt": q["prompt"], "options": q["options"]}
+                for q in quiz["questions"]
+            ],
         }
 
     except HTTPException:
@@ -227,5 +169,3 @@ async def exam_by_content(content_id: str):
             status_code=500,
             detail=f"Error consultando examen: {e}",
         )
-    finally:
-        await conn.close()
@@ -1,17 +1,23 @@
 # backend_eval/routers/exam_from_video.py
+import asyncio
 import os
-import shutil
-from typing import Optional
+from typing import Any, Dict, Optional
 
-import asyncpg
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 
-from repositories.exam_repo import save_generated_quiz, DB_DSN
-from services.quiz_generator import generate_questions
-from services.video_transcriber import (
-    VIDEOS_DIR,
-    transcribe_video_if_needed,
+from db import acquire
+from repositories.exam_repo import save_generated_quiz
+from services.jobs import JobError, job_manager, report_progress
+from services.media_resolver import media_resolver
+from services import video_transcriber
+from services.quiz_generator import generate_questions, text_budget
+from services.text_budget import TextBudget
+from services.text_cache import file_sha256
+from services.transcription_pool import (
+    Reservation,
+    TranscriptionQueueFull,
+    transcription_pool,
 )
 
 router = APIRouter()
@@ -19,13 +25,21 @@ router = APIRouter()
 # Mínimo de caracteres de texto para poder generar preguntas
 MIN_TEXT_LEN = 80
 
+# Segundos sugeridos al cliente cuando la cola de transcripción está llena
+QUEUE_FULL_RETRY_AFTER = 30
 
-class CreateFromVideoResponse(BaseModel):
+
+class VideoJobResponse(BaseModel):
     ok: bool
-    quiz_id: str
+    job_id: str
+    status: str
 
 
-@router.post("/exam/from-video/{content_id}", response_model=CreateFromVideoResponse)
+@router.post(
+    "/exam/from-video/{content_id}",
+    response_model=VideoJobResponse,
+    status_code=202,
+)
 async def create_exam_from_video(
     content_id: str,
     count: int = Query(5, ge=3, le=10),
@@ -33,16 +47,22 @@ async def create_exam_from_video(
     """
     Genera (o reemplaza) el examen para un contenido de tipo 'video'.
 
+    La transcripción tarda minutos, así que aquí solo se valida lo rápido
+    y el resto corre como trabajo en segundo plano. Responde 202 con un
+    job_id; el estado se consulta en GET /exam/jobs/{job_id} y, al terminar,
+    el resultado trae el quiz_id.
+
     Flujo:
       1) Verifica que el content_id exista y sea video.
       2) Busca el media_asset para obtener la URI del archivo.
-      3) Copia el archivo real desde /uploads/... a VIDEOS_DIR si es necesario.
-      4) Transcribe el audio con Whisper (creando/leyendo el .txt).
-      5) Si el texto es suficiente, genera preguntas y guarda el quiz.
+      3) Localiza el archivo en /uploads/... (media_resolver, sin copiarlo).
+      4) (trabajo) Lo transcribe en el pool de procesos, genera preguntas
+         y guarda el quiz. Si una transcripción anterior ya dejó en el
+         parcial texto suficiente para `count` preguntas, se genera con
+         ese prefijo sin esperar al resto del video.
     """
     # --- 1) Validar que el contenido exista y sea video ---
-    conn = await asyncpg.connect(dsn=DB_DSN)
-    try:
+    async with acquire() as conn:
         exists = await conn.fetchval(
             "SELECT 1 FROM content_item WHERE id = $1 AND type = 'video'",
             content_id,
@@ -66,61 +86,133 @@ async def create_exam_from_video(
 
         video_uri: str = row["uri"]  # ejemplo: /uploads/videos/1762271911802.mp4
 
-    finally:
-        await conn.close()
-
-    # --- 3) Localizar/corregir la ruta al archivo de video ---
-    # El backend core guarda el archivo bajo /uploads/..., así que
-    # construimos la ruta real dentro del contenedor.
-    source_path = os.path.join("/app", video_uri.lstrip("/"))
-
-    if not os.path.exists(source_path):
+    # --- 3) Localizar el archivo de video ---
+    # El backend core guarda el archivo bajo /uploads/...; se lee en su
+    # sitio, sin copiarlo.
+    found = media_resolver.resolve(video_uri)
+    if found.path is None:
         # El frontend interpreta 404 como "video 404"
         raise HTTPException(
             status_code=404,
-            detail=f"Video no encontrado en {source_path}.",
+            detail=f"Video no encontrado en {found.tried[0]}.",
+        )
+    source_path = found.path
+
+    # --- 4) El resto, en segundo plano (un solo trabajo activo por contenido) ---
+    key = f"exam-from-video:{content_id}"
+    job = job_manager.find_active(key)
+    if job is None:
+        # Se reserva el lugar en la cola al aceptar el trabajo: si está llena,
+        # el cliente recibe 503 ahora en vez de un trabajo que esperaría sin fin.
+        try:
+            reservation = transcription_pool.reserve()
+        except TranscriptionQueueFull as e:
+            raise HTTPException(
+                status_code=503,
+                detail=str(e),
+                headers={"Retry-After": str(QUEUE_FULL_RETRY_AFTER)},
+            )
+        job = job_manager.submit(
+            "exam-from-video",
+            lambda: _generate_exam_from_video(
+                content_id=content_id,
+                source_path=source_path,
+                video_uri=video_uri,
+                count=count,
+                reservation=reservation,
+            ),
+            key=key,
         )
+    return VideoJobResponse(ok=True, job_id=job.id, status=job.status)
+
 
-    # Aseguramos que el archivo también exista en VIDEOS_DIR, que es donde
-    # el servicio de transcripción espera encontrarlo.
-    os.makedirs(VIDEOS_DIR, exist_ok=True)
-    base_name = os.path.basename(source_path)  # 1762271911802.mp4
-    video_path = os.path.join(VIDEOS_DIR, base_name)
+async def _generate_exam_from_video(
+    *,
+    content_id: str,
+    source_path: str,
+    video_uri: str,
+    count: int,
+    reservation: Reservation,
+) -> Dict[str, Any]:
+    try:
+        return await _run_video_job(
+            content_id=content_id,
+            source_path=source_path,
+            video_uri=video_uri,
+            count=count,
+            reservation=reservation,
+        )
+    finally:
+        # Idempotente: si la transcripción ya la liberó no hace nada
+        reservation.release()
 
-    if not os.path.exists(video_path):
-        shutil.copyfile(source_path, video_path)
 
-    # --- 4) Transcribir con Whisper (si hace falta) ---
+async def _run_video_job(
+    *,
+    content_id: str,
+    source_path: str,
+    video_uri: str,
+    count: int,
+    reservation: Reservation,
+) -> Dict[str, Any]:
+    budget = text_budget(count)
+
+    # --- Si una transcripción anterior de este mismo archivo ya dejó
+    #     suficientes minutos en el parcial (<content_id>.partial.txt), se
+    #     genera con eso ---
+    text = await _partial_covering(content_id, source_path, budget)
+    if text is not None:
+        report_progress(stage="transcribing", from_partial=True, partial_chars=len(text))
+        return await _generate_and_save(content_id=content_id, text=text, count=count)
+
+    # --- Transcribir con Whisper (si hace falta), fuera del event loop ---
     try:
-        text = transcribe_video_if_needed(
+        text = await transcription_pool.transcribe(
             content_id=content_id,
-            video_path=video_path,
+            video_path=source_path,
             video_uri=video_uri,
             language="es",
+            reservation=reservation,
+            on_progress=lambda p: report_progress(stage="transcribing", **p),
+            budget=budget,  # basta con los primeros minutos
         )
+    except TranscriptionQueueFull as e:
+        raise JobError(503, str(e))
     except FileNotFoundError:
-        # El frontend interpreta 404 como "video 404"
-        raise HTTPException(
-            status_code=404,
-            detail=f"Video no encontrado en {video_path}.",
-        )
+        raise JobError(404, f"Video no encontrado en {source_path}.")
     except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error transcribiendo video: {e}",
-        )
+        raise JobError(500, f"Error transcribiendo video: {e}")
 
     if not text or len(text.strip()) < MIN_TEXT_LEN:
-        # El frontend interpreta 422 como "video 422"
-        raise HTTPException(
-            status_code=422,
-            detail=(
-                "No hay transcripción suficiente para este video. "
-                "Revisa el audio o intenta con un video más largo."
-            ),
+        raise JobError(
+            422,
+            "No hay transcripción suficiente para este video. "
+            "Revisa el audio o intenta con un video más largo.",
         )
 
-    # --- 5) Generar preguntas y guardar el quiz ligado al content_id ---
+    return await _generate_and_save(content_id=content_id, text=text, count=count)
+
+
+async def _partial_covering(content_id: str, source_path: str, budget: TextBudget) -> Optional[str]:
+    """
+    El transcript parcial del video, si es de este mismo archivo (SHA-256
+    del manifiesto) y ya alcanza para `budget`.
+    """
+    if not os.path.exists(video_transcriber.partial_transcript_path(content_id)):
+        return None
+    try:
+        digest = await asyncio.to_thread(file_sha256, source_path)
+    except FileNotFoundError:
+        return None  # la transcripción responde el 404
+    text = await asyncio.to_thread(video_transcriber.read_partial_transcript, content_id, digest)
+    if not text or len(text.strip()) < MIN_TEXT_LEN:
+        return None
+    return text if budget.tracker().feed(text) else None
+
+
+async def _generate_and_save(*, content_id: str, text: str, count: int) -> Dict[str, Any]:
+    # --- Generar preguntas y guardar el quiz ligado al content_id ---
+    report_progress(stage="generating")
     gen = await generate_questions(text=text, count=count)
 
     quiz_id = await save_generated_quiz(
@@ -131,4 +223,4 @@ async def create_exam_from_video(
         content_id=content_id,
     )
 
-    return CreateFromVideoResponse(ok=True, quiz_id=str(quiz_id))
+    return {"quiz_id": str(quiz_id), "content_id": content_id}
@@ -0,0 +1,19 @@
+# backend_eval/routers/exam_jobs.py
+from fastapi import APIRouter, HTTPException
+
+from services.jobs import job_manager
+
+router = APIRouter(prefix="/exam/jobs", tags=["exam-jobs"])
+
+
+@router.get("/{job_id}")
+async def get_exam_job(job_id: str):
+    """
+    Estado de un trabajo en segundo plano (p. ej. POST /exam/from-video).
+    status: queued | running | done | error. Si hay error, error_code trae
+    el código HTTP que habría devuelto la ruta síncrona (404, 422, 500).
+    """
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado.")
+    return job.to_dict()
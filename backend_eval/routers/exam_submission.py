@@ -5,11 +5,13 @@ from __future__ import annotations
 from typing import List, Optional, Dict
 
 import asyncpg
-from fastapi import APIRouter, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header
 from pydantic import BaseModel
 import uuid
 
-from repositories.exam_repo import DB_DSN
+from db import get_conn
+from repositories.certificate_repo import issue_certificate
+from repositories.exam_repo import insert_exam_answers
 
 router = APIRouter()
 
@@ -36,80 +38,8 @@ class SubmitExamResponse(BaseModel):
     attempt_id: str
     score_percent: float
     passed: bool
-
-
-# =============================
-#  Helpers opcionales (certificado)
-# =============================
-
-async def _table_exists(conn: asyncpg.Connection, table_name: str) -> bool:
-    """
-    Verifica si existe una tabla en el esquema public.
-    Usamos to_regclass para no romper si no existe.
-    """
-    row = await conn.fetchrow(
-        "SELECT to_regclass($1) AS oid",
-        f"public.{table_name}",
-    )
-    return bool(row and row["oid"])
-
-
-async def _maybe_issue_certificate(
-    conn: asyncpg.Connection,
-    *,
-    user_id: str,
-    content_id: str,
-    attempt_id: str,
-    score_percent: float,
-) -> None:
-    """
-    Si existe la tabla course_certificate y el usuario aprobó, genera
-    un registro de certificado para el curso correspondiente al content_id.
-
-    Cualquier error aquí se ignora silenciosamente para no romper el flujo
-    principal de corrección.
-    """
-    try:
-        # ¿Existe la tabla de certificados?
-        if not await _table_exists(conn, "course_certificate"):
-            return
-
-        # Obtener course_id desde content_item
-        course_id = await conn.fetchval(
-            "SELECT course_id FROM content_item WHERE id = $1",
-            content_id,
-        )
-        if not course_id:
-            return
-
-        # ¿Ya tenía certificado?
-        exists = await conn.fetchval(
-            """
-            SELECT 1
-            FROM course_certificate
-            WHERE user_id = $1 AND course_id = $2
-            """,
-            user_id,
-            course_id,
-        )
-        if exists:
-            return
-
-        # Crear certificado
-        await conn.execute(
-            """
-            INSERT INTO course_certificate
-                (user_id, course_id, attempt_id, score_percent)
-            VALUES ($1, $2, $3, $4)
-            """,
-            user_id,
-            course_id,
-            attempt_id,
-            score_percent,
-        )
-    except Exception:
-        # Aquí podrías hacer logging.error(...) si tienes logging configurado.
-        return
+    # True si este submit emitió el certificado del curso
+    certificate_issued: bool = False
 
 
 # =============================
@@ -120,6 +50,7 @@ async def _maybe_issue_certificate(
 async def submit_exam(
     payload: SubmitExamRequest,
     x_user_id: Optional[str] = Header(None, alias="X-User-Id"),
+    conn: asyncpg.Connection = Depends(get_conn),
 ):
     """
     Corrige el examen, guarda intento + respuestas y devuelve nota.
@@ -141,7 +72,8 @@ async def submit_exam(
           "ok": true,
           "attempt_id": "...",
           "score_percent": 80.0,
-          "passed": true
+          "passed": true,
+          "certificate_issued": true
         }
 
     Además:
@@ -159,7 +91,6 @@ async def submit_exam(
     content_id = payload.content_id
     quiz_id = payload.quiz_id
 
-    conn = await asyncpg.connect(dsn=DB_DSN)
     try:
         # 1) Validar que el quiz pertenece a ese content_id
         row = await conn.fetchrow(
@@ -247,23 +178,16 @@ async def submit_exam(
                 passed,
             )
 
-            for qid, oid, is_corr in answer_records:
-                await conn.execute(
-                    """
-                    INSERT INTO exam_answer
-                        (id, attempt_id, question_id, option_id, is_correct)
-                    VALUES ($1, $2, $3, $4, $5)
-                    """,
-                    str(uuid.uuid4()),
-                    attempt_id,
-                    qid,
-                    oid,
-                    is_corr,
-                )
+            await insert_exam_answers(
+                conn,
+                attempt_id=attempt_id,
+                answer_records=answer_records,
+            )
 
             # 5) Si aprobó, intentamos emitir certificado (si existe tabla)
+            certificate_issued = False
             if passed:
-                await _maybe_issue_certificate(
+                certificate_issued = await issue_certificate(
                     conn,
                     user_id=user_id,
                     content_id=content_id,
@@ -276,6 +200,7 @@ async def submit_exam(
             attempt_id=attempt_id,
             score_percent=score_percent,
             passed=passed,
+            certificate_issued=certificate_issued,
         )
 
     except HTTPException:
@@ -287,5 +212,3 @@ async def submit_exam(
             status_code=500,
             detail=f"Error evaluando examen: {e}",
         )
-    finally:
-        await conn.close()
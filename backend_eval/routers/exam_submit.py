@@ -2,14 +2,18 @@
 
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 import uuid
 
 import asyncpg
-from fastapi import APIRouter, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
 from pydantic import BaseModel
 
-from repositories.exam_repo import DB_DSN
+from db import get_conn
+from repositories.certificate_repo import issue_certificate
+from repositories.exam_repo import get_quiz, grade_and_record_attempt
+from services.quiz_cache import quiz_cache
+from services.schema_registry import schema_registry
 
 router = APIRouter(prefix="/exam", tags=["exam-submit"])
 
@@ -41,224 +45,151 @@ class SubmitResult(BaseModel):
     total_questions: int
     correct_count: int
     score_percent: float
-    details: List[QuestionResult]
+    # Solo con ?details=true
+    details: List[QuestionResult] = []
     passed: bool | None = None
+    # True si este submit emitió el certificado del curso
+    certificate_issued: bool = False
 
 
-async def _table_exists(conn: asyncpg.Connection, table_name: str) -> bool:
-    """Verifica si existe una tabla en public."""
-    row = await conn.fetchrow(
-        "SELECT to_regclass($1) AS oid",
-        f"public.{table_name}",
-    )
-    return bool(row and row["oid"])
-
-
-async def _maybe_issue_certificate(
-    conn: asyncpg.Connection,
-    *,
-    user_id: str,
-    content_id: str,
-    attempt_id: str,
-    score_percent: float,
-) -> None:
-    """
-    Si existe course_certificate y el usuario aprobó, crea un certificado
-    para el curso asociado al content_id (una sola vez por user+course).
-    Cualquier error aquí se ignora para no romper el submit.
-    """
+def _valid_uuid(value: str) -> Optional[str]:
+    """`value` normalizado si es un UUID válido; None si no."""
     try:
-        # ¿Existe la tabla de certificados?
-        if not await _table_exists(conn, "course_certificate"):
-            return
-
-        # Obtener course_id desde content_item
-        course_id = await conn.fetchval(
-            "SELECT course_id FROM content_item WHERE id = $1",
-            content_id,
-        )
-        if not course_id:
-            return
-
-        # ¿Ya tiene certificado para este curso?
-        exists = await conn.fetchval(
-            """
-            SELECT 1
-            FROM course_certificate
-            WHERE user_id = $1 AND course_id = $2
-            """,
-            user_id,
-            course_id,
-        )
-        if exists:
-            return
-
-        # Crear certificado
-        await conn.execute(
-            """
-            INSERT INTO course_certificate
-                (user_id, course_id, attempt_id, score_percent)
-            VALUES ($1, $2, $3, $4)
-            """,
-            user_id,
-            course_id,
-            attempt_id,
-            score_percent,
+        return str(uuid.UUID(value))
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+def _grade_with_quiz(
+    quiz: Dict[str, Any],
+    answers: Dict[str, str],
+) -> Tuple[List[QuestionResult], int]:
+    """Detalle por pregunta y cantidad de aciertos a partir del quiz armado."""
+    details: List[QuestionResult] = []
+    correct_count = 0
+    for q in quiz["questions"]:
+        qid = q["id"]
+        selected = answers.get(qid)
+        correct = q["correct"]
+        is_correct = (selected == correct) if (selected and correct) else False
+        if is_correct:
+            correct_count += 1
+
+        details.append(
+            QuestionResult(
+                question_id=qid,
+                prompt=q["prompt"],
+                selected_option_id=selected,
+                correct_option_id=correct,
+                is_correct=is_correct,
+                options=[OptionOut(**o) for o in q["options"]],
+            )
         )
-    except Exception:
-        # Aquí podrías hacer logging.error(...) si tienes logging.
-        return
+    return details, correct_count
 
 
 @router.post("/submit", response_model=SubmitResult)
 async def submit_exam(
     payload: SubmitPayload,
+    details: bool = Query(False),
     x_user_id: Optional[str] = Header(None, alias="X-User-Id"),
+    conn: asyncpg.Connection = Depends(get_conn),
 ):
     """
-    Corrige el examen (como antes), devuelve el detalle de preguntas, y si
-    existen las tablas exam_attempt/exam_answer, guarda el intento.
+    Corrige el examen y, si existen las tablas exam_attempt/exam_answer,
+    guarda el intento.
     Si score >= PASS_THRESHOLD y viene X-User-Id, intenta emitir certificado.
+
+    Con las tablas, la corrección y el guardado son una sola sentencia en la
+    BD (exam_repo.grade_and_record_attempt). El detalle por pregunta
+    (`details`) solo se arma con `?details=true`, desde quiz_cache.
     """
-    content_id = payload.content_id
+    # Los ids se castean a uuid en la BD: uno mal formado sería un 500
+    content_id = _valid_uuid(payload.content_id)
+    if content_id is None:
+        raise HTTPException(
+            status_code=404,
+            detail="No existe quiz para este contenido.",
+        )
+    if x_user_id is not None:
+        x_user_id = _valid_uuid(x_user_id)
+        if x_user_id is None:
+            raise HTTPException(status_code=400, detail="X-User-Id inválido.")
     answers = payload.answers or {}
 
-    conn = await asyncpg.connect(dsn=DB_DSN)
     try:
-        quiz_id = await conn.fetchval(
-            "SELECT id FROM quiz WHERE content_id=$1 LIMIT 1", content_id
-        )
-        if not quiz_id:
-            raise HTTPException(
-                status_code=404,
-                detail="No existe quiz para este contenido.",
-            )
+        has_attempt = await schema_registry.table_exists("exam_attempt", conn)
+        has_answer = await schema_registry.table_exists("exam_answer", conn)
 
-        rows = await conn.fetch(
-            """
-            SELECT
-              qq.id     AS qid,
-              qq.prompt AS prompt,
-              qo.id     AS oid,
-              qo.label  AS text,
-              qo.is_correct AS is_correct
-            FROM quiz_question qq
-            LEFT JOIN quiz_option qo ON qo.question_id = qq.id
-            WHERE qq.quiz_id = $1
-            ORDER BY qq.prompt, qo.label
-            """,
-            quiz_id,
-        )
-
-        # Agrupar por pregunta + hallar correcta
-        questions: Dict[str, Dict] = {}
-        for r in rows:
-            qid = str(r["qid"])
-            if qid not in questions:
-                questions[qid] = {
-                    "prompt": r["prompt"],
-                    "options": [],
-                    "correct": None,
-                }
-            if r["oid"] is not None:
-                oid = str(r["oid"])
-                is_ok = bool(r["is_correct"])
-                questions[qid]["options"].append(
-                    {"id": oid, "text": r["text"], "is_correct": is_ok}
-                )
-                if is_ok:
-                    questions[qid]["correct"] = oid
-
-        details: List[QuestionResult] = []
-        correct_count = 0
-
-        # Respuestas para guardar en BD
-        answer_records: List[Tuple[str, str, bool]] = []
-
-        for qid, q in questions.items():
-            selected = answers.get(qid)
-            correct = q["correct"]
-            is_correct = (selected == correct) if (selected and correct) else False
-            if is_correct:
-                correct_count += 1
-
-            if selected is not None:
-                answer_records.append((qid, selected, is_correct))
-
-            details.append(
-                QuestionResult(
-                    question_id=qid,
-                    prompt=q["prompt"],
-                    selected_option_id=selected,
-                    correct_option_id=correct,
-                    is_correct=is_correct,
-                    options=[OptionOut(**o) for o in q["options"]],
-                )
-            )
-
-        total = len(details)
-        score = (correct_count / total * 100.0) if total else 0.0
-        passed = score >= PASS_THRESHOLD
-
-        # Guardar intento/respuestas SI existen las tablas
-        has_attempt = await _table_exists(conn, "exam_attempt")
-        has_answer = await _table_exists(conn, "exam_answer")
-
-        attempt_id: Optional[str] = None
+        quiz: Optional[Dict[str, Any]] = None
+        certificate_issued = False
 
         if has_attempt and has_answer:
-            attempt_id = str(uuid.uuid4())
             async with conn.transaction():
-                await conn.execute(
-                    """
-                    INSERT INTO exam_attempt
-                        (id, user_id, quiz_id, content_id, score_percent, passed)
-                    VALUES ($1, $2, $3, $4, $5, $6)
-                    """,
-                    attempt_id,
-                    x_user_id,  # puede ser None
-                    quiz_id,
-                    content_id,
-                    score,
-                    passed,
+                graded = await grade_and_record_attempt(
+                    conn,
+                    attempt_id=str(uuid.uuid4()),
+                    content_id=content_id,
+                    user_id=x_user_id,  # puede ser None
+                    answers=answers,
+                    pass_threshold=PASS_THRESHOLD,
                 )
-
-                for qid, oid, is_ok in answer_records:
-                    await conn.execute(
-                        """
-                        INSERT INTO exam_answer
-                            (id, attempt_id, question_id, option_id, is_correct)
-                        VALUES ($1, $2, $3, $4, $5)
-                        """,
-                        str(uuid.uuid4()),
-                        attempt_id,
-                        qid,
-                        oid,
-                        is_ok,
+                if graded is None:
+                    raise HTTPException(
+                        status_code=404,
+                        detail="No existe quiz para este contenido.",
                     )
+                quiz_id = str(graded["quiz_id"])
+                total = int(graded["total"])
+                correct_count = int(graded["correct"])
+                score = float(graded["score_percent"])
+                passed = bool(graded["passed"])
 
                 # Emitir certificado si procede
-                if passed and x_user_id and attempt_id:
-                    await _maybe_issue_certificate(
+                if passed and x_user_id:
+                    certificate_issued = await issue_certificate(
                         conn,
                         user_id=x_user_id,
                         content_id=content_id,
-                        attempt_id=attempt_id,
+                        attempt_id=str(graded["attempt_id"]),
                         score_percent=score,
                     )
+        else:
+            # Sin tablas de intentos: se corrige en memoria con el quiz en caché
+            quiz = await get_quiz(content_id, conn)
+            if not quiz:
+                raise HTTPException(
+                    status_code=404,
+                    detail="No existe quiz para este contenido.",
+                )
+            quiz_id = quiz["quiz_id"]
+            total = len(quiz["questions"])
+            _, correct_count = _grade_with_quiz(quiz, answers)
+            score = (correct_count / total * 100.0) if total else 0.0
+            passed = score >= PASS_THRESHOLD
+
+        question_results: List[QuestionResult] = []
+        if details:
+            if quiz is None:
+                quiz = await get_quiz(content_id, conn)
+                if quiz is not None and quiz["quiz_id"] != quiz_id:
+                    # La caché tenía un quiz anterior al que se corrigió
+                    quiz_cache.invalidate(content_id)
+                    quiz = await get_quiz(content_id, conn)
+            if quiz is not None:
+                question_results, _ = _grade_with_quiz(quiz, answers)
 
         return SubmitResult(
             ok=True,
             total_questions=total,
             correct_count=correct_count,
             score_percent=round(score, 2),
-            details=details,
+            details=question_results,
             passed=passed,
+            certificate_issued=certificate_issued,
         )
 
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error evaluando examen: {e}")
-    finally:
-        await conn.close()
@@ -1,20 +1,12 @@
 # backend_eval/routers/exams.py
-import os, uuid, random
-from fastapi import APIRouter, HTTPException
+import json, uuid, random
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-import psycopg2
-import psycopg2.extras as _ext
+import asyncpg
 
-router = APIRouter(prefix="/exams", tags=["exams"])
+from db import get_conn
 
-def db():
-    return psycopg2.connect(
-        host=os.getenv("DB_HOST", "db"),
-        port=os.getenv("DB_PORT", "5432"),
-        dbname=os.getenv("DB_NAME", "guidesphere"),
-        user=os.getenv("DB_USER", "postgres"),
-        password=os.getenv("DB_PASS", "postgres"),
-    )
+router = APIRouter(prefix="/exams", tags=["exams"])
 
 class GenerateReq(BaseModel):
     material_id: str
@@ -27,64 +19,66 @@ class SubmitReq(BaseModel):
 PASS_MIN = 0.60
 
 @router.post("/generate")
-def generate(req: GenerateReq):
+async def generate(req: GenerateReq, conn: asyncpg.Connection = Depends(get_conn)):
     rng_seed = random.getrandbits(63)
     exam_id = str(uuid.uuid4())
 
-    with db() as conn, conn.cursor(cursor_factory=_ext.DictCursor) as cur:
-        cur.execute(
-            """
-            SELECT id, question, option_a, option_b, option_c, option_d, correct
-            FROM question_bank
-            WHERE material_id = %s::uuid
-            ORDER BY random() LIMIT 5
-            """,
-            (req.material_id,),
-        )
-        rows = cur.fetchall()
-        if len(rows) < 5:
-            raise HTTPException(400, "Banco insuficiente para este material (se requieren 5).")
-
-        cur.execute(
+    rows = await conn.fetch(
+        """
+        SELECT id, question, option_a, option_b, option_c, option_d, correct
+        FROM question_bank
+        WHERE material_id = $1::uuid AND retired_at IS NULL
+        ORDER BY random() LIMIT 5
+        """,
+        req.material_id,
+    )
+    if len(rows) < 5:
+        raise HTTPException(400, "Banco insuficiente para este material (se requieren 5).")
+
+    rows = list(rows)
+    rnd = random.Random(rng_seed)
+    rnd.shuffle(rows)
+
+    # Preguntas ya barajadas, en memoria: se insertan de una vez y se
+    # devuelven sin volver a consultarlas.
+    qs = []
+    for idx, r in enumerate(rows, start=1):
+        orig = {'A': r['option_a'], 'B': r['option_b'], 'C': r['option_c'], 'D': r['option_d']}
+        correct_text = orig[r['correct']]
+        opts = [('A', orig['A']), ('B', orig['B']), ('C', orig['C']), ('D', orig['D'])]
+        random.Random(rng_seed + idx).shuffle(opts)
+        A, B, C, D = [t for _, t in opts]
+        new_correct = next(letter for letter, txt in opts if txt == correct_text)
+        qs.append({"bank_id": r['id'], "question": r['question'], "option_a": A, "option_b": B,
+                   "option_c": C, "option_d": D, "correct": new_correct, "order_index": idx})
+
+    async with conn.transaction():
+        await conn.execute(
             """
             INSERT INTO exam_instances (id, material_id, user_id, rng_seed, status)
-            VALUES (%s::uuid, %s::uuid, %s::uuid, %s, 'generated')
+            VALUES ($1::uuid, $2::uuid, $3::uuid, $4, 'generated')
             """,
-            (exam_id, req.material_id, req.user_id, rng_seed),
+            exam_id, req.material_id, req.user_id, rng_seed,
         )
-
-        rnd = random.Random(rng_seed)
-        rnd.shuffle(rows)
-
-        for idx, r in enumerate(rows, start=1):
-            orig = {'A': r['option_a'], 'B': r['option_b'], 'C': r['option_c'], 'D': r['option_d']}
-            correct_text = orig[r['correct']]
-            opts = [('A', orig['A']), ('B', orig['B']), ('C', orig['C']), ('D', orig['D'])]
-            random.Random(rng_seed + idx).shuffle(opts)
-            A, B, C, D = [t for _, t in opts]
-            new_correct = next(letter for letter, txt in opts if txt == correct_text)
-
-            cur.execute(
-                """
-                INSERT INTO exam_instance_questions
-                  (exam_id, question, option_a, option_b, option_c, option_d, correct, order_index)
-                VALUES (%s::uuid, %s, %s, %s, %s, %s, %s, %s)
-                """,
-                (exam_id, r['question'], A, B, C, D, new_correct, idx),
-            )
-
-        conn.commit()
-
-        cur.execute(
+        await conn.execute(
             """
-            SELECT question, option_a, option_b, option_c, option_d, order_index
-            FROM exam_instance_questions
-            WHERE exam_id = %s::uuid
-            ORDER BY order_index
+            INSERT INTO exam_instance_questions
+              (exam_id, bank_id, question, option_a, option_b, option_c, option_d, correct, order_index)
+            SELECT $1::uuid, q.*
+            FROM unnest($2::int[], $3::text[], $4::text[], $5::text[], $6::text[], $7::text[],
+                        $8::text[], $9::smallint[])
+                 AS q(bank_id, question, option_a, option_b, option_c, option_d, correct, order_index)
             """,
-            (exam_id,),
+            exam_id,
+            [q["bank_id"] for q in qs],
+            [q["question"] for q in qs],
+            [q["option_a"] for q in qs],
+            [q["option_b"] for q in qs],
+            [q["option_c"] for q in qs],
+            [q["option_d"] for q in qs],
+            [q["correct"] for q in qs],
+            [q["order_index"] for q in qs],
         )
-        qs = cur.fetchall()
 
     return {
         "attempt_id": exam_id,
@@ -96,40 +90,37 @@ def generate(req: GenerateReq):
     }
 
 @router.post("/submit")
-def submit(req: SubmitReq):
-    with db() as conn, conn.cursor(cursor_factory=_ext.DictCursor) as cur:
-        cur.execute("SELECT user_id FROM exam_instances WHERE id = %s::uuid", (req.attempt_id,))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(404, "Intento no encontrado")
-        user_id = str(row["user_id"])
-
-        cur.execute(
-            """
-            SELECT order_index, correct
-            FROM exam_instance_questions
-            WHERE exam_id = %s::uuid
-            ORDER BY order_index
-            """,
-            (req.attempt_id,),
-        )
-        keys = cur.fetchall()
-        if not keys:
-            raise HTTPException(400, "No hay preguntas para este intento")
+async def submit(req: SubmitReq, conn: asyncpg.Connection = Depends(get_conn)):
+    row = await conn.fetchrow("SELECT user_id FROM exam_instances WHERE id = $1::uuid", req.attempt_id)
+    if not row:
+        raise HTTPException(404, "Intento no encontrado")
+    user_id = str(row["user_id"])
+
+    keys = await conn.fetch(
+        """
+        SELECT order_index, correct
+        FROM exam_instance_questions
+        WHERE exam_id = $1::uuid
+        ORDER BY order_index
+        """,
+        req.attempt_id,
+    )
+    if not keys:
+        raise HTTPException(400, "No hay preguntas para este intento")
 
-        total = len(keys)
-        corrects = sum(1 for k in keys if str(req.answers.get(str(k["order_index"]), "")).upper() == k["correct"])
-        score = round((corrects / total) * 100.0, 2)
-        passed = (corrects / total) >= PASS_MIN
+    total = len(keys)
+    corrects = sum(1 for k in keys if str(req.answers.get(str(k["order_index"]), "")).upper() == k["correct"])
+    score = round((corrects / total) * 100.0, 2)
+    passed = (corrects / total) >= PASS_MIN
 
-        cur.execute(
+    async with conn.transaction():
+        await conn.execute(
             """
             INSERT INTO exam_attempts (id, exam_id, user_id, answers, score, passed)
-            VALUES (%s::uuid, %s::uuid, %s::uuid, %s, %s, %s)
+            VALUES ($1::uuid, $2::uuid, $3::uuid, $4::jsonb, $5, $6)
             """,
-            (str(uuid.uuid4()), req.attempt_id, user_id, _ext.Json(req.answers), score, passed),
+            str(uuid.uuid4()), req.attempt_id, user_id, json.dumps(req.answers), score, passed,
         )
-        cur.execute("UPDATE exam_instances SET status = 'submitted' WHERE id = %s::uuid", (req.attempt_id,))
-        conn.commit()
+        await conn.execute("UPDATE exam_instances SET status = 'submitted' WHERE id = $1::uuid", req.attempt_id)
 
     return {"score": score, "passed": passed}
@@ -0,0 +1,115 @@
+# backend_eval/scripts/bench_question_generator.py
+"""
+Benchmark del generador local de preguntas armando un banco de curso:
+por frase (quiz_generator, una llamada por documento) vs. por lotes
+(services.batch_generator, un índice para todo el curso).
+
+Las dos variantes hacen el mismo trabajo: el corpus se parte en documentos
+de --doc-sentences frases y se piden --questions preguntas de cada uno.
+Se mide el tiempo total, frases del corpus por segundo y preguntas por
+segundo, es decir, cuánto cuesta de más el modo por lotes (que tokeniza
+todo el corpus) frente al generador por frase (que solo mira unas pocas).
+Por defecto el corpus es sintético en español (vocabulario con
+distribución de Zipf); con --files cada archivo (.txt) es un documento.
+
+Uso (desde backend_eval/):
+    python -m scripts.bench_question_generator [--sentences 1000 10000 50000]
+        [--doc-sentences 200] [--questions 20] [--files a.txt b.txt] [--repeat 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+from itertools import accumulate
+from typing import Callable, List
+
+from services.batch_generator import CorpusIndex
+from services.quiz_generator import _generate_questions_local
+from services.text_budget import split_sentences
+from services.quiz_generator import MIN_SENT_LEN
+
+_SYLLABLES = ["ta", "con", "de", "ri", "mo", "sa", "len", "tor", "ca", "pi", "ven", "dor", "la", "ne", "gu"]
+_FILLERS = ["el", "la", "de", "en", "y", "que", "con", "por", "para", "los", "las", "una", "del"]
+
+
+def _synthetic_corpus(n_sentences: int, doc_sentences: int, seed: int = 7) -> List[str]:
+    rnd = random.Random(seed)
+    vocab = sorted({
+        "".join(rnd.choice(_SYLLABLES) for _ in range(rnd.randint(2, 5)))
+        for _ in range(6000)
+    })
+    # Zipf; pesos acumulados una vez (choices los recalcula en cada llamada)
+    cum_weights = list(accumulate(1.0 / (rank + 1) for rank in range(len(vocab))))
+    sentences = []
+    for _ in range(n_sentences):
+        words: List[str] = []
+        for _ in range(rnd.randint(12, 20)):
+            words.append(rnd.choice(_FILLERS) if rnd.random() < 0.35
+                         else rnd.choices(vocab, cum_weights=cum_weights)[0])
+        words[0] = words[0].capitalize()
+        sentences.append(" ".join(words) + ".")
+    return [
+        " ".join(sentences[i:i + doc_sentences])
+        for i in range(0, len(sentences), doc_sentences)
+    ]
+
+
+def _best_of(fn: Callable[[], object], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times) if repeat > 1 else statistics.mean(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sentences", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--doc-sentences", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=20, help="preguntas por documento")
+    parser.add_argument("--files", nargs="*")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.files:
+        docs = []
+        for path in args.files:
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                docs.append(f.read())
+        cases = [(f"{len(docs)} archivos", docs)]
+    else:
+        cases = [
+            (f"sintético {n}", _synthetic_corpus(n, args.doc_sentences))
+            for n in args.sentences
+        ]
+
+    q = args.questions
+    print(f"preguntas por documento={q}  repeticiones={args.repeat}\n")
+    print(f"{'corpus':<16} | {'docs':>5} | {'modo':<10} | {'frases':>7} | {'preguntas':>9} | {'s':>7} | {'frases/s':>10} | {'preg/s':>8}")
+    print("-" * 96)
+    for label, docs in cases:
+        n = sum(len(split_sentences(d, MIN_SENT_LEN)) for d in docs)
+
+        def per_sentence():
+            # Como se armaba un banco antes: una llamada por documento
+            return [_generate_questions_local(d, q)["questions"] for d in docs]
+
+        def batch():
+            index = CorpusIndex(docs)
+            return [index.generate(q, text=i)["questions"] for i in range(len(docs))]
+
+        for mode, fn in (("por frase", per_sentence), ("lote", batch)):
+            got = sum(len(qs) for qs in fn())
+            secs = _best_of(fn, args.repeat)
+            print(
+                f"{label:<16} | {len(docs):>5} | {mode:<10} | {n:>7} | {got:>9} | {secs:>7.3f} | "
+                f"{n / secs:>10.0f} | {got / secs:>8.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# backend_eval/scripts/fake_openai_server.py
+"""
+Servidor local que imita POST /v1/responses de OpenAI, para probar
+services/openai_client y la generación con OpenAI sin red ni costo.
+
+Responde preguntas de relleno en el formato que pide quiz_generator (tantas
+como diga "genera EXACTAMENTE N preguntas" en el prompt). Con --fail-every N
+cada N-ésima petición responde --fail-status (429 o 5xx) para ejercitar los
+reintentos, y --latency simula el tiempo del modelo.
+
+Uso (desde backend_eval/):
+    python -m scripts.fake_openai_server [--port 8765] [--latency 0.2] [--fail-every 3]
+    OPENAI_API_KEY=fake EVAL_OPENAI_BASE_URL=http://127.0.0.1:8765/v1 uvicorn main:app
+
+Los escenarios (coalescencia, trozos en paralelo, reintentos, límite de
+tasa) se comprueban con pytest en tests/test_openai_client.py.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+_COUNT_RE = re.compile(r"EXACTAMENTE (\d+) preguntas")
+
+
+class FakeState:
+    def __init__(self, latency: float, fail_every: int, fail_status: int):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.fail_status = fail_status
+        self.requests = 0
+        self.failed = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def enter(self) -> int:
+        with self._lock:
+            self.requests += 1
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            return self.requests
+
+    def leave(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+
+def _response_body(count: int, n: int) -> Dict[str, Any]:
+    questions = [
+        {
+            "prompt": f"Pregunta {n}.{i} de prueba",
+            "type": "multiple_choice",
+            "options": [{"text": f"Opción {j}", "is_correct": j == 0} for j in range(4)],
+        }
+        for i in range(count)
+    ]
+    text = json.dumps({"fingerprint": f"fake-{n}", "questions": questions}, ensure_ascii=False)
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": "fake",
+        "status": "completed",
+        "output": [{
+            "id": f"msg_{uuid.uuid4().hex}",
+            "type": "message",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }],
+        "parallel_tool_calls": False,
+        "tool_choice": "auto",
+        "tools": [],
+    }
+
+
+def make_handler(state: FakeState):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):  # silencioso
+            pass
+
+        def _send(self, status: int, body: Dict[str, Any], headers: Dict[str, str] = {}) -> None:
+            raw = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            n = state.enter()
+            try:
+                time.sleep(state.latency)
+                if not self.path.endswith("/responses"):
+                    return self._send(404, {"error": {"message": "not found"}})
+                if state.fail_every and n % state.fail_every == 0:
+                    state.failed += 1
+                    return self._send(
+                        state.fail_status,
+                        {"error": {"message": "fallo simulado", "type": "server_error"}},
+                        {"Retry-After": "0"},
+                    )
+                user = next((m["content"] for m in payload.get("input", []) if m.get("role") == "user"), "")
+                m = _COUNT_RE.search(user)
+                self._send(200, _response_body(int(m.group(1)) if m else 5, n))
+            finally:
+                state.leave()
+
+    return Handler
+
+
+def serve(port: int, state: FakeState) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--fail-every", type=int, default=0)
+    parser.add_argument("--fail-status", type=int, default=503)
+    args = parser.parse_args()
+
+    state = FakeState(args.latency, args.fail_every, args.fail_status)
+    server = serve(args.port, state)
+    print(f"Fake OpenAI en http://127.0.0.1:{args.port}/v1 (Ctrl+C para salir)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
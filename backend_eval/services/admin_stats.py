@@ -0,0 +1,393 @@
+# backend_eval/services/admin_stats.py
+"""
+Estadísticas del panel de administración, materializadas.
+
+Calcular el resumen son una docena de COUNT(*) y dos agregaciones top-5
+sobre tablas que crecen sin límite (user_account, exam_attempt,
+enrollment, course_rating...). En vez de hacerlo en cada carga del panel,
+el resultado se guarda en la tabla admin_stats_snapshot (una sola fila,
+ver 004_admin_stats.sql) y GET /admin/stats/overview solo lee esa fila.
+
+- Se recalcula en segundo plano cada ADMIN_STATS_REFRESH_SEC segundos
+  (tarea arrancada en el lifespan) y a mano con POST /admin/stats/refresh.
+- Con varias réplicas, un advisory lock hace que solo una recalcule; las
+  demás ven la fila nueva.
+- La respuesta incluye refreshed_at y stale_seconds.
+- Las secciones del cálculo (conteos, top-5) corren en paralelo en como
+  mucho EVAL_ADMIN_STATS_CONCURRENCY conexiones: la del recálculo (la que
+  tiene el lock) y las que falten del pool. Cada consulta tiene su
+  timeout; una lenta solo degrada sus campos (ver compute_overview y
+  "degraded" en la respuesta).
+- Dentro del proceso hay un solo recálculo a la vez: el bucle, un POST y
+  un GET en frío que coincidan esperan el mismo, no lanzan otro.
+- Sin la tabla (migración sin aplicar) se calcula en vivo, como antes.
+
+Configuración por entorno:
+  - EVAL_ADMIN_STATS_REFRESH_SEC       segundos entre recálculos (por defecto 300)
+  - EVAL_ADMIN_STATS_SECTION_TIMEOUT   límite por sección del cálculo (por defecto 5)
+  - EVAL_ADMIN_STATS_CONCURRENCY       conexiones por recálculo, contando la
+                                       del lock (por defecto 3)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import asyncpg
+
+from db import acquire
+from services.schema_registry import schema_registry
+
+ADMIN_STATS_REFRESH_SEC = float(os.getenv("EVAL_ADMIN_STATS_REFRESH_SEC", "300"))
+ADMIN_STATS_SECTION_TIMEOUT = float(os.getenv("EVAL_ADMIN_STATS_SECTION_TIMEOUT", "5"))
+ADMIN_STATS_CONCURRENCY = max(1, int(os.getenv("EVAL_ADMIN_STATS_CONCURRENCY", "3")))
+
+# Clave del advisory lock que serializa los recálculos entre réplicas
+_REFRESH_LOCK_KEY = 0x61647374  # "adst"
+
+
+async def _count(conn: asyncpg.Connection, table_name: str, field: str) -> Dict[str, Any]:
+    total = await conn.fetchval(
+        f"SELECT COUNT(*) FROM {table_name}", timeout=ADMIN_STATS_SECTION_TIMEOUT
+    )
+    return {field: int(total or 0)}
+
+
+async def _users(conn: asyncpg.Connection) -> Dict[str, Any]:
+    # estos asumen que role tiene estos valores en tu esquema
+    row = await conn.fetchrow(
+        """
+        SELECT COUNT(*)                                     AS total,
+               COUNT(*) FILTER (WHERE role = 'student')     AS students,
+               COUNT(*) FILTER (WHERE role = 'professor')   AS professors
+        FROM user_account
+        """,
+        timeout=ADMIN_STATS_SECTION_TIMEOUT,
+    )
+    return {
+        "total_users": int(row["total"] or 0),
+        "total_students": int(row["students"] or 0),
+        "total_professors": int(row["professors"] or 0),
+    }
+
+
+async def _top_enrolled(conn: asyncpg.Connection, enrollment_table: str) -> Dict[str, Any]:
+    rows = await conn.fetch(
+        f"""
+        SELECT
+          c.id   AS course_id,
+          c.title,
+          COUNT(e.*) AS total
+        FROM course c
+        JOIN {enrollment_table} e ON e.course_id = c.id
+        GROUP BY c.id, c.title
+        ORDER BY total DESC
+        LIMIT 5
+        """,
+        timeout=ADMIN_STATS_SECTION_TIMEOUT,
+    )
+    return {"top_enrolled": [
+        {"course_id": str(r["course_id"]), "title": r["title"], "value": float(r["total"] or 0)}
+        for r in rows
+    ]}
+
+
+async def _top_rated(conn: asyncpg.Connection) -> Dict[str, Any]:
+    rows = await conn.fetch(
+        """
+        SELECT
+          c.id   AS course_id,
+          c.title,
+          AVG(cr.rating)::numeric(4,2) AS avg_rating
+        FROM course c
+        JOIN course_rating cr ON cr.course_id = c.id
+        GROUP BY c.id, c.title
+        HAVING COUNT(cr.*) >= 1
+        ORDER BY avg_rating DESC
+        LIMIT 5
+        """,
+        timeout=ADMIN_STATS_SECTION_TIMEOUT,
+    )
+    return {"top_rated": [
+        {"course_id": str(r["course_id"]), "title": r["title"], "value": float(r["avg_rating"] or 0.0)}
+        for r in rows
+    ]}
+
+
+# Valores de cada campo cuando su sección no está disponible
+EMPTY_OVERVIEW: Dict[str, Any] = {
+    "total_users": 0,
+    "total_students": 0,
+    "total_professors": 0,
+    "total_courses": 0,
+    "total_enrollments": 0,
+    "total_exam_attempts": 0,
+    "total_certificates": 0,
+    "top_enrolled": [],
+    "top_rated": [],
+}
+
+# Campos que calcula cada sección
+_SECTION_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "users": ("total_users", "total_students", "total_professors"),
+    "courses": ("total_courses",),
+    "exam_attempts": ("total_exam_attempts",),
+    "certificates": ("total_certificates",),
+    "enrollments": ("total_enrollments",),
+    "top_enrolled": ("top_enrolled",),
+    "top_rated": ("top_rated",),
+}
+
+
+Section = Callable[[asyncpg.Connection], Awaitable[Dict[str, Any]]]
+
+
+async def _run_sections(
+    conn: asyncpg.Connection,
+    sections: Dict[str, Section],
+) -> Dict[str, Any]:
+    """
+    Ejecuta las secciones repartidas entre `conn` y hasta
+    ADMIN_STATS_CONCURRENCY - 1 conexiones más del pool; cada una toma la
+    siguiente sección pendiente. Devuelve {nombre: resultado o excepción}.
+
+    Cada sección corre en su propia (sub)transacción: en `conn`, que puede
+    estar dentro de la del lock, es un savepoint, así que una consulta
+    cancelada por timeout no invalida lo demás.
+    """
+    results: Dict[str, Any] = {}
+    pending = iter(list(sections))
+
+    async def work(c: asyncpg.Connection) -> None:
+        for name in pending:  # iterador compartido: cada sección la corre uno
+            try:
+                async with c.transaction():
+                    results[name] = await sections[name](c)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                results[name] = e
+
+    async def pooled() -> None:
+        try:
+            async with acquire() as c:
+                await work(c)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            pass  # sin conexión libre: las secciones las corren los demás
+
+    extra = min(ADMIN_STATS_CONCURRENCY, len(sections)) - 1
+    await asyncio.gather(work(conn), *(pooled() for _ in range(extra)))
+    return results
+
+
+async def compute_overview(
+    conn: asyncpg.Connection,
+    previous: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Calcula el resumen completo contra las tablas (la parte costosa).
+
+    Las secciones corren en paralelo (ver _run_sections) y cada consulta
+    tiene un límite de ADMIN_STATS_SECTION_TIMEOUT segundos. Si una falla o
+    se pasa de tiempo, sus campos conservan el valor de `previous` (o 0 / [])
+    y su nombre queda en "degraded"; el resto del resumen no espera por ella.
+    """
+    # Qué tablas opcionales existen (registro en memoria, casi sin costo)
+    has = {
+        t: await schema_registry.table_exists(t, conn)
+        for t in ("exam_attempt", "course_certificate", "enrollment",
+                  "course_enrollment", "course_rating")
+    }
+    enrollment_table = (
+        "enrollment" if has["enrollment"]
+        else "course_enrollment" if has["course_enrollment"]
+        else None
+    )
+
+    sections: Dict[str, Section] = {
+        "users": _users,
+        "courses": partial(_count, table_name="course", field="total_courses"),
+    }
+    if has["exam_attempt"]:
+        sections["exam_attempts"] = partial(_count, table_name="exam_attempt", field="total_exam_attempts")
+    if has["course_certificate"]:
+        sections["certificates"] = partial(_count, table_name="course_certificate", field="total_certificates")
+    if enrollment_table:
+        sections["enrollments"] = partial(_count, table_name=enrollment_table, field="total_enrollments")
+        sections["top_enrolled"] = partial(_top_enrolled, enrollment_table=enrollment_table)
+    if has["course_rating"]:
+        sections["top_rated"] = _top_rated
+
+    results = await _run_sections(conn, sections)
+
+    fallback = {**EMPTY_OVERVIEW, **(previous or {})}
+    data: Dict[str, Any] = dict(EMPTY_OVERVIEW)
+    degraded: List[str] = []
+    for name in sections:
+        result = results.get(name)
+        if result is None or isinstance(result, BaseException):
+            degraded.append(name)
+            # Los campos que habría dado la sección se toman del resumen anterior
+            data.update({k: fallback[k] for k in _SECTION_FIELDS[name]})
+        else:
+            data.update(result)
+    data["degraded"] = degraded
+    return data
+
+
+Snapshot = Tuple[Dict[str, Any], datetime]
+
+
+class AdminStatsSnapshot:
+    def __init__(self, interval: float = ADMIN_STATS_REFRESH_SEC):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.last_duration_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+        # Recálculo en curso en este proceso (los que llegan mientras, lo esperan)
+        self._inflight: Optional["asyncio.Future[Snapshot]"] = None
+
+    async def _enabled(self, conn: asyncpg.Connection) -> bool:
+        return await schema_registry.table_exists("admin_stats_snapshot", conn)
+
+    async def read(self, conn: asyncpg.Connection) -> Optional[Snapshot]:
+        """La fila materializada, o None si no hay tabla o aún no se calculó."""
+        if not await self._enabled(conn):
+            return None
+        row = await conn.fetchrow("SELECT data, refreshed_at FROM admin_stats_snapshot WHERE id = 1")
+        if row is None:
+            return None
+        return json.loads(row["data"]), row["refreshed_at"]
+
+    async def get(self, conn: asyncpg.Connection) -> Snapshot:
+        """Lo materializado; si no lo hay todavía, lo calcula (y lo guarda si se puede)."""
+        snap = await self.read(conn)
+        if snap is not None:
+            return snap
+        return await self.refresh(conn)
+
+    async def refresh(
+        self,
+        conn: asyncpg.Connection,
+        *,
+        max_age: Optional[float] = None,
+    ) -> Snapshot:
+        """
+        Recalcula y guarda el resumen. Con `max_age`, no hace nada si la fila
+        tiene menos de esos segundos (otra réplica acaba de recalcular).
+
+        Si ya hay un recálculo en curso en el proceso, se espera ese en vez
+        de lanzar otro (y de tomar más conexiones).
+        """
+        while self._inflight is not None:
+            inflight = self._inflight
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise  # cancelaron a quien esperaba, no al recálculo
+                # Se canceló el recálculo de otro (su request se cortó): otra vuelta
+
+        fut: "asyncio.Future[Snapshot]" = asyncio.get_running_loop().create_future()
+        self._inflight = fut
+        try:
+            snap = await self._refresh(conn, max_age=max_age)
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # marcado como recuperado si nadie más esperaba
+            raise
+        else:
+            fut.set_result(snap)
+            return snap
+        finally:
+            if self._inflight is fut:
+                self._inflight = None
+
+    async def _refresh(
+        self,
+        conn: asyncpg.Connection,
+        *,
+        max_age: Optional[float],
+    ) -> Snapshot:
+        if not await self._enabled(conn):
+            return await compute_overview(conn), datetime.now(timezone.utc)
+        previous = await self.read(conn)
+
+        async with conn.transaction():
+            # Otra réplica recalculando: se espera a que termine y se usa su fila
+            await conn.execute("SELECT pg_advisory_xact_lock($1)", _REFRESH_LOCK_KEY)
+            if max_age is not None:
+                snap = await self.read(conn)
+                if snap is not None:
+                    age = (datetime.now(timezone.utc) - snap[1]).total_seconds()
+                    if age < max_age:
+                        return snap
+
+            t0 = time.perf_counter()
+            data = await compute_overview(conn, previous[0] if previous else None)
+            refreshed_at = await conn.fetchval(
+                """
+                INSERT INTO admin_stats_snapshot (id, data, refreshed_at, duration_ms)
+                VALUES (1, $1::jsonb, NOW(), $2)
+                ON CONFLICT (id) DO UPDATE
+                  SET data = EXCLUDED.data,
+                      refreshed_at = EXCLUDED.refreshed_at,
+                      duration_ms = EXCLUDED.duration_ms
+                RETURNING refreshed_at
+                """,
+                json.dumps(data),
+                int((time.perf_counter() - t0) * 1000),
+            )
+            self.last_duration_ms = round((time.perf_counter() - t0) * 1000, 1)
+        self.refreshes += 1
+        return data, refreshed_at
+
+    # ----- recálculo periódico -----
+
+    def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                async with acquire() as conn:
+                    await self.refresh(conn, max_age=self.interval / 2)
+                self.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Se reintenta en la siguiente vuelta; el panel sigue con la fila anterior
+                self.last_error = f"{e.__class__.__name__}: {e}"[:300]
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_sec": self.interval,
+            "running": self._task is not None,
+            "refreshes": self.refreshes,
+            "last_duration_ms": self.last_duration_ms,
+            "last_error": self.last_error,
+        }
+
+
+# Instancia compartida del proceso
+admin_stats = AdminStatsSnapshot()
@@ -0,0 +1,150 @@
+# backend_eval/services/audio_segments.py
+"""
+Audio de los videos para la transcripción por segmentos.
+
+  1) `extract_audio`: ffmpeg extrae una sola vez el audio a WAV mono 16 kHz
+     (el formato que Whisper usa internamente).
+  2) `detect_silences`: el filtro silencedetect de ffmpeg localiza pausas.
+  3) `plan_segments`: corta el audio en tramos de ~EVAL_TRANSCRIBE_SEGMENT_SEC
+     segundos, siempre que se pueda en mitad de un silencio para no partir
+     palabras.
+  4) `read_wav_slice`: cada worker lee solo su tramo del WAV.
+
+Configuración por entorno:
+  - EVAL_FFMPEG_BIN             ejecutable de ffmpeg (por defecto "ffmpeg")
+  - EVAL_TRANSCRIBE_SEGMENT_SEC duración objetivo de cada tramo (por defecto 180;
+                                0 = transcribir el video entero de una vez)
+  - EVAL_SILENCE_NOISE_DB       umbral de silencio en dB (por defecto -35)
+  - EVAL_SILENCE_MIN_SEC        pausa mínima para considerarla silencio (por defecto 0.4)
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import shutil
+import subprocess
+import wave
+from typing import List, Tuple
+
+FFMPEG_BIN = os.getenv("EVAL_FFMPEG_BIN", "ffmpeg")
+SEGMENT_SEC = float(os.getenv("EVAL_TRANSCRIBE_SEGMENT_SEC", "180"))
+SILENCE_NOISE_DB = float(os.getenv("EVAL_SILENCE_NOISE_DB", "-35"))
+SILENCE_MIN_SEC = float(os.getenv("EVAL_SILENCE_MIN_SEC", "0.4"))
+
+SAMPLE_RATE = 16000
+
+_SILENCE_START = re.compile(r"silence_start:\s*(-?[\d.]+)")
+_SILENCE_END = re.compile(r"silence_end:\s*(-?[\d.]+)")
+
+Segment = Tuple[float, float]
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which(FFMPEG_BIN) is not None
+
+
+def _run_ffmpeg(args: List[str]) -> subprocess.CompletedProcess:
+    proc = subprocess.run(
+        [FFMPEG_BIN, "-hide_banner", "-nostdin", *args],
+        capture_output=True,
+        text=True,
+        errors="ignore",
+    )
+    if proc.returncode != 0:
+        tail = (proc.stderr or "").strip().splitlines()[-1:] or ["sin salida"]
+        raise RuntimeError(f"ffmpeg falló ({proc.returncode}): {tail[0]}")
+    return proc
+
+
+def extract_audio(video_path: str, wav_path: str) -> str:
+    """Extrae el audio a WAV PCM mono 16 kHz. Devuelve `wav_path`."""
+    os.makedirs(os.path.dirname(wav_path), exist_ok=True)
+    tmp_path = wav_path + ".tmp"
+    _run_ffmpeg([
+        "-y", "-i", video_path,
+        "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-c:a", "pcm_s16le",
+        "-f", "wav", tmp_path,
+    ])
+    os.replace(tmp_path, wav_path)
+    return wav_path
+
+
+def wav_duration(wav_path: str) -> float:
+    with wave.open(wav_path, "rb") as w:
+        return w.getnframes() / float(w.getframerate())
+
+
+def detect_silences(
+    wav_path: str,
+    *,
+    noise_db: float = SILENCE_NOISE_DB,
+    min_sec: float = SILENCE_MIN_SEC,
+) -> List[Segment]:
+    """Intervalos (inicio, fin) en segundos donde el audio está en silencio."""
+    proc = _run_ffmpeg([
+        "-i", wav_path,
+        "-af", f"silencedetect=noise={noise_db}dB:d={min_sec}",
+        "-f", "null", "-",
+    ])
+    silences: List[Segment] = []
+    start = None
+    for line in proc.stderr.splitlines():
+        m = _SILENCE_START.search(line)
+        if m:
+            start = max(0.0, float(m.group(1)))
+            continue
+        m = _SILENCE_END.search(line)
+        if m and start is not None:
+            silences.append((start, float(m.group(1))))
+            start = None
+    return silences
+
+
+def plan_segments(
+    duration: float,
+    silences: List[Segment],
+    *,
+    target: float = SEGMENT_SEC,
+) -> List[Segment]:
+    """
+    Parte [0, duration] en tramos de ~`target` segundos.
+
+    Cada corte va al centro del silencio más cercano al objetivo dentro de
+    [target/2, 3·target/2] desde el corte anterior; si no hay ninguno se
+    corta en seco. Un resto menor que target/2 se une al último tramo.
+    """
+    if target <= 0 or duration <= target * 1.5:
+        return [(0.0, duration)]
+
+    mids = [(s + e) / 2.0 for s, e in silences]
+    segments: List[Segment] = []
+    last = 0.0
+    while duration - last > target * 1.5:
+        lo, hi, want = last + target / 2, last + target * 1.5, last + target
+        inside = [m for m in mids if lo <= m <= hi]
+        cut = min(inside, key=lambda m: abs(m - want)) if inside else want
+        segments.append((last, cut))
+        last = cut
+    segments.append((last, duration))
+    return segments
+
+
+def read_wav_slice(wav_path: str, start: float, end: float) -> bytes:
+    """Muestras PCM s16le del tramo [start, end) del WAV."""
+    with wave.open(wav_path, "rb") as w:
+        rate = w.getframerate()
+        first = int(start * rate)
+        w.setpos(min(first, w.getnframes()))
+        return w.readframes(max(0, int(end * rate) - first))
+
+
+__all__ = [
+    "SEGMENT_SEC",
+    "ffmpeg_available",
+    "extract_audio",
+    "wav_duration",
+    "detect_silences",
+    "plan_segments",
+    "read_wav_slice",
+]
@@ -0,0 +1,251 @@
+# backend_eval/services/batch_generator.py
+"""
+Generador local de preguntas por lotes, para bancos de cientos de preguntas
+a partir de un curso completo (varios documentos/transcripciones).
+
+A diferencia de quiz_generator._generate_questions_local, que mira unas
+pocas frases al azar, aquí el corpus se tokeniza una sola vez y se arma un
+índice de frecuencias:
+
+  - df / idf por término (en cuántas frases aparece),
+  - cf por término (cuántas veces aparece en total),
+  - términos agrupados por "forma" (número, Nombre Propio, palabra) y
+    ordenados por frecuencia.
+
+Con eso:
+  - el hueco de cada cloze es el término más informativo de la frase
+    (mayor idf, con preferencia por palabras largas),
+  - los distractores son otros términos del corpus de la misma forma y
+    frecuencia parecida (no la palabra invertida o en mayúsculas),
+  - las frases se eligen de mayor a menor informatividad, sin repetir
+    término objetivo.
+
+El resultado es determinista para (corpus, count, seed) y tiene el mismo
+formato que generate_questions, más un "meta" por pregunta. Con varios
+textos (p. ej. los contenidos de un curso) se pueden pedir las preguntas de
+uno solo (`text=i`) con distractores sacados de todo el corpus.
+
+No es una optimización de velocidad. Tokeniza y puntúa todas las frases
+del corpus, mientras que el generador por frase solo mira unas pocas al
+azar: con el mismo trabajo (mismos documentos, mismas preguntas por
+documento) es unas 5–7 veces más lento, y casi todo ese tiempo es
+tokenizar. Se usa para pregenerar bancos (services/question_bank), fuera
+del camino de las peticiones, por la calidad de huecos y distractores.
+Coste medido con: python -m scripts.bench_question_generator
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import random
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from services.quiz_generator import KEYWORD_RE, MIN_SENT_LEN, STOPWORDS
+from services.text_budget import split_sentences
+
+# Vecinos por frecuencia que se consideran como distractores (a cada lado)
+DISTRACTOR_WINDOW = 12
+
+# Prefijo común a partir del cual dos términos se consideran variantes
+# (contenedor / contenedores) y no sirven como distractor uno del otro
+_VARIANT_PREFIX = 5
+
+
+@dataclass(slots=True)
+class _Sentence:
+    text: str
+    terms: List[str]  # claves en minúsculas, sin stopwords, en orden
+
+
+_DIGIT_RE = re.compile(r"\d")
+
+
+def _shape(surface: str) -> str:
+    if _DIGIT_RE.search(surface):
+        return "num"
+    if surface[:1].isupper():
+        return "cap"
+    return "word"
+
+
+class CorpusIndex:
+    """Frases del corpus tokenizadas una vez, con estadísticas por término."""
+
+    def __init__(self, texts: Iterable[str], *, min_sent_len: int = MIN_SENT_LEN):
+        self.sentences: List[_Sentence] = []
+        # Frases [inicio, fin) que vienen de cada texto de entrada
+        self.text_ranges: List[Tuple[int, int]] = []
+        # Tokens de todo el corpus en listas planas, contados al final con un
+        # solo Counter cada una (un update por frase cuesta más que contar)
+        all_surface: List[str] = []
+        all_terms: List[str] = []
+        doc_terms: List[str] = []  # términos distintos de cada frase, para df
+        digest = hashlib.sha256()
+        findall = KEYWORD_RE.findall
+
+        for text in texts:
+            digest.update(text.encode("utf-8"))
+            first = len(self.sentences)
+            for sent in split_sentences(text, min_sent_len):
+                surface = findall(sent)
+                terms = [t for t in map(str.lower, surface) if t not in STOPWORDS]
+                # Las stopwords se cuentan también, pero nunca se consultan
+                all_surface += surface
+                all_terms += terms
+                doc_terms += set(terms)
+                self.sentences.append(_Sentence(sent, terms))
+            self.text_ranges.append((first, len(self.sentences)))
+
+        cf = Counter(all_terms)
+        df = Counter(doc_terms)
+        surface_counts = Counter(all_surface)
+        n = len(self.sentences)
+        self.digest = digest.hexdigest()
+        self.cf: Dict[str, int] = dict(cf)
+        self.idf: Dict[str, float] = {k: math.log((1 + n) / (1 + d)) + 1.0 for k, d in df.items()}
+        # Grafía más frecuente de cada término (Docker / docker)
+        best: Dict[str, Tuple[int, str]] = {}
+        for tok, c in surface_counts.items():
+            key = tok.lower()
+            if key in cf and (key not in best or c > best[key][0]):
+                best[key] = (c, tok)
+        self.surface: Dict[str, str] = {k: tok for k, (_, tok) in best.items()}
+        self._scores: Dict[str, float] = {
+            k: idf * (1.0 + 0.05 * min(len(k), 12)) for k, idf in self.idf.items()
+        }
+
+        # Términos por forma, ordenados por frecuencia (para buscar vecinos)
+        self._shape_of = {k: _shape(s) for k, s in self.surface.items()}
+        by_shape: Dict[str, List[str]] = defaultdict(list)
+        for key, shape in self._shape_of.items():
+            by_shape[shape].append(key)
+        self._by_shape: Dict[str, List[str]] = {}
+        self._freqs: Dict[str, List[int]] = {}
+        for shape, keys in by_shape.items():
+            keys.sort(key=lambda k: (self.cf[k], k))
+            self._by_shape[shape] = keys
+            self._freqs[shape] = [self.cf[k] for k in keys]
+
+    def score(self, key: str) -> float:
+        """Informatividad de un término como hueco de cloze."""
+        return self._scores[key]
+
+    @staticmethod
+    def _span(text: str, key: str) -> Tuple[int, int]:
+        for m in KEYWORD_RE.finditer(text):
+            if m.group().lower() == key:
+                return m.start(), m.end()
+        raise ValueError(key)  # no ocurre: key salió de esta misma frase
+
+    def distractors(
+        self,
+        key: str,
+        n: int,
+        rnd: random.Random,
+        exclude: Set[str],
+    ) -> List[str]:
+        """`n` términos de la misma forma y frecuencia parecida a `key`."""
+
+        def ok(k: str) -> bool:
+            return (
+                k != key
+                and k not in exclude
+                and k[:_VARIANT_PREFIX] != key[:_VARIANT_PREFIX]
+            )
+
+        shape = self._shape_of[key]
+        keys, freqs = self._by_shape[shape], self._freqs[shape]
+        center = bisect_left(freqs, self.cf[key])
+        width = DISTRACTOR_WINDOW
+        picked: List[str] = []
+        while True:
+            window = keys[max(0, center - width): center + width + 1]
+            pool = [k for k in window if ok(k) and k not in picked]
+            picked.extend(rnd.sample(pool, min(len(pool), n - len(picked))))
+            if len(picked) >= n or width >= len(keys):
+                break
+            width *= 2
+
+        if len(picked) < n:
+            # Corpus pequeño: se completa con términos de otras formas
+            others = [k for s, ks in self._by_shape.items() if s != shape for k in ks]
+            others = [k for k in others if ok(k) and k not in picked]
+            others.sort(key=lambda k: abs(self.cf[k] - self.cf[key]))
+            picked.extend(others[: n - len(picked)])
+        return [self.surface[k] for k in picked]
+
+    def generate(self, count: int, *, seed: int = 0, text: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Hasta `count` preguntas. Con `text`, solo de las frases del texto de
+        entrada con ese índice (los distractores siguen saliendo de todo el corpus).
+        """
+        tag = f"{seed}" if text is None else f"{seed}:t{text}"
+        rnd = random.Random(f"{self.digest}:{tag}")
+        first, last = (0, len(self.sentences)) if text is None else self.text_ranges[text]
+
+        # Mejor término de cada frase (el primero si empatan), y frases de
+        # más a menos informativas
+        scores = self._scores
+        candidates: List[Tuple[float, int, str]] = []
+        for idx in range(first, last):
+            sent = self.sentences[idx]
+            if sent.terms:
+                key = max(sent.terms, key=scores.__getitem__)
+                candidates.append((scores[key], idx, key))
+        candidates.sort(key=lambda c: (-c[0], c[1]))
+
+        questions: List[Dict[str, Any]] = []
+        used: Set[str] = set()
+        for score, idx, key in candidates:
+            if len(questions) >= count:
+                break
+            if key in used:
+                continue
+            sent = self.sentences[idx]
+            wrong = self.distractors(key, 3, rnd, exclude=set(sent.terms))
+            if len(wrong) < 3:
+                continue
+            start, end = self._span(sent.text, key)
+            answer = sent.text[start:end]
+            if answer[:1].isupper():
+                # Hueco a inicio de frase: que la mayúscula no delate la respuesta
+                wrong = [w[:1].upper() + w[1:] for w in wrong]
+            options = [answer] + wrong
+            rnd.shuffle(options)
+            questions.append({
+                "prompt": sent.text[:start] + "____" + sent.text[end:],
+                "options": [{"text": o, "is_correct": o == answer} for o in options],
+                "meta": {
+                    "term": key,
+                    "idf": round(self.idf[key], 4),
+                    "cf": self.cf[key],
+                    "sentence": idx,
+                },
+            })
+            used.add(key)
+
+        return {
+            "fingerprint": f"{self.digest[:32]}:batch:{tag}",
+            "questions": questions,
+        }
+
+
+def generate_question_batch(
+    corpus: Union[str, Sequence[str]],
+    count: int,
+    *,
+    seed: int = 0,
+    index: Optional[CorpusIndex] = None,
+) -> Dict[str, Any]:
+    """
+    Genera `count` preguntas cloze a partir de uno o varios textos.
+    Es CPU-bound: desde código async, llamarla con asyncio.to_thread.
+    """
+    if index is None:
+        index = CorpusIndex([corpus] if isinstance(corpus, str) else corpus)
+    return index.generate(count, seed=seed)
@@ -1,9 +1,18 @@
 # backend_eval/services/doc_reader.py
+import asyncio
+import multiprocessing
 import os
-from typing import Optional
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Iterator, List, Optional
 
+import PyPDF2
 from PyPDF2 import PdfReader  # asegúrate de tener PyPDF2 instalado en el venv
 
+from services.extractors import COST_CHEAP, COST_CPU, Extractor, extractor_for, register_extractor
+from services.text_budget import TextBudget
+from services.text_cache import text_cache
+
 # ============================================================
 # Localización robusta de la carpeta de documentos dentro
 # del contenedor Docker de backend_eval
@@ -36,51 +45,215 @@ else:
     DOCS_DIR = os.path.join(os.path.abspath(os.path.join(HERE, "..")), "uploads", "docs")
 
 
-def _read_txt(path: str) -> str:
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        return f.read()
+# ============================================================
+# Extracción de PDF
+#
+# PyPDF2 es puro Python y CPU-bound: un manual de 300 páginas tarda
+# segundos. Nunca se ejecuta en el event loop; los rangos de páginas se
+# reparten en un pool de procesos y el texto sale página a página, en
+# orden, para poder cortar en cuanto haya suficiente.
+#
+#   EVAL_PDF_WORKERS         procesos de extracción (por defecto CPUs - 1, máx. 4;
+#                            0 = un hilo, lo normal con una sola CPU)
+#   EVAL_PDF_PAGES_PER_TASK  páginas por tarea del pool (por defecto 32)
+#   EVAL_PDF_MAX_PAGES       límite de páginas a leer (por defecto 0 = todas)
+# ============================================================
+
+PDF_WORKERS = int(os.getenv("EVAL_PDF_WORKERS", str(min(4, (os.cpu_count() or 1) - 1))))
+PDF_PAGES_PER_TASK = max(1, int(os.getenv("EVAL_PDF_PAGES_PER_TASK", "32")))
+PDF_MAX_PAGES = int(os.getenv("EVAL_PDF_MAX_PAGES", "0"))
+
+_pdf_executor: Optional[ProcessPoolExecutor] = None
+
 
+def _page_text(page) -> str:
+    try:
+        return page.extract_text() or ""
+    except Exception:
+        return ""
 
-def _read_pdf(path: str) -> str:
+
+def iter_pdf_pages(path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+    """Texto de las páginas [start, stop) del PDF, una a una (síncrono)."""
     reader = PdfReader(path)
-    texts: list[str] = []
-    for page in reader.pages:
-        try:
-            t = page.extract_text() or ""
-        except Exception:
-            t = ""
-        texts.append(t)
-    return "\n".join(texts)
+    total = len(reader.pages)
+    stop = total if stop is None else min(stop, total)
+    for i in range(start, stop):
+        yield _page_text(reader.pages[i])
+
+
+def _reader_range(reader: PdfReader, start: int, stop: int) -> List[str]:
+    return [_page_text(reader.pages[i]) for i in range(start, stop)]
+
+
+def _extract_pdf_range(path: str, start: int, stop: int) -> List[str]:
+    # Se ejecuta en un proceso del pool: cada tarea abre el PDF por su cuenta
+    return list(iter_pdf_pages(path, start, stop))
+
+
+def _get_pdf_executor() -> ProcessPoolExecutor:
+    global _pdf_executor
+    if _pdf_executor is None:
+        _pdf_executor = ProcessPoolExecutor(
+            max_workers=PDF_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pdf_executor
+
+
+def shutdown_pdf_pool() -> None:
+    global _pdf_executor
+    if _pdf_executor is not None:
+        executor, _pdf_executor = _pdf_executor, None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def stream_pdf_pages(path: str, *, max_pages: Optional[int] = None) -> AsyncIterator[str]:
+    """
+    Genera el texto de cada página en orden, sin bloquear el event loop.
+
+    Los rangos de PDF_PAGES_PER_TASK páginas se extraen en paralelo en el
+    pool de procesos, con solo unos pocos por delante de lo ya consumido.
+    Si quien consume deja de iterar (ya tiene texto suficiente), no se
+    envían más y los pendientes se cancelan.
+    """
+    reader = await asyncio.to_thread(PdfReader, path)
+    total = await asyncio.to_thread(len, reader.pages)
+    if max_pages:
+        total = min(total, max_pages)
+    ranges = [
+        (start, min(start + PDF_PAGES_PER_TASK, total))
+        for start in range(0, total, PDF_PAGES_PER_TASK)
+    ]
+
+    if PDF_WORKERS <= 0 or len(ranges) <= 1:
+        # En un hilo, reutilizando el mismo lector
+        for start, stop in ranges:
+            for text in await asyncio.to_thread(_reader_range, reader, start, stop):
+                yield text
+        return
+
+    loop = asyncio.get_running_loop()
+    executor = _get_pdf_executor()
+    ahead = PDF_WORKERS * 2
+    futures: "deque[asyncio.Future[List[str]]]" = deque()
+    pending = iter(ranges)
+    try:
+        while True:
+            while len(futures) < ahead:
+                nxt = next(pending, None)
+                if nxt is None:
+                    break
+                futures.append(loop.run_in_executor(executor, _extract_pdf_range, path, *nxt))
+            if not futures:
+                break
+            for text in await futures.popleft():
+                yield text
+    finally:
+        for fut in futures:
+            fut.cancel()
+
+
+# La versión forma parte de la clave de text_cache: subirla (o actualizar
+# PyPDF2) hace que los documentos se vuelvan a extraer.
+PDF_EXTRACTOR = register_extractor(Extractor(
+    name="pdf",
+    version=f"pypdf2-{PyPDF2.__version__}-1",
+    extensions=(".pdf",),
+    mime_types=("application/pdf",),
+    cost=COST_CPU,
+    stream=stream_pdf_pages,
+))
+
+
+async def _read_with(
+    extractor: Extractor,
+    path: str,
+    max_pages: Optional[int] = None,
+    budget: Optional[TextBudget] = None,
+) -> str:
+    tracker = budget.tracker() if budget else None
+    parts: List[str] = []
+    stream = extractor.stream(path, max_pages=max_pages)
+    try:
+        async for text in stream:
+            parts.append(text)
+            if tracker is not None and tracker.feed(text):
+                break  # ya hay texto suficiente para el generador
+    finally:
+        await stream.aclose()
+    sep = "" if extractor.cost == COST_CHEAP else "\n"  # los bloques de txt ya traen sus saltos
+    return sep.join(parts)
 
 
 async def get_text_from_document(doc_id: str) -> str:
     """
-    Dado un doc_id (por ejemplo 1762199478782), intenta leer:
+    Dado un doc_id (por ejemplo 1762199478782), intenta leer, en este orden:
       - DOCS_DIR/<doc_id>.pdf
+      - DOCS_DIR/<doc_id>.docx / .doc
       - DOCS_DIR/<doc_id>.txt   (por si en algún momento hay texto plano)
-    y devuelve el texto extraído.
+    y devuelve el texto extraído (ver get_text_from_path).
     """
-    # Construir rutas candidatas
-    pdf_path = os.path.join(DOCS_DIR, f"{doc_id}.pdf")
-    txt_path = os.path.join(DOCS_DIR, f"{doc_id}.txt")
-
     path: Optional[str] = None
-    if os.path.exists(pdf_path):
-        path = pdf_path
-    elif os.path.exists(txt_path):
-        path = txt_path
+    for ext in (".pdf", ".docx", ".doc", ".txt"):
+        candidate = os.path.join(DOCS_DIR, f"{doc_id}{ext}")
+        if os.path.exists(candidate):
+            path = candidate
+            break
 
     if not path:
         raise FileNotFoundError(
             f"No se encontró archivo para doc_id={doc_id} en {DOCS_DIR}"
         )
 
-    _, ext = os.path.splitext(path)
-    ext = ext.lower()
+    return await get_text_from_path(path)
+
 
-    if ext == ".txt":
-        return _read_txt(path)
-    elif ext == ".pdf":
-        return _read_pdf(path)
+async def get_text_from_path(
+    path: str,
+    *,
+    mime: Optional[str] = None,
+    max_pages: Optional[int] = None,
+    budget: Optional[TextBudget] = None,
+) -> str:
+    """
+    Extrae el texto de un documento en la ruta dada (se lee en su sitio).
+    El formato sale de `mime`, de la extensión o de la firma del archivo
+    (ver services/extractors). En PDFs, `max_pages` (por defecto
+    EVAL_PDF_MAX_PAGES) limita las páginas leídas y, con `budget`
+    (quiz_generator.text_budget), los formatos costosos dejan de leer en
+    cuanto hay texto suficiente para generar las preguntas.
+
+    El texto se guarda en text_cache por SHA-256 del archivo: el mismo
+    documento no se vuelve a parsear, y uno editado se extrae de nuevo.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No se encontró el documento {path}")
+
+    extractor = await asyncio.to_thread(extractor_for, path, mime)
+    if extractor is None:
+        ext = os.path.splitext(path)[1].lower() or "sin extensión"
+        raise RuntimeError(f"Formato de documento no soportado: {ext}")
+
+    version = extractor.version
+    if extractor is PDF_EXTRACTOR:
+        max_pages = PDF_MAX_PAGES if max_pages is None else max_pages
+        version += f"-p{max_pages}" if max_pages else ""
     else:
-        raise RuntimeError(f"Extensión de documento no soportada: {ext}")
+        max_pages = None
+    if extractor.cost == COST_CHEAP:
+        budget = None  # leerlo entero cuesta menos que otra entrada de caché
+
+    also_accept: List[str] = []
+    if budget is not None:
+        # El texto completo, si ya está en caché, también sirve
+        also_accept.append(version)
+        version = f"{version}-{budget.tag}"
+
+    return await text_cache.get_or_create(
+        path,
+        kind="doc",
+        version=version,
+        create=lambda _digest: _read_with(extractor, path, max_pages, budget),
+        also_accept=also_accept,
+    )
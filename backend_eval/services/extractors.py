@@ -0,0 +1,231 @@
+# backend_eval/services/extractors.py
+"""
+Registro de extractores de texto por extensión o tipo MIME.
+
+Cada extractor:
+  - genera el texto por partes (páginas, párrafos, bloques) con un
+    iterador asíncrono, para que quien consume pueda cortar en cuanto tiene
+    suficiente (ver services/text_budget);
+  - declara su coste, que decide cómo se cachea: lo barato se lee entero,
+    lo caro respeta el presupuesto de texto;
+  - tiene una versión, que forma parte de la clave de services/text_cache.
+
+Formatos registrados aquí: .txt, .docx (leyendo el XML del zip en
+streaming) y .doc (con `antiword`, si está instalado). El PDF lo registra
+services/doc_reader.
+
+Configuración por entorno:
+  - EVAL_ANTIWORD_BIN  ejecutable para .doc (por defecto "antiword")
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import shutil
+import subprocess
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from itertools import islice
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional
+from xml.etree import ElementTree
+
+ANTIWORD_BIN = os.getenv("EVAL_ANTIWORD_BIN", "antiword")
+
+# Coste relativo de extracción
+COST_CHEAP = 1      # leer el archivo tal cual
+COST_CPU = 10       # parseo en Python
+COST_EXTERNAL = 20  # proceso externo
+
+StreamFn = Callable[..., AsyncIterator[str]]
+
+
+@dataclass(frozen=True)
+class Extractor:
+    name: str
+    version: str
+    extensions: tuple
+    mime_types: tuple
+    cost: int
+    # stream(path, *, max_pages=None) -> AsyncIterator[str]
+    stream: StreamFn
+
+
+_BY_EXT: Dict[str, Extractor] = {}
+_BY_MIME: Dict[str, Extractor] = {}
+
+# Firmas de archivo para cuando falta la extensión
+_MAGIC = (
+    (b"%PDF", ".pdf"),
+    (b"PK\x03\x04", ".docx"),
+    (b"\xd0\xcf\x11\xe0", ".doc"),
+)
+
+
+def register_extractor(extractor: Extractor) -> Extractor:
+    for ext in extractor.extensions:
+        _BY_EXT[ext] = extractor
+    for mime in extractor.mime_types:
+        _BY_MIME[mime] = extractor
+    return extractor
+
+
+def _sniff_extension(path: str) -> Optional[str]:
+    with open(path, "rb") as f:
+        head = f.read(8)
+    for magic, ext in _MAGIC:
+        if head.startswith(magic):
+            return ext
+    return None
+
+
+def extractor_for(path: str, mime: Optional[str] = None) -> Optional[Extractor]:
+    """Extractor para `path`: por MIME si se conoce, si no por extensión o firma."""
+    if mime and mime.split(";")[0].strip().lower() in _BY_MIME:
+        return _BY_MIME[mime.split(";")[0].strip().lower()]
+    ext = os.path.splitext(path)[1].lower() or _sniff_extension(path)
+    return _BY_EXT.get(ext) if ext else None
+
+
+async def iterate_in_thread(it: Iterator[str], batch: int = 64) -> AsyncIterator[str]:
+    """
+    Consume un iterador síncrono en un hilo, por lotes, sin bloquear el loop.
+    Si quien consume corta antes (presupuesto de texto), cierra el iterador
+    para que libere ya sus recursos (zip abierto, proceso de antiword).
+    """
+    try:
+        while True:
+            chunk: List[str] = await asyncio.to_thread(lambda: list(islice(it, batch)))
+            if not chunk:
+                return
+            for item in chunk:
+                yield item
+    finally:
+        close = getattr(it, "close", None)
+        if close is not None:
+            await asyncio.to_thread(close)
+
+
+# ============================================================
+# TXT
+# ============================================================
+
+def iter_txt_blocks(path: str, block_size: int = 64 * 1024) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for block in iter(lambda: f.read(block_size), ""):
+            yield block
+
+
+async def _stream_txt(path: str, *, max_pages: Optional[int] = None) -> AsyncIterator[str]:
+    async for block in iterate_in_thread(iter_txt_blocks(path), batch=16):
+        yield block
+
+
+# ============================================================
+# DOCX: word/document.xml en streaming (iterparse), párrafo a párrafo
+# ============================================================
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_P, _W_T, _W_TAB, _W_BR = f"{_W}p", f"{_W}t", f"{_W}tab", f"{_W}br"
+
+
+def iter_docx_paragraphs(path: str) -> Iterator[str]:
+    """
+    Texto de cada párrafo (incluidos los de tablas) sin cargar el árbol
+    completo: cada <w:p> se descarta en cuanto se ha leído.
+    """
+    with zipfile.ZipFile(path) as zf, zf.open("word/document.xml") as xml:
+        depth = 0
+        parts: List[str] = []
+        for event, elem in ElementTree.iterparse(xml, events=("start", "end")):
+            if elem.tag == _W_P:
+                if event == "start":
+                    depth += 1
+                    continue
+                depth -= 1
+                if depth == 0:
+                    text = "".join(parts).strip()
+                    parts.clear()
+                    elem.clear()
+                    if text:
+                        yield text
+            elif event == "end" and depth:
+                if elem.tag == _W_T and elem.text:
+                    parts.append(elem.text)
+                elif elem.tag == _W_TAB:
+                    parts.append("\t")
+                elif elem.tag == _W_BR:
+                    parts.append("\n")
+
+
+async def _stream_docx(path: str, *, max_pages: Optional[int] = None) -> AsyncIterator[str]:
+    async for paragraph in iterate_in_thread(iter_docx_paragraphs(path)):
+        yield paragraph
+
+
+# ============================================================
+# DOC (Word 97-2003): no hay parser en Python puro; se usa antiword
+# ============================================================
+
+def _antiword_available() -> bool:
+    return shutil.which(ANTIWORD_BIN) is not None
+
+
+def iter_doc_lines(path: str) -> Iterator[str]:
+    # stderr va a un archivo temporal, no a un pipe: si antiword escribiera
+    # más avisos de los que caben en el pipe mientras aquí solo se lee
+    # stdout, los dos procesos quedarían bloqueados para siempre.
+    with tempfile.TemporaryFile(mode="w+", errors="ignore") as err_file:
+        proc = subprocess.Popen(
+            [ANTIWORD_BIN, "-w", "0", path],
+            stdout=subprocess.PIPE,
+            stderr=err_file,
+            text=True,
+            errors="ignore",
+        )
+        try:
+            assert proc.stdout is not None
+            for line in proc.stdout:
+                yield line.rstrip("\n")
+        finally:
+            if proc.poll() is None:
+                proc.kill()  # quien consume cortó antes del final
+            proc.communicate()
+        if proc.returncode not in (0, -9):
+            err_file.seek(0)
+            err = err_file.read(4096).strip()[:200]
+            raise RuntimeError(f"antiword falló ({proc.returncode}): {err}")
+
+
+async def _stream_doc(path: str, *, max_pages: Optional[int] = None) -> AsyncIterator[str]:
+    if not _antiword_available():
+        raise RuntimeError("Los .doc requieren antiword instalado (o convertir a .docx).")
+    async for line in iterate_in_thread(iter_doc_lines(path), batch=256):
+        yield line
+
+
+register_extractor(Extractor(
+    name="txt",
+    version="txt-1",
+    extensions=(".txt",),
+    mime_types=("text/plain",),
+    cost=COST_CHEAP,
+    stream=_stream_txt,
+))
+register_extractor(Extractor(
+    name="docx",
+    version="docx-xml-1",
+    extensions=(".docx",),
+    mime_types=("application/vnd.openxmlformats-officedocument.wordprocessingml.document",),
+    cost=COST_CPU,
+    stream=_stream_docx,
+))
+register_extractor(Extractor(
+    name="doc",
+    version="antiword-2",
+    extensions=(".doc",),
+    mime_types=("application/msword",),
+    cost=COST_EXTERNAL,
+    stream=_stream_doc,
+))
@@ -0,0 +1,179 @@
+# backend_eval/services/jobs.py
+"""
+Cola de trabajos en segundo plano (en memoria, por proceso).
+
+Se usa para tareas largas que no deben bloquear el request HTTP, como la
+generación de examen a partir de un video (transcripción + preguntas).
+
+- Cada trabajo tiene un id, un estado (queued / running / done / error),
+  su resultado o el error con el código HTTP que le correspondería.
+- La concurrencia está acotada con un semáforo: los demás esperan en "queued".
+- Si ya hay un trabajo activo con la misma clave (p. ej. el content_id) se
+  devuelve ese en vez de lanzar otro igual.
+- Se guardan como mucho EVAL_JOBS_KEEP trabajos terminados.
+- Desde dentro del trabajo, `report_progress(...)` publica avances que se
+  ven al consultar el estado.
+
+El estado vive en el proceso: con varios workers de uvicorn el sondeo debe
+llegar al mismo worker (la imagen Docker arranca uno solo).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+JOBS_KEEP = int(os.getenv("EVAL_JOBS_KEEP", "500"))
+
+# Trabajo que se está ejecutando en la tarea actual (lo fija JobManager._run)
+_current_job: "contextvars.ContextVar[Optional[Job]]" = contextvars.ContextVar(
+    "current_job", default=None
+)
+
+
+class JobError(Exception):
+    """Error de un trabajo con el código HTTP que vería el cliente."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    key: Optional[str] = None
+    status: str = "queued"  # queued | running | done | error
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    error_code: Optional[int] = None
+    progress: Optional[Dict[str, Any]] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "error_code": self.error_code,
+        }
+
+
+class JobManager:
+    def __init__(self, *, concurrency: int, keep: int = JOBS_KEEP):
+        self.concurrency = max(1, concurrency)
+        self.keep = keep
+        self._sem = asyncio.Semaphore(self.concurrency)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active_by_key: Dict[str, str] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def find_active(self, key: str) -> Optional[Job]:
+        """Trabajo queued/running con esa clave, si lo hay."""
+        job_id = self._active_by_key.get(key)
+        job = self._jobs.get(job_id) if job_id else None
+        return job if job is not None and job.active else None
+
+    def submit(
+        self,
+        kind: str,
+        func: Callable[[], Awaitable[Dict[str, Any]]],
+        *,
+        key: Optional[str] = None,
+    ) -> Job:
+        """
+        Encola `func` y devuelve el Job inmediatamente.
+        Con `key`, reutiliza el trabajo activo que tenga esa misma clave.
+        """
+        if key is not None:
+            existing = self.find_active(key)
+            if existing is not None:
+                return existing
+
+        job = Job(id=str(uuid.uuid4()), kind=kind, key=key)
+        self._jobs[job.id] = job
+        if key is not None:
+            self._active_by_key[key] = job.id
+        self._tasks[job.id] = asyncio.create_task(self._run(job, func))
+        self._prune()
+        return job
+
+    async def _run(self, job: Job, func: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+        _current_job.set(job)
+        try:
+            async with self._sem:
+                job.status = "running"
+                job.started_at = time.time()
+                job.result = await func()
+                job.status = "done"
+        except JobError as e:
+            job.status = "error"
+            job.error = e.detail
+            job.error_code = e.status_code
+        except asyncio.CancelledError:
+            job.status = "error"
+            job.error = "Trabajo cancelado."
+            job.error_code = 503
+            raise
+        except Exception as e:
+            job.status = "error"
+            job.error = str(e) or e.__class__.__name__
+            job.error_code = 500
+        finally:
+            job.finished_at = time.time()
+            self._tasks.pop(job.id, None)
+            if job.key is not None and self._active_by_key.get(job.key) == job.id:
+                del self._active_by_key[job.key]
+
+    def _prune(self) -> None:
+        """Olvida los trabajos terminados más antiguos por encima de `keep`."""
+        finished = [j.id for j in self._jobs.values() if not j.active]
+        for job_id in finished[: max(0, len(finished) - self.keep)]:
+            del self._jobs[job_id]
+
+    async def shutdown(self) -> None:
+        """Cancela los trabajos pendientes (al apagar el servicio)."""
+        tasks = list(self._tasks.values())
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for j in self._jobs.values():
+            counts[j.status] = counts.get(j.status, 0) + 1
+        return {"concurrency": self.concurrency, "jobs": counts}
+
+
+def report_progress(**fields: Any) -> None:
+    """Actualiza el progreso del trabajo en curso (no hace nada fuera de uno)."""
+    job = _current_job.get()
+    if job is not None:
+        job.progress = {**(job.progress or {}), **fields}
+
+
+# Instancia compartida (generación de exámenes desde video, etc.)
+job_manager = JobManager(concurrency=int(os.getenv("EVAL_JOBS_CONCURRENCY", "2")))
@@ -0,0 +1,133 @@
+# backend_eval/services/media_resolver.py
+"""
+Resolución de archivos subidos (media_asset / document_asset) a su ruta en disco.
+
+El backend core guarda la URI tal cual (/uploads/videos/123.mp4,
+/docs/456.pdf, ...) y el archivo puede estar en varias carpetas según cómo
+se haya desplegado. Aquí se prueban las rutas razonables una sola vez:
+
+  - Los archivos se leen en su sitio; nunca se copian.
+  - Si alguien necesita el archivo en una ubicación canónica, `link_into`
+    crea un hardlink (o un symlink si está en otro sistema de archivos).
+  - Los aciertos se recuerdan (solo se re-verifica con un stat) y los fallos
+    también, durante EVAL_MEDIA_NEG_TTL segundos (por defecto 30), para no
+    repetir todo el sondeo en cada request.
+
+Configuración por entorno:
+  - EVAL_APP_ROOT       raíz del contenedor (por defecto /app)
+  - EVAL_MEDIA_NEG_TTL  segundos que se recuerda un "no encontrado"
+"""
+
+from __future__ import annotations
+
+import errno
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+APP_ROOT = os.getenv("EVAL_APP_ROOT", "/app")
+APP_DOCS_DIR = os.path.join(APP_ROOT, "docs")
+NEG_TTL = float(os.getenv("EVAL_MEDIA_NEG_TTL", "30"))
+
+DOC_EXTENSIONS = (".pdf", ".docx", ".doc")
+
+
+@dataclass
+class Resolution:
+    path: Optional[str]
+    tried: List[str]
+
+
+def _uri_paths(uri: str, relative_dir: Optional[str]) -> List[str]:
+    # a) Ruta tal y como viene en la columna uri (ej: /uploads/docs/xxxxx.pdf)
+    paths = [os.path.join(APP_ROOT, uri.lstrip("/"))]
+    # b) Si uri fuera relativo
+    if relative_dir and not uri.startswith("/"):
+        paths.append(os.path.join(relative_dir, uri))
+    return paths
+
+
+def _doc_id_paths(doc_id: str) -> List[str]:
+    # c) Rutas típicas por doc_id y extensión
+    paths: List[str] = []
+    for ext in DOC_EXTENSIONS:
+        paths.append(os.path.join(APP_DOCS_DIR, f"{doc_id}{ext}"))
+        paths.append(os.path.join(APP_ROOT, "uploads", f"{doc_id}{ext}"))
+        paths.append(os.path.join(APP_ROOT, "uploads", "docs", f"{doc_id}{ext}"))
+    return paths
+
+
+class MediaResolver:
+    def __init__(self, neg_ttl: float = NEG_TTL):
+        self.neg_ttl = neg_ttl
+        self._found: Dict[Tuple[str, Optional[str]], str] = {}
+        self._missing: Dict[Tuple[str, Optional[str]], float] = {}
+        self.probes = 0
+
+    def resolve(
+        self,
+        uri: str,
+        *,
+        doc_id: Optional[str] = None,
+        relative_dir: Optional[str] = None,
+    ) -> Resolution:
+        """
+        Ruta en disco de `uri` (y, para documentos, de las variantes por
+        doc_id). Una URI relativa se busca también en `relative_dir`.
+        `path` es None si no existe en ninguna ruta probada.
+        """
+        key = (uri, doc_id)
+        candidates = _uri_paths(uri, relative_dir) + (_doc_id_paths(doc_id) if doc_id else [])
+
+        hit = self._found.get(key)
+        if hit is not None:
+            if os.path.exists(hit):
+                return Resolution(hit, candidates)
+            del self._found[key]
+
+        missed_at = self._missing.get(key)
+        if missed_at is not None and time.monotonic() - missed_at < self.neg_ttl:
+            return Resolution(None, candidates)
+
+        self.probes += 1
+        for p in candidates:
+            if os.path.exists(p):
+                self._found[key] = p
+                self._missing.pop(key, None)
+                return Resolution(p, candidates)
+
+        self._missing[key] = time.monotonic()
+        return Resolution(None, candidates)
+
+    def forget(self, uri: str, *, doc_id: Optional[str] = None) -> None:
+        """Olvida lo recordado para `uri` (p. ej. tras una nueva subida)."""
+        self._found.pop((uri, doc_id), None)
+        self._missing.pop((uri, doc_id), None)
+
+
+def link_into(source_path: str, dest_path: str) -> str:
+    """
+    Deja `source_path` accesible también en `dest_path` sin copiar datos:
+    hardlink si se puede, symlink si está en otro sistema de archivos.
+    Si `dest_path` ya existe no lo toca. Devuelve `dest_path`.
+    """
+    if os.path.lexists(dest_path):
+        return dest_path
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    try:
+        os.link(source_path, dest_path)
+    except FileExistsError:
+        pass
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+            raise
+        try:
+            os.symlink(os.path.abspath(source_path), dest_path)
+        except FileExistsError:
+            pass
+    return dest_path
+
+
+# Instancia compartida por los routers de generación
+media_resolver = MediaResolver()
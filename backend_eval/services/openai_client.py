@@ -0,0 +1,204 @@
+# backend_eval/services/openai_client.py
+"""
+Cliente de OpenAI compartido por todo el proceso.
+
+- Un solo AsyncOpenAI (conexiones HTTP reutilizadas), creado al primer uso.
+- Limitador de tasa de tipo token bucket: como mucho EVAL_OPENAI_RPS
+  peticiones por segundo, con ráfagas de hasta EVAL_OPENAI_BURST.
+- Como mucho EVAL_OPENAI_CONCURRENCY peticiones en vuelo a la vez.
+- Reintentos acotados con backoff exponencial y jitter para 429, 5xx,
+  timeouts y errores de conexión (respetando Retry-After si llega). El SDK
+  no reintenta por su cuenta (max_retries=0) para que el límite sea uno solo.
+
+Para pruebas, EVAL_OPENAI_BASE_URL apunta el cliente a un servidor local
+que imite POST /v1/responses.
+
+Configuración por entorno:
+  - OPENAI_API_KEY
+  - EVAL_OPENAI_BASE_URL       (por defecto, la API de OpenAI)
+  - EVAL_OPENAI_RPS            peticiones por segundo (por defecto 2)
+  - EVAL_OPENAI_BURST          ráfaga máxima (por defecto 4)
+  - EVAL_OPENAI_CONCURRENCY    peticiones simultáneas (por defecto 4)
+  - EVAL_OPENAI_RETRIES        reintentos por petición (por defecto 3)
+  - EVAL_OPENAI_BACKOFF        espera base en segundos (por defecto 0.5)
+  - EVAL_OPENAI_TIMEOUT        timeout por petición en segundos (por defecto 60)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Any, Dict, Optional
+
+try:
+    import openai  # type: ignore
+    from openai import AsyncOpenAI  # type: ignore
+except ImportError:
+    openai = None  # tipo: ignore
+    AsyncOpenAI = None  # tipo: ignore
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("EVAL_OPENAI_BASE_URL") or None
+OPENAI_RPS = float(os.getenv("EVAL_OPENAI_RPS", "2"))
+OPENAI_BURST = int(os.getenv("EVAL_OPENAI_BURST", "4"))
+OPENAI_CONCURRENCY = int(os.getenv("EVAL_OPENAI_CONCURRENCY", "4"))
+OPENAI_RETRIES = int(os.getenv("EVAL_OPENAI_RETRIES", "3"))
+OPENAI_BACKOFF = float(os.getenv("EVAL_OPENAI_BACKOFF", "0.5"))
+OPENAI_TIMEOUT = float(os.getenv("EVAL_OPENAI_TIMEOUT", "60"))
+
+# Tope de espera entre reintentos, aunque Retry-After pida más
+MAX_BACKOFF = 30.0
+
+
+class TokenBucket:
+    """Limitador de tasa: `rate` tokens por segundo, hasta `burst` acumulados."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        # Los que esperan pasan en orden de llegada
+        self._lock = asyncio.Lock()
+        self.waited = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return  # sin límite
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                wait = (1 - self._tokens) / self.rate
+                self.waited += wait
+                await asyncio.sleep(wait)
+                self._refill()
+            self._tokens -= 1
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    if openai is None:
+        return False
+    if isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return False
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class OpenAIClient:
+    def __init__(
+        self,
+        *,
+        api_key: Optional[str] = OPENAI_API_KEY,
+        base_url: Optional[str] = OPENAI_BASE_URL,
+        rps: float = OPENAI_RPS,
+        burst: int = OPENAI_BURST,
+        concurrency: int = OPENAI_CONCURRENCY,
+        retries: int = OPENAI_RETRIES,
+        backoff: float = OPENAI_BACKOFF,
+        timeout: float = OPENAI_TIMEOUT,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = TokenBucket(rps, burst)
+        self._sem = asyncio.Semaphore(max(1, concurrency))
+        self._client: Optional[Any] = None
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def available(self) -> bool:
+        return bool(self.api_key and AsyncOpenAI is not None)
+
+    def _get_client(self) -> Any:
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                max_retries=0,  # los reintentos los hace complete_json
+                timeout=self.timeout,
+            )
+        return self._client
+
+    async def complete_json(
+        self,
+        *,
+        model: str,
+        system: str,
+        user: str,
+        temperature: float = 0.3,
+    ) -> Dict[str, Any]:
+        """
+        Una petición a la Responses API que debe devolver un objeto JSON.
+        Pasa por el limitador y reintenta los errores transitorios; los
+        demás (y el último transitorio) se propagan.
+        """
+        client = self._get_client()
+        attempt = 0
+        while True:
+            await self.limiter.acquire()
+            try:
+                async with self._sem:
+                    self.requests += 1
+                    resp = await client.responses.create(
+                        model=model,
+                        input=[
+                            {"role": "system", "content": system},
+                            {"role": "user", "content": user},
+                        ],
+                        text={"format": {"type": "json_object"}},
+                        temperature=temperature,
+                    )
+                return json.loads(resp.output_text)
+            except Exception as exc:
+                self.last_error = f"{exc.__class__.__name__}: {exc}"[:300]
+                if attempt >= self.retries or not _is_retryable(exc):
+                    self.failures += 1
+                    raise
+                delay = _retry_after(exc)
+                if delay is None:
+                    delay = self.backoff * (2 ** attempt) * (1 + random.random())
+                attempt += 1
+                self.retried += 1
+                await asyncio.sleep(min(delay, MAX_BACKOFF))
+
+    async def close(self) -> None:
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "available": self.available,
+            "requests": self.requests,
+            "retries": self.retried,
+            "failures": self.failures,
+            "rate_limit_wait_sec": round(self.limiter.waited, 3),
+            "last_error": self.last_error,
+        }
+
+
+# Instancia compartida del proceso
+openai_client = OpenAIClient()
@@ -0,0 +1,178 @@
+# backend_eval/services/question_bank.py
+"""
+Pregeneración del banco de preguntas (question_bank) de un curso.
+
+Recorre todos los content_item del curso, extrae su texto (doc_reader para
+documentos, transcription_pool para videos; ambos con text_cache, así que
+lo ya leído no se vuelve a procesar), genera un banco grande por contenido
+y lo carga en question_bank. Con el banco lleno, /exams/generate solo
+sortea 5 preguntas en vez de generar en vivo.
+
+Las preguntas salen de services/batch_generator con un único índice para
+todo el curso: el hueco es el término más informativo de cada frase y los
+distractores son términos del curso con frecuencia parecida. Es
+determinista: el mismo curso con los mismos archivos y la misma semilla da
+exactamente el mismo banco, y si la huella (meta.bank) coincide con la del
+banco activo, ese contenido no se reescribe.
+
+Se lanza desde:
+  - scripts/build_question_bank (CLI)
+  - POST /admin/question-bank/{course_id}/build (trabajo en segundo plano)
+
+Configuración por entorno:
+  - EVAL_QB_PER_ITEM   preguntas por contenido (por defecto 100)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Any, Dict, List, Optional
+
+from db import acquire
+from repositories.question_bank_repo import active_fingerprint, bank_rows, replace_bank
+from services.batch_generator import CorpusIndex
+from services.doc_reader import get_text_from_path
+from services.jobs import report_progress
+from services.media_resolver import APP_DOCS_DIR, media_resolver
+from services.transcription_pool import transcription_pool
+
+QB_PER_ITEM = int(os.getenv("EVAL_QB_PER_ITEM", "100"))
+
+# Se guarda en meta: cambiarlo invalida las huellas de los bancos existentes
+GENERATOR_VERSION = "batch-2"
+
+# Texto mínimo de un contenido para generarle preguntas
+MIN_TEXT_LEN = 50
+
+
+async def _course_items(course_id: str) -> List[Dict[str, Any]]:
+    async with acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT ci.id, ci.type::text AS type, ci.title,
+                   da.uri AS doc_uri, ma.uri AS media_uri
+            FROM content_item ci
+            LEFT JOIN LATERAL (
+              SELECT uri FROM document_asset
+              WHERE content_id = ci.id ORDER BY created_at LIMIT 1
+            ) da ON TRUE
+            LEFT JOIN LATERAL (
+              SELECT uri FROM media_asset
+              WHERE content_id = ci.id ORDER BY created_at LIMIT 1
+            ) ma ON TRUE
+            WHERE ci.course_id = $1::uuid
+            ORDER BY ci.position, ci.created_at, ci.id
+            """,
+            course_id,
+        )
+    return [{**dict(r), "id": str(r["id"])} for r in rows]
+
+
+async def _item_text(item: Dict[str, Any]) -> str:
+    """Texto completo del contenido; FileNotFoundError si no hay archivo."""
+    if item["doc_uri"]:
+        found = media_resolver.resolve(item["doc_uri"], relative_dir=APP_DOCS_DIR)
+        if not found.path:
+            raise FileNotFoundError(f"Documento no encontrado ({item['doc_uri']}).")
+        return await get_text_from_path(found.path)
+    if item["type"] == "video" and item["media_uri"]:
+        found = media_resolver.resolve(item["media_uri"])
+        if not found.path:
+            raise FileNotFoundError(f"Video no encontrado ({item['media_uri']}).")
+        return await transcription_pool.transcribe(
+            content_id=item["id"],
+            video_path=found.path,
+            video_uri=item["media_uri"],
+            language="es",
+        )
+    raise FileNotFoundError("El contenido no tiene documento ni video.")
+
+
+def _with_difficulty(questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Dificultad 1–3 por tercios de idf del término objetivo dentro del contenido."""
+    ranked = sorted(range(len(questions)), key=lambda i: questions[i]["meta"]["idf"])
+    for pos, i in enumerate(ranked):
+        questions[i]["difficulty"] = 1 + (3 * pos) // len(questions)
+    return questions
+
+
+async def build_course_bank(
+    course_id: str,
+    *,
+    per_item: int = QB_PER_ITEM,
+    seed: int = 0,
+    force: bool = False,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    """
+    Genera y carga el banco de todos los contenidos de `course_id`.
+    Con `force` reescribe aunque la huella no haya cambiado; con `dry_run`
+    no escribe nada (solo informa lo que haría).
+    """
+    items = await _course_items(course_id)
+    report_progress(stage="extracting", items_total=len(items), items_done=0)
+
+    report: List[Dict[str, Any]] = []
+    texts: List[str] = []
+    usable: List[Dict[str, Any]] = []
+    for n, item in enumerate(items, start=1):
+        entry: Dict[str, Any] = {"content_id": item["id"], "type": item["type"], "title": item["title"]}
+        report.append(entry)
+        try:
+            text = await _item_text(item)
+        except FileNotFoundError as e:
+            entry.update(status="skipped", detail=str(e))
+        except Exception as e:
+            entry.update(status="error", detail=f"No se pudo extraer el texto ({e}).")
+        else:
+            if len(text.strip()) < MIN_TEXT_LEN:
+                entry.update(status="skipped", detail="Texto insuficiente.")
+            else:
+                entry["_text_index"] = len(texts)
+                texts.append(text)
+                usable.append(entry)
+        report_progress(items_done=n)
+
+    report_progress(stage="generating")
+    index: Optional[CorpusIndex] = await asyncio.to_thread(CorpusIndex, texts) if texts else None
+
+    totals = {"inserted": 0, "deleted": 0, "retired": 0}
+    for entry in usable:
+        i = entry.pop("_text_index")
+        gen = await asyncio.to_thread(index.generate, per_item, seed=seed, text=i)
+        bank = f"{GENERATOR_VERSION}:{gen['fingerprint']}"
+        questions = _with_difficulty(gen["questions"])
+        for q in questions:
+            q["meta"] = {
+                **q["meta"],
+                "bank": bank,
+                "course_id": course_id,
+                "content_id": entry["content_id"],
+                "seed": seed,
+            }
+        rows = bank_rows(entry["content_id"], entry["title"], questions)
+        entry.update(questions=len(rows), bank=bank)
+
+        if dry_run:
+            entry["status"] = "dry_run"
+            continue
+        async with acquire() as conn:
+            if not force and await active_fingerprint(conn, entry["content_id"]) == bank:
+                entry["status"] = "unchanged"
+                continue
+            async with conn.transaction():
+                counts = await replace_bank(conn, entry["content_id"], rows)
+        entry.update(status="loaded", **counts)
+        for k in totals:
+            totals[k] += counts[k]
+
+    report_progress(stage="done")
+    return {
+        "course_id": course_id,
+        "per_item": per_item,
+        "seed": seed,
+        "dry_run": dry_run,
+        "items": report,
+        **totals,
+    }
@@ -0,0 +1,140 @@
+# backend_eval/services/question_set_cache.py
+"""
+Caché persistente (PostgreSQL) de conjuntos de preguntas generados con
+OpenAI, ver 003_question_set_cache.sql.
+
+La clave es el fingerprint de quiz_generator: hash del texto + número de
+preguntas + modelo + versión del prompt. Regenerar el examen de un
+documento que no cambió devuelve el resultado guardado en vez de pagar
+otra llamada al modelo.
+
+Es opcional: si la tabla no existe o la BD falla, la generación sigue sin
+caché (los errores solo se cuentan en stats()). La poda borra lo no usado
+en QSET_CACHE_DAYS días y deja como mucho QSET_CACHE_MAX filas; corre
+como mucho una vez cada QSET_PRUNE_EVERY segundos, tras una escritura.
+
+Configuración por entorno:
+  - EVAL_QSET_CACHE_DAYS   días sin uso antes de borrar (por defecto 90)
+  - EVAL_QSET_CACHE_MAX    filas máximas (por defecto 20000)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+from db import acquire
+from services.schema_registry import schema_registry
+
+QSET_CACHE_DAYS = int(os.getenv("EVAL_QSET_CACHE_DAYS", "90"))
+QSET_CACHE_MAX = int(os.getenv("EVAL_QSET_CACHE_MAX", "20000"))
+QSET_PRUNE_EVERY = 3600.0
+
+
+class QuestionSetCache:
+    def __init__(self, *, days: int = QSET_CACHE_DAYS, max_rows: int = QSET_CACHE_MAX):
+        self.days = days
+        self.max_rows = max_rows
+        self._last_prune: Optional[float] = None
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.pruned = 0
+        self.errors = 0
+
+    async def _enabled(self) -> bool:
+        try:
+            return await schema_registry.table_exists("question_set_cache")
+        except Exception:
+            return False  # pool sin inicializar (scripts) o BD caída
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not await self._enabled():
+            return None
+        try:
+            async with acquire() as conn:
+                raw = await conn.fetchval(
+                    """
+                    UPDATE question_set_cache
+                    SET hits = hits + 1, last_used_at = NOW()
+                    WHERE key = $1
+                    RETURNING result
+                    """,
+                    key,
+                )
+        except Exception:
+            self.errors += 1
+            return None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    async def put(
+        self,
+        key: str,
+        result: Dict[str, Any],
+        *,
+        text_sha256: str,
+        count: int,
+        model: str,
+        prompt_version: str,
+    ) -> None:
+        if not await self._enabled():
+            return
+        try:
+            async with acquire() as conn:
+                await conn.execute(
+                    """
+                    INSERT INTO question_set_cache
+                      (key, text_sha256, question_count, model, prompt_version, result)
+                    VALUES ($1, $2, $3, $4, $5, $6::jsonb)
+                    ON CONFLICT (key) DO UPDATE
+                      SET result = EXCLUDED.result, last_used_at = NOW()
+                    """,
+                    key, text_sha256, count, model, prompt_version,
+                    json.dumps(result, ensure_ascii=False),
+                )
+                self.stores += 1
+                now = time.monotonic()
+                if self._last_prune is None or now - self._last_prune > QSET_PRUNE_EVERY:
+                    self._last_prune = now
+                    await self._prune(conn)
+        except Exception:
+            self.errors += 1
+
+    async def _prune(self, conn) -> None:
+        expired = await conn.execute(
+            "DELETE FROM question_set_cache WHERE last_used_at < NOW() - make_interval(days => $1)",
+            self.days,
+        )
+        overflow = await conn.execute(
+            """
+            DELETE FROM question_set_cache
+            WHERE key IN (
+              SELECT key FROM question_set_cache
+              ORDER BY last_used_at DESC
+              OFFSET $1
+            )
+            """,
+            self.max_rows,
+        )
+        self.pruned += int(expired.split()[-1]) + int(overflow.split()[-1])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "pruned": self.pruned,
+            "errors": self.errors,
+            "max_age_days": self.days,
+            "max_rows": self.max_rows,
+        }
+
+
+# Instancia compartida del proceso
+question_set_cache = QuestionSetCache()
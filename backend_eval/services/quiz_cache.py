@@ -0,0 +1,35 @@
+# backend_eval/services/quiz_cache.py
+"""
+Caché en memoria (LRU + TTL) de quizzes ya armados, por content_id.
+
+Un quiz solo cambia cuando `save_generated_quiz` lo reemplaza, así que las
+rutas de lectura (/exam/by-content, /exam/{content_id}) y el submit comparten
+esta caché y `save_generated_quiz` la invalida.
+
+Cada proceso uvicorn tiene su propia caché: si hay varios workers, el TTL
+acota cuánto puede tardar otro worker en ver un quiz regenerado.
+
+Configuración por entorno:
+  - EVAL_QUIZ_CACHE_SIZE   (entradas, por defecto 256)
+  - EVAL_QUIZ_CACHE_TTL    (segundos, por defecto 60)
+"""
+
+from __future__ import annotations
+
+import os
+
+from services.ttl_cache import TTLCache
+
+QUIZ_CACHE_SIZE = int(os.getenv("EVAL_QUIZ_CACHE_SIZE", "256"))
+QUIZ_CACHE_TTL = float(os.getenv("EVAL_QUIZ_CACHE_TTL", "60"))
+
+
+class QuizCache(TTLCache):
+    """TTLCache (services/ttl_cache) con los tamaños de la caché de quizzes."""
+
+    def __init__(self, maxsize: int = QUIZ_CACHE_SIZE, ttl: float = QUIZ_CACHE_TTL):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+
+
+# Instancia compartida por los routers del proceso
+quiz_cache = QuizCache()
@@ -4,7 +4,10 @@
 Servicio de generación de preguntas de examen.
 
 - Si existe la variable de entorno OPENAI_API_KEY y la librería `openai` está
-  instalada, usa un modelo de OpenAI para generar preguntas coherentes.
+  instalada, usa un modelo de OpenAI para generar preguntas coherentes
+  (cliente compartido, límite de tasa y reintentos en services/openai_client).
+  Los textos largos se reparten en varios trozos que se piden en paralelo,
+  y las peticiones idénticas simultáneas comparten una sola llamada.
 - Si no, utiliza un generador heurístico local (cloze + verdadero/falso),
   basado en el texto proporcionado.
 
@@ -28,40 +31,58 @@ from __future__ import annotations
 
 import asyncio
 import hashlib
+import logging
 import os
 import random
 import re
-import time
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.openai_client import openai_client
+from services.question_set_cache import question_set_cache
+from services.text_budget import TextBudget, split_sentences
+
+logger = logging.getLogger(__name__)
 
 # =============================================================================
 #  Config / OpenAI (opcional)
 # =============================================================================
 
-try:
-    from openai import OpenAI  # type: ignore
-except ImportError:
-    OpenAI = None  # tipo: ignore
-
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("QUIZ_MODEL", "gpt-4.1-mini")
 
 # Longitud mínima de frase para considerarla en el generador local
 MIN_SENT_LEN = 60
 
+# Caracteres del texto que se envían a OpenAI en cada petición
+OPENAI_MAX_CHARS = 8000
+
+# Trozos de OPENAI_MAX_CHARS que se piden en paralelo para un texto largo
+OPENAI_MAX_CHUNKS = int(os.getenv("EVAL_OPENAI_MAX_CHUNKS", "4"))
+
+# Versiones que forman parte del fingerprint: subirlas al cambiar el prompt
+# (o el troceo) o el generador local hace que no se reutilicen resultados viejos
+PROMPT_VERSION = "prompt-2"
+LOCAL_VERSION = "local-1"
+
+# Frases utilizables que se leen por pregunta pedida en el generador local
+# (margen para barajar y para frases sin palabras clave)
+LOCAL_SENTENCES_PER_QUESTION = 4
+
 
 # =============================================================================
 #  Utilidades comunes
 # =============================================================================
 
-def _make_fingerprint(text: str) -> str:
+def _text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _make_fingerprint(text: str, count: int, engine: str) -> str:
     """
-    Genera una huella simple a partir del texto y del minuto actual.
-    Sirve para identificar aproximadamente una generación.
+    Huella de una generación: mismo texto, mismo número de preguntas y mismo
+    generador (modelo + versión del prompt, o versión del local) dan la
+    misma huella. Es la clave de question_set_cache y se guarda en quiz.
     """
-    base = hashlib.md5(text.encode("utf-8")).hexdigest()
-    bucket = int(time.time()) // 60  # se agrupa por minuto
-    return f"{base}:{bucket}"
+    return f"{_text_sha256(text)}:{count}:{engine}"
 
 
 # =============================================================================
@@ -86,9 +107,8 @@ Reglas IMPORTANTES:
 
 def _build_openai_user_prompt(text: str, count: int) -> str:
     # (Opcional) recortar texto si fuera demasiado grande
-    max_chars = 8000
-    if len(text) > max_chars:
-        text = text[:max_chars]
+    if len(text) > OPENAI_MAX_CHARS:
+        text = text[:OPENAI_MAX_CHARS]
 
     return f"""
 Texto base del curso (en español):
@@ -129,59 +149,169 @@ Restricciones:
 """
 
 
-async def _generate_questions_openai(text: str, count: int) -> Dict[str, Any]:
+def _normalize_questions(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Preguntas de la respuesta del modelo, con "prompt" y opciones {text, is_correct}."""
+    questions = data.get("questions") or []
+    result: List[Dict[str, Any]] = []
+    for q in questions:
+        if not isinstance(q, dict):
+            continue
+        options = q.get("options") if isinstance(q.get("options"), list) else []
+        result.append({
+            **q,
+            "prompt": q.get("prompt") or "",
+            "options": [
+                {
+                    "text": opt.get("text") or opt.get("label") or "",
+                    "is_correct": bool(opt.get("is_correct")),
+                }
+                for opt in options
+                if isinstance(opt, dict)
+            ],
+        })
+    return result
+
+
+def _split_for_openai(text: str, count: int) -> List[str]:
     """
-    Genera preguntas usando un modelo de OpenAI.
-    Requiere:
-        - librería `openai` instalada
-        - variable de entorno OPENAI_API_KEY configurada
+    Trozos de hasta OPENAI_MAX_CHARS cortados en fin de frase, como mucho
+    min(OPENAI_MAX_CHUNKS, count); lo que no cabe se descarta (como antes
+    se descartaba todo lo que pasaba de OPENAI_MAX_CHARS).
     """
-    assert OpenAI is not None  # solo debería llamarse si está disponible
-    client = OpenAI(api_key=OPENAI_API_KEY)
-
-    user_prompt = _build_openai_user_prompt(text, count)
+    limit = max(1, min(OPENAI_MAX_CHUNKS, count))
+    if len(text) <= OPENAI_MAX_CHARS or limit == 1:
+        return [text[:OPENAI_MAX_CHARS]]
+
+    chunks: List[str] = []
+    current = ""
+    for sentence in split_sentences(text, 1):
+        sentence = sentence[:OPENAI_MAX_CHARS]
+        if current and len(current) + 1 + len(sentence) > OPENAI_MAX_CHARS:
+            chunks.append(current)
+            if len(chunks) == limit:
+                return chunks
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def _request_openai_chunk(text: str, count: int) -> List[Dict[str, Any]]:
+    data = await openai_client.complete_json(
+        model=OPENAI_MODEL,
+        system=_OPENAI_SYSTEM_PROMPT,
+        user=_build_openai_user_prompt(text, count),
+        temperature=0.3,  # más bajo = más preciso / menos invento
+    )
+    return _normalize_questions(data)
+
+
+async def _generate_questions_openai_uncached(text: str, count: int) -> Tuple[Dict[str, Any], bool]:
+    """Preguntas generadas y si todas vienen del modelo (sin trozos fallidos)."""
+    chunks = _split_for_openai(text, count)
+    # Las preguntas se reparten entre los trozos (los primeros piden una más)
+    base, extra = divmod(count, len(chunks))
+    per_chunk = [base + (1 if i < extra else 0) for i in range(len(chunks))]
+
+    results = await asyncio.gather(
+        *(_request_openai_chunk(c, n) for c, n in zip(chunks, per_chunk)),
+        return_exceptions=True,
+    )
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if len(errors) == len(results):
+        raise errors[0]
 
-    def _call_openai() -> str:
-        resp = client.responses.create(
+    questions: List[Dict[str, Any]] = []
+    seen = set()
+    for chunk_questions, n in zip(results, per_chunk):
+        if isinstance(chunk_questions, BaseException):
+            logger.warning("Trozo de OpenAI fallido: %s", chunk_questions)
+            continue
+        for q in chunk_questions[:n]:
+            key = q["prompt"].strip().lower()
+            if key and key not in seen:
+                seen.add(key)
+                questions.append(q)
+
+    complete = not errors and len(questions) >= count
+    if len(questions) < count:
+        # Algún trozo falló o devolvió menos: se completa con el generador local
+        local = _generate_questions_local(text, count - len(questions))
+        questions.extend(local["questions"])
+
+    # Un resultado completado con el generador local lleva su propia huella:
+    # si no, save_generated_quiz lo tomaría por el del modelo y dejaría de
+    # reemplazarlo cuando una generación posterior salga completa.
+    engine = _openai_engine() if complete else f"{_openai_engine()}:partial"
+    return {
+        "fingerprint": _make_fingerprint(text, count, engine),
+        "questions": questions[:count],
+    }, complete
+
+
+def _openai_engine() -> str:
+    return f"{OPENAI_MODEL}:{PROMPT_VERSION}"
+
+
+async def _generate_questions_openai_cached(text: str, count: int) -> Dict[str, Any]:
+    """Resultado guardado en question_set_cache o, si no lo hay, una generación nueva."""
+    digest = _text_sha256(text)
+    key = _make_fingerprint(text, count, _openai_engine())
+    cached = await question_set_cache.get(key)
+    if cached is not None:
+        return cached
+
+    result, complete = await _generate_questions_openai_uncached(text, count)
+    if complete:
+        # Lo completado con el generador local no se guarda: la próxima vez
+        # se vuelve a intentar con el modelo
+        await question_set_cache.put(
+            key,
+            result,
+            text_sha256=digest,
+            count=count,
             model=OPENAI_MODEL,
-            input=[
-                {"role": "system", "content": _OPENAI_SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.3,  # más bajo = más preciso / menos invento
+            prompt_version=PROMPT_VERSION,
         )
+    return result
 
-        # El SDK nuevo devuelve algo como resp.output[0].content[0].text
-        return resp.output[0].content[0].text  # type: ignore[attr-defined]
-
-    raw_json = await asyncio.to_thread(_call_openai)
-    import json  # import local para evitarlo si no se usa
 
-    data = json.loads(raw_json)
+# Peticiones a OpenAI en curso por (hash del texto, count): las idénticas
+# simultáneas esperan la misma llamada (y la misma consulta a la caché)
+# en vez de pagar otra.
+_openai_inflight: Dict[Tuple[str, int], "asyncio.Future[Dict[str, Any]]"] = {}
 
-    questions = data.get("questions") or []
-    for q in questions:
-        # Normalizaciones de seguridad
-        if "prompt" not in q:
-            q["prompt"] = ""
-        if "options" not in q or not isinstance(q["options"], list):
-            q["options"] = []
-
-        # Aseguramos que cada opción tenga "text" y "is_correct"
-        normalized_options = []
-        for opt in q["options"]:
-            text_opt = opt.get("text") or opt.get("label") or ""
-            is_correct = bool(opt.get("is_correct"))
-            normalized_options.append(
-                {"text": text_opt, "is_correct": is_correct}
-            )
-        q["options"] = normalized_options
 
-    return {
-        "fingerprint": data.get("fingerprint") or _make_fingerprint(text),
-        "questions": questions,
-    }
+async def _generate_questions_openai(text: str, count: int) -> Dict[str, Any]:
+    """
+    Genera preguntas usando un modelo de OpenAI.
+    Requiere:
+        - librería `openai` instalada
+        - variable de entorno OPENAI_API_KEY configurada
+    """
+    key = (_text_sha256(text), count)
+    pending = _openai_inflight.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending)
+
+    fut: "asyncio.Future[Dict[str, Any]]" = asyncio.get_running_loop().create_future()
+    _openai_inflight[key] = fut
+    try:
+        result = await _generate_questions_openai_cached(text, count)
+    except Exception as exc:
+        fut.set_exception(exc)
+        fut.exception()  # evita "exception was never retrieved" si nadie esperaba
+        raise
+    except BaseException:
+        fut.cancel()
+        raise
+    else:
+        fut.set_result(result)
+        return result
+    finally:
+        if _openai_inflight.get(key) is fut:
+            del _openai_inflight[key]
 
 
 # =============================================================================
@@ -193,8 +323,20 @@ def _split_sentences(text: str) -> List[str]:
     Separa el texto en frases simples usando puntuación básica
     y descarta las demasiado cortas.
     """
-    parts = re.split(r"(?<=[\.\?\!])\s+", text.strip())
-    return [p.strip() for p in parts if len(p.strip()) >= MIN_SENT_LEN]
+    return split_sentences(text, MIN_SENT_LEN)
+
+
+# Tokens candidatos a palabra clave (alfanuméricos de 4+ caracteres)
+KEYWORD_RE = re.compile(r"[A-Za-zÁÉÍÓÚÜÑáéíóúüñ0-9\-]{4,}")
+
+STOPWORDS = frozenset({
+    "para", "como", "donde", "cuando", "entre", "sobre", "desde",
+    "estos", "estas", "estar", "haber", "tener", "solo", "pero",
+    "porque", "tambien", "luego", "este", "esta", "todo", "cada",
+    "puede", "pueden", "muy", "más", "menos", "aqui", "allí", "con",
+    "sin", "unos", "unas", "ellos", "ellas", "ser", "fue", "son",
+    "han", "del", "los", "las", "que", "por", "una", "ante", "bajo",
+})
 
 
 def _extract_keywords(sentence: str) -> List[str]:
@@ -202,16 +344,8 @@ def _extract_keywords(sentence: str) -> List[str]:
     Extrae "palabras clave" muy simples: tokens alfanuméricos (>3 chars)
     y elimina un conjunto pequeño de stopwords en español.
     """
-    tokens = re.findall(r"[A-Za-zÁÉÍÓÚÜÑáéíóúüñ0-9\-]{4,}", sentence)
-    stopwords = {
-        "para", "como", "donde", "cuando", "entre", "sobre", "desde",
-        "estos", "estas", "estar", "haber", "tener", "solo", "pero",
-        "porque", "tambien", "luego", "este", "esta", "todo", "cada",
-        "puede", "pueden", "muy", "más", "menos", "aqui", "allí", "con",
-        "sin", "unos", "unas", "ellos", "ellas", "ser", "fue", "son",
-        "han", "del", "los", "las", "que", "por", "una", "ante", "bajo",
-    }
-    result = [t for t in tokens if t.lower() not in stopwords]
+    tokens = KEYWORD_RE.findall(sentence)
+    result = [t for t in tokens if t.lower() not in STOPWORDS]
     return result[:8]
 
 
@@ -270,7 +404,8 @@ def _generate_questions_local(text: str, count: int) -> Dict[str, Any]:
     Generador local de preguntas (sin IA externa).
     Usa cloze cuando puede y rellena con Verdadero/Falso si faltan preguntas.
     """
-    fingerprint = _make_fingerprint(text)
+    # Determinista: el mismo texto da las mismas preguntas
+    fingerprint = _make_fingerprint(text, count, LOCAL_VERSION)
     rnd = random.Random(fingerprint)
 
     sentences = _split_sentences(text)
@@ -304,6 +439,22 @@ def _generate_questions_local(text: str, count: int) -> Dict[str, Any]:
 #  API pública
 # =============================================================================
 
+def text_budget(count: int = 5) -> TextBudget:
+    """
+    Cuánto texto necesita generate_questions para `count` preguntas.
+    Los extractores lo usan para dejar de leer páginas/tramos de más.
+    """
+    if openai_client.available:
+        # Con OpenAI se envían como mucho min(OPENAI_MAX_CHUNKS, count) trozos
+        # de OPENAI_MAX_CHARS (de sobra también para el generador local si
+        # hubiera que hacer fallback).
+        return TextBudget(max_chars=OPENAI_MAX_CHARS * max(1, min(OPENAI_MAX_CHUNKS, count)))
+    return TextBudget(
+        min_sentences=count * LOCAL_SENTENCES_PER_QUESTION,
+        min_sent_len=MIN_SENT_LEN,
+    )
+
+
 async def generate_questions(text: str, count: int = 5) -> Dict[str, Any]:
     """
     Genera preguntas de examen a partir de un texto.
@@ -312,17 +463,14 @@ async def generate_questions(text: str, count: int = 5) -> Dict[str, Any]:
       un modelo de OpenAI para obtener preguntas más coherentes.
     - En caso contrario, utiliza el generador local.
     """
-    use_openai = bool(OPENAI_API_KEY and OpenAI is not None)
-
-    if use_openai:
+    if openai_client.available:
         try:
             return await _generate_questions_openai(text, count)
         except Exception as exc:
-            # Si algo falla con OpenAI, hacemos fallback silencioso al local
-            # (pero registramos el error en logs si hace falta).
-            # Aquí no imprimimos para no ensuciar la salida de tests.
-            # Podrías usar logging.error(...) si tienes logging configurado.
-            pass
+            # Los errores transitorios ya se reintentaron en openai_client;
+            # si aun así falla, se usa el generador local y queda en el log
+            # (y en /health → openai.last_error).
+            logger.warning("OpenAI no disponible, se usa el generador local: %s", exc)
 
     # Fallback local
     return _generate_questions_local(text, count)
@@ -0,0 +1,152 @@
+# backend_eval/services/schema_registry.py
+"""
+Registro de capacidades del esquema (qué tablas y columnas opcionales existen).
+
+Varios routers se adaptan a tablas que pueden no existir todavía
+(exam_attempt, exam_answer, course_certificate, ...). En vez de lanzar un
+`to_regclass` por tabla en cada request, el registro se carga una vez en el
+arranque con una sola consulta y se reutiliza.
+
+Se refresca:
+  - automáticamente cuando pasa EVAL_SCHEMA_TTL segundos (por defecto 300),
+  - o a mano con POST /admin/schema/refresh (tras aplicar migraciones).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional
+
+import asyncpg
+
+from db import acquire
+
+SCHEMA_TTL = float(os.getenv("EVAL_SCHEMA_TTL", "300"))
+
+# Tablas que consultan los routers; se sondean todas juntas
+KNOWN_TABLES = (
+    "user_account",
+    "course",
+    "content_item",
+    "exam_attempt",
+    "exam_answer",
+    "course_certificate",
+    "course_rating",
+    "enrollment",
+    "course_enrollment",
+    "question_set_cache",
+    "admin_stats_snapshot",
+    "course_rating_stats",
+)
+
+# Columnas añadidas por migraciones de backend_eval ("tabla.columna")
+KNOWN_COLUMNS = (
+    "quiz.fingerprint",
+)
+
+
+class SchemaRegistry:
+    def __init__(
+        self,
+        tables: Iterable[str] = KNOWN_TABLES,
+        ttl: float = SCHEMA_TTL,
+        columns: Iterable[str] = KNOWN_COLUMNS,
+    ):
+        self.ttl = ttl
+        self._tables: Dict[str, bool] = {t: False for t in tables}
+        self._columns: Dict[str, bool] = {c: False for c in columns}
+        self._loaded_at: Optional[float] = None
+        self._loaded_wall: Optional[datetime] = None
+        self._lock = asyncio.Lock()
+        self.refreshes = 0
+
+    @property
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or (time.monotonic() - self._loaded_at) > self.ttl
+
+    async def refresh(
+        self,
+        conn: Optional[asyncpg.Connection] = None,
+        *,
+        force: bool = True,
+    ) -> Dict[str, bool]:
+        """
+        Vuelve a sondear todas las tablas y columnas conocidas en una sola consulta.
+        Con force=False no hace nada si otro request ya lo refrescó.
+        """
+        async with self._lock:
+            if not force and not self.is_stale:
+                return dict(self._tables)
+            names = list(self._tables)
+            columns = list(self._columns)
+            query = """
+                SELECT t AS name, to_regclass('public.' || t) IS NOT NULL AS present
+                FROM unnest($1::text[]) AS t
+                UNION ALL
+                SELECT c, EXISTS (
+                  SELECT 1 FROM information_schema.columns
+                  WHERE table_schema = 'public'
+                    AND table_name = split_part(c, '.', 1)
+                    AND column_name = split_part(c, '.', 2)
+                )
+                FROM unnest($2::text[]) AS c
+            """
+            if conn is not None:
+                rows = await conn.fetch(query, names, columns)
+            else:
+                async with acquire() as c:
+                    rows = await c.fetch(query, names, columns)
+            found = {r["name"]: bool(r["present"]) for r in rows}
+            self._tables = {t: found.get(t, False) for t in names}
+            self._columns = {c: found.get(c, False) for c in columns}
+            self._loaded_at = time.monotonic()
+            self._loaded_wall = datetime.now(timezone.utc)
+            self.refreshes += 1
+            return dict(self._tables)
+
+    async def table_exists(
+        self,
+        table_name: str,
+        conn: Optional[asyncpg.Connection] = None,
+    ) -> bool:
+        """
+        True si la tabla existe en public. Solo toca la BD si el registro
+        está vencido o si la tabla no estaba en la lista conocida.
+        """
+        if table_name not in self._tables:
+            self._tables[table_name] = False
+            await self.refresh(conn)
+        elif self.is_stale:
+            await self.refresh(conn, force=False)
+        return self._tables.get(table_name, False)
+
+    async def column_exists(
+        self,
+        table_name: str,
+        column_name: str,
+        conn: Optional[asyncpg.Connection] = None,
+    ) -> bool:
+        """Como table_exists, para una columna que añade una migración."""
+        key = f"{table_name}.{column_name}"
+        if key not in self._columns:
+            self._columns[key] = False
+            await self.refresh(conn)
+        elif self.is_stale:
+            await self.refresh(conn, force=False)
+        return self._columns.get(key, False)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "tables": dict(self._tables),
+            "columns": dict(self._columns),
+            "loaded_at": self._loaded_wall.isoformat() if self._loaded_wall else None,
+            "ttl_sec": self.ttl,
+            "refreshes": self.refreshes,
+        }
+
+
+# Instancia compartida por los routers del proceso
+schema_registry = SchemaRegistry()
@@ -0,0 +1,64 @@
+# backend_eval/services/text_budget.py
+"""
+Presupuesto de texto para la generación de preguntas.
+
+El generador no necesita el documento entero: OpenAI solo recibe los
+primeros caracteres del texto y el generador local solo necesita unas
+cuantas frases utilizables. `quiz_generator.text_budget(count)` declara
+cuánto texto basta y los extractores (PDF, transcripción por tramos) dejan
+de leer páginas o tramos en cuanto lo tienen.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+_SENTENCE_END = re.compile(r"(?<=[\.\?\!])\s+")
+
+
+def split_sentences(text: str, min_len: int) -> List[str]:
+    """Frases separadas por puntuación básica, descartando las cortas."""
+    parts = _SENTENCE_END.split(text.strip())
+    return [p.strip() for p in parts if len(p.strip()) >= min_len]
+
+
+@dataclass(frozen=True)
+class TextBudget:
+    """Basta con `max_chars` caracteres o con `min_sentences` frases de `min_sent_len`."""
+
+    max_chars: Optional[int] = None
+    min_sentences: Optional[int] = None
+    min_sent_len: int = 0
+
+    @property
+    def tag(self) -> str:
+        """Identificador estable para las claves de caché."""
+        return f"b{self.max_chars or 0}s{self.min_sentences or 0}x{self.min_sent_len}"
+
+    def tracker(self) -> "BudgetTracker":
+        return BudgetTracker(self)
+
+
+class BudgetTracker:
+    """Acumula el texto leído y dice cuándo se cumplió el presupuesto."""
+
+    def __init__(self, budget: TextBudget):
+        self.budget = budget
+        self.chars = 0
+        self.sentences = 0
+
+    def feed(self, chunk: str) -> bool:
+        self.chars += len(chunk)
+        if self.budget.min_sentences:
+            self.sentences += len(split_sentences(chunk, self.budget.min_sent_len))
+        return self.done
+
+    @property
+    def done(self) -> bool:
+        b = self.budget
+        return bool(
+            (b.max_chars and self.chars >= b.max_chars)
+            or (b.min_sentences and self.sentences >= b.min_sentences)
+        )
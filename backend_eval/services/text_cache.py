@@ -0,0 +1,167 @@
+# backend_eval/services/text_cache.py
+"""
+Caché de texto extraído direccionada por contenido.
+
+La clave es el SHA-256 de los bytes del archivo fuente (video o documento)
+más el tipo de extracción y su versión (modelo de Whisper, lector de PDF,
+...). Así:
+  - el mismo archivo subido en dos cursos se procesa una sola vez,
+  - un archivo editado cambia de hash y nunca devuelve texto viejo,
+  - cambiar de modelo/lector invalida solo lo suyo.
+
+Las entradas viven en disco bajo TRANSCRIPTS_DIR/by-hash/<aa>/<sha>.<tipo>.<versión>.txt
+(EVAL_TEXT_CACHE_DIR para otra carpeta). Dentro del proceso, dos peticiones
+con la misma clave comparten una sola extracción (single-flight), y el
+SHA-256 de cada archivo se recuerda mientras no cambie su stat (tamaño,
+mtime, inodo): un acierto no vuelve a leer el archivo entero.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+from services.video_transcriber import TRANSCRIPTS_DIR
+
+TEXT_CACHE_DIR = os.getenv("EVAL_TEXT_CACHE_DIR", os.path.join(TRANSCRIPTS_DIR, "by-hash"))
+
+_CHUNK = 1024 * 1024
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+Key = Tuple[str, str, str]  # (sha256, tipo, versión)
+
+
+# Hashes ya calculados por (ruta, tamaño, mtime, inodo, dispositivo): un
+# video de varios GB solo se vuelve a leer si cambia su stat.
+_DIGEST_MEMO_MAX = 4096
+_digest_memo: "OrderedDict[Tuple[str, int, int, int, int], str]" = OrderedDict()
+_digest_lock = threading.Lock()
+
+
+def _stat_key(path: str) -> Tuple[str, int, int, int, int]:
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_size, st.st_mtime_ns, st.st_ino, st.st_dev)
+
+
+def file_sha256(path: str) -> str:
+    key = _stat_key(path)
+    with _digest_lock:
+        digest = _digest_memo.get(key)
+        if digest is not None:
+            _digest_memo.move_to_end(key)
+            return digest
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_CHUNK), b""):
+            h.update(block)
+    digest = h.hexdigest()
+
+    # Si el archivo cambió mientras se leía, el hash no se recuerda
+    if _stat_key(path) == key:
+        with _digest_lock:
+            _digest_memo[key] = digest
+            _digest_memo.move_to_end(key)
+            while len(_digest_memo) > _DIGEST_MEMO_MAX:
+                _digest_memo.popitem(last=False)
+    return digest
+
+
+def _entry_path(key: Key) -> str:
+    digest, kind, version = key
+    name = f"{digest}.{_UNSAFE.sub('_', kind)}.{_UNSAFE.sub('_', version)}.txt"
+    return os.path.join(TEXT_CACHE_DIR, digest[:2], name)
+
+
+def _read_entry(key: Key) -> Optional[str]:
+    path = _entry_path(key)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _write_entry(key: Key, text: str) -> None:
+    path = _entry_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)  # atómico: nunca se lee una entrada a medias
+
+
+class TextCache:
+    def __init__(self):
+        self._inflight: Dict[Key, "asyncio.Future[str]"] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_create(
+        self,
+        path: str,
+        *,
+        kind: str,
+        version: str,
+        create: Callable[[str], Awaitable[str]],
+        also_accept: Sequence[str] = (),
+    ) -> str:
+        """
+        Texto de `path` para (kind, version). Si no está en disco llama a
+        `create(sha256)` una sola vez, aunque lleguen varias peticiones a la vez.
+        Los errores no se guardan: el siguiente intento vuelve a extraer.
+
+        `also_accept` son otras versiones cuyo texto también sirve (p. ej. el
+        texto completo cuando se pide solo un presupuesto).
+        """
+        digest = await asyncio.to_thread(file_sha256, path)
+        key: Key = (digest, kind, version)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.hits += 1
+            return await asyncio.shield(inflight)
+
+        # Se registra antes de mirar el disco: quien llegue después espera a este
+        fut: "asyncio.Future[str]" = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            text = await asyncio.to_thread(_read_entry, key)
+            for other in also_accept:
+                if text is not None:
+                    break
+                text = await asyncio.to_thread(_read_entry, (digest, kind, other))
+            if text is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                text = await create(digest)
+                await asyncio.to_thread(_write_entry, key, text)
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # marcado como recuperado si nadie más esperaba
+            raise
+        else:
+            fut.set_result(text)
+            return text
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "dir": TEXT_CACHE_DIR,
+            "hits": self.hits,
+            "misses": self.misses,
+            "inflight": len(self._inflight),
+        }
+
+
+# Instancia compartida (transcripciones de video y texto de documentos)
+text_cache = TextCache()
@@ -0,0 +1,405 @@
+# backend_eval/services/transcription_pool.py
+"""
+Pool de procesos dedicado a la transcripción de videos.
+
+Whisper es CPU-bound y tarda minutos: ejecutarlo dentro de un `async def`
+congela todo el event loop. Aquí se ejecuta en procesos aparte y el API
+solo espera el resultado con `await`.
+
+- Cada proceso carga el modelo una sola vez al arrancar (initializer), así
+  el primer video no paga la carga y el proceso del API no crece 1–2 GB.
+- La cola es acotada: como mucho `workers + queue_max` trabajos aceptados
+  a la vez. Si está llena, `reserve()` lanza TranscriptionQueueFull y el
+  router responde 503 (backpressure) en vez de acumular trabajo.
+- Los videos largos se transcriben por tramos: el audio se extrae una vez,
+  se corta en silencios (services/audio_segments) y los tramos se reparten
+  entre todos los workers. El texto se une en orden y, a medida que terminan
+  los tramos, el prefijo ya transcrito se guarda en
+  TRANSCRIPTS_DIR/<content_id>.partial.txt (ver video_transcriber), ligado
+  al SHA-256 del video por el manifiesto de tramos. Sin
+  ffmpeg o con EVAL_TRANSCRIBE_SEGMENT_SEC=0 se transcribe el archivo entero.
+- El resultado se guarda en services/text_cache por SHA-256 del video +
+  modelo + idioma: el mismo archivo (aunque esté en otro curso) se
+  transcribe una sola vez y un archivo editado nunca sirve texto viejo.
+- `stats()` expone profundidad de cola y duración de cada transcripción.
+
+Configuración por entorno:
+  - EVAL_TRANSCRIBE_WORKERS    procesos de transcripción (por defecto 1;
+                               0 = usar un hilo, útil en desarrollo/pruebas)
+  - EVAL_TRANSCRIBE_QUEUE_MAX  trabajos en espera además de los que corren (por defecto 8)
+  - EVAL_TRANSCRIBER           "whisper" (por defecto) o "stub" (sin modelo ni red)
+  - EVAL_WHISPER_MODEL         modelo a precargar (ver video_transcriber)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import statistics
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from services import audio_segments, video_transcriber
+from services.text_budget import TextBudget
+from services.text_cache import text_cache
+
+TRANSCRIBE_WORKERS = int(os.getenv("EVAL_TRANSCRIBE_WORKERS", "1"))
+TRANSCRIBE_QUEUE_MAX = int(os.getenv("EVAL_TRANSCRIBE_QUEUE_MAX", "8"))
+TRANSCRIBER = os.getenv("EVAL_TRANSCRIBER", "whisper").lower()
+
+TranscribeFn = Callable[..., str]
+ProgressFn = Callable[[Dict[str, Any]], None]
+
+
+class TranscriptionQueueFull(Exception):
+    """La cola de transcripción está llena; reintentar más tarde."""
+
+
+def resolve_transcriber(name: str = TRANSCRIBER) -> TranscribeFn:
+    if name == "stub":
+        return video_transcriber.stub_transcribe
+    return video_transcriber.transcribe_video_if_needed
+
+
+def resolve_segment_transcriber(name: str = TRANSCRIBER) -> TranscribeFn:
+    if name == "stub":
+        return video_transcriber.stub_transcribe_segment
+    return video_transcriber.transcribe_segment
+
+
+def _init_worker(transcriber_name: str) -> None:
+    """Se ejecuta una vez en cada proceso del pool: precarga el modelo."""
+    if transcriber_name != "stub":
+        video_transcriber._get_model()
+
+
+def _ping() -> int:
+    """Tarea vacía para forzar el arranque de los procesos."""
+    return os.getpid()
+
+
+class Reservation:
+    """Un lugar en la cola; se libera una sola vez."""
+
+    def __init__(self, pool: "TranscriptionPool"):
+        self._pool = pool
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._pool._reserved -= 1
+
+
+class TranscriptionPool:
+    """
+    Ejecuta `transcribe_fn(content_id=..., video_path=..., ...)` fuera del
+    event loop. `transcribe_fn` debe ser una función de módulo (picklable)
+    cuando workers > 0.
+    """
+
+    def __init__(
+        self,
+        *,
+        workers: int = TRANSCRIBE_WORKERS,
+        queue_max: int = TRANSCRIBE_QUEUE_MAX,
+        transcribe_fn: Optional[TranscribeFn] = None,
+        segment_fn: Optional[TranscribeFn] = None,
+        segment_sec: float = audio_segments.SEGMENT_SEC,
+        transcriber_name: str = TRANSCRIBER,
+    ):
+        self.workers = workers
+        self.queue_max = queue_max
+        self.segment_sec = segment_sec
+        self.transcriber_name = transcriber_name
+        self.transcribe_fn: TranscribeFn = transcribe_fn or resolve_transcriber(transcriber_name)
+        self.segment_fn: TranscribeFn = segment_fn or resolve_segment_transcriber(transcriber_name)
+        self._executor: Optional[Executor] = None
+        self._slots = asyncio.Semaphore(max(1, workers))
+        self._reserved = 0
+        self._running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.segments_done = 0
+        self._durations: Deque[float] = deque(maxlen=100)
+
+    @property
+    def capacity(self) -> int:
+        return max(1, self.workers) + self.queue_max
+
+    def start(self) -> None:
+        """Arranca los procesos y precarga el modelo en cada uno."""
+        if self.workers > 0 and self._executor is None:
+            # spawn: los hijos no heredan el event loop ni las conexiones del padre
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.transcriber_name,),
+            )
+            # Los procesos se crean bajo demanda: una tarea vacía por worker
+            # los levanta ya (y con ellos la carga del modelo).
+            for _ in range(self.workers):
+                self._executor.submit(_ping)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def is_full(self) -> bool:
+        return self._reserved >= self.capacity
+
+    def reserve(self) -> Reservation:
+        """
+        Toma un lugar en la cola en el momento de aceptar el trabajo.
+        Lanza TranscriptionQueueFull si no hay sitio.
+        """
+        if self.is_full():
+            self.rejected += 1
+            raise TranscriptionQueueFull(
+                f"Cola de transcripción llena ({self.capacity} trabajos)."
+            )
+        self._reserved += 1
+        return Reservation(self)
+
+    async def transcribe(
+        self,
+        *,
+        content_id: str,
+        video_path: str,
+        video_uri: Optional[str] = None,
+        language: str = "es",
+        reservation: Optional[Reservation] = None,
+        on_progress: Optional[ProgressFn] = None,
+        budget: Optional[TextBudget] = None,
+    ) -> str:
+        """
+        Texto del video. Con `budget` (quiz_generator.text_budget) los tramos
+        se transcriben en orden y se para en cuanto hay texto suficiente; el
+        transcript completo, si ya existe en caché, también sirve.
+        """
+        if reservation is None:
+            reservation = self.reserve()
+        version = self.version(language)
+        try:
+            return await text_cache.get_or_create(
+                video_path,
+                kind="transcript",
+                version=f"{version}-{budget.tag}" if budget else version,
+                also_accept=[version] if budget else [],
+                create=lambda digest: self._transcribe_uncached(
+                    content_id=content_id,
+                    video_path=video_path,
+                    video_uri=video_uri,
+                    language=language,
+                    source_digest=digest,
+                    on_progress=on_progress,
+                    budget=budget,
+                ),
+            )
+        finally:
+            reservation.release()
+
+    def version(self, language: str) -> str:
+        """Versión del transcriptor para la clave de text_cache."""
+        if self.transcriber_name == "stub":
+            return f"stub-{language}"
+        return f"whisper-{video_transcriber.WHISPER_MODEL}-{language}"
+
+    async def _transcribe_uncached(
+        self,
+        *,
+        content_id: str,
+        video_path: str,
+        video_uri: Optional[str],
+        language: str,
+        source_digest: str,
+        on_progress: Optional[ProgressFn],
+        budget: Optional[TextBudget],
+    ) -> str:
+        async with self._slots:
+            self._running += 1
+            t0 = time.perf_counter()
+            try:
+                if self.segment_sec > 0 and audio_segments.ffmpeg_available():
+                    text = await self._transcribe_segmented(
+                        content_id=content_id,
+                        video_path=video_path,
+                        language=language,
+                        source_digest=source_digest,
+                        on_progress=on_progress,
+                        budget=budget,
+                    )
+                else:
+                    # Archivo entero de una vez: aquí el presupuesto no aplica
+                    text = await self._call(partial(
+                        self.transcribe_fn,
+                        content_id=content_id,
+                        video_path=video_path,
+                        video_uri=video_uri,
+                        language=language,
+                        reuse_existing=False,  # la caché por hash ya se consultó
+                    ))
+            except Exception:
+                self.failed += 1
+                raise
+            else:
+                self.completed += 1
+                return text
+            finally:
+                self._durations.append(time.perf_counter() - t0)
+                self._running -= 1
+
+    async def _call(self, call: Callable[[], str]) -> str:
+        if self.workers <= 0:
+            return await asyncio.to_thread(call)
+        self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, call)
+
+    async def _transcribe_segmented(
+        self,
+        *,
+        content_id: str,
+        video_path: str,
+        language: str,
+        source_digest: str,
+        on_progress: Optional[ProgressFn],
+        budget: Optional[TextBudget],
+    ) -> str:
+        vt = video_transcriber
+
+        # 1) Audio + plan de tramos (se reutilizan si quedó un trabajo a medias
+        #    del mismo archivo). Lo de otro archivo (el video del contenido se
+        #    reemplazó) se borra, parcial incluido, antes de empezar.
+        wav_path = os.path.join(vt.work_dir(content_id), "audio.wav")
+        manifest = await asyncio.to_thread(vt.load_segment_manifest, content_id)
+        if (
+            manifest.get("source_sha256") != source_digest
+            or manifest.get("language") != language
+            or not manifest.get("segments")
+            or not os.path.exists(wav_path)
+        ):
+            await asyncio.to_thread(vt.discard_segmented_work, content_id)
+            await asyncio.to_thread(audio_segments.extract_audio, video_path, wav_path)
+            silences = await asyncio.to_thread(audio_segments.detect_silences, wav_path)
+            plan = audio_segments.plan_segments(
+                audio_segments.wav_duration(wav_path), silences, target=self.segment_sec
+            )
+            manifest = {
+                "source_sha256": source_digest,
+                "language": language,
+                "segments": [{"start": a, "end": b, "text": None} for a, b in plan],
+            }
+            await asyncio.to_thread(vt.save_segment_manifest, content_id, manifest)
+        segments: List[Dict[str, Any]] = manifest["segments"]
+
+        # 2) Tramos pendientes, en orden. Sin presupuesto van todos a la vez
+        #    y el executor los reparte; con presupuesto solo unos pocos por
+        #    delante, y se para en cuanto el prefijo ya transcrito alcanza.
+        tracker = budget.tracker() if budget else None
+        n_prefix = 0
+
+        def advance_prefix() -> bool:
+            nonlocal n_prefix
+            while n_prefix < len(segments) and segments[n_prefix]["text"] is not None:
+                if tracker is not None:
+                    tracker.feed(segments[n_prefix]["text"])
+                n_prefix += 1
+            return tracker is not None and tracker.done
+
+        todo = iter([i for i, seg in enumerate(segments) if seg["text"] is None])
+        window = max(1, self.workers) + 1 if tracker is not None else len(segments)
+        pending: Dict["asyncio.Future[str]", int] = {}
+        stopped_early = advance_prefix()
+        try:
+            while not stopped_early:
+                while len(pending) < window:
+                    i = next(todo, None)
+                    if i is None:
+                        break
+                    seg = segments[i]
+                    pending[asyncio.ensure_future(self._call(partial(
+                        self.segment_fn,
+                        wav_path=wav_path,
+                        start=seg["start"],
+                        end=seg["end"],
+                        language=language,
+                    )))] = i
+                if not pending:
+                    break
+                finished, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for fut in finished:
+                    segments[pending.pop(fut)]["text"] = fut.result()
+                    self.segments_done += 1
+                stopped_early = advance_prefix()
+                progress = await asyncio.to_thread(
+                    self._persist_progress, content_id, manifest
+                )
+                if on_progress is not None:
+                    on_progress(progress)
+        finally:
+            for fut in pending:
+                fut.cancel()
+
+        # 3) Unir en orden. Si se paró por presupuesto, el manifiesto queda
+        #    para que una petición posterior continúe desde ahí.
+        if stopped_early and n_prefix < len(segments):
+            return " ".join(seg["text"] for seg in segments[:n_prefix] if seg["text"])
+        text = " ".join(seg["text"] for seg in segments if seg["text"])
+        await asyncio.to_thread(vt.finish_segmented_transcript, content_id, text)
+        return text
+
+    @staticmethod
+    def _persist_progress(content_id: str, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        """Guarda el manifiesto y el prefijo contiguo ya transcrito."""
+        segments = manifest["segments"]
+        prefix: List[str] = []
+        for seg in segments:
+            if seg["text"] is None:
+                break
+            prefix.append(seg["text"])
+        video_transcriber.save_segment_manifest(content_id, manifest)
+        partial_text = " ".join(t for t in prefix if t)
+        video_transcriber.write_partial_transcript(content_id, partial_text)
+        return {
+            "segments_done": sum(1 for s in segments if s["text"] is not None),
+            "segments_total": len(segments),
+            "partial_sec": round(segments[len(prefix) - 1]["end"], 1) if prefix else 0.0,
+            "partial_chars": len(partial_text),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        durations = list(self._durations)
+        out: Dict[str, Any] = {
+            "transcriber": self.transcriber_name,
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "queue_depth": self._reserved - self._running,
+            "running": self._running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "segments_done": self.segments_done,
+        }
+        if durations:
+            ordered = sorted(durations)
+            out["duration_sec"] = {
+                "last": round(durations[-1], 3),
+                "avg": round(statistics.fmean(durations), 3),
+                "p95": round(ordered[int(0.95 * (len(ordered) - 1))], 3),
+                "max": round(ordered[-1], 3),
+            }
+        return out
+
+
+# Instancia compartida; main.py la arranca y la apaga en el lifespan
+transcription_pool = TranscriptionPool()
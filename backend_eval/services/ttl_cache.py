@@ -0,0 +1,124 @@
+# backend_eval/services/ttl_cache.py
+"""
+Caché en memoria genérica (LRU + TTL), con cargas concurrentes compartidas.
+
+La usan quiz_cache (quizzes por content_id), rating_cache (agregados de
+calificación por curso) y email_user_cache (email → user_id). Cada proceso
+uvicorn tiene la suya: con varios workers, el TTL acota cuánto tarda otro
+worker en ver un cambio que invalidó solo el suyo.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class TTLCache:
+    """
+    LRU acotado con expiración por TTL.
+
+    Los valores guardados se tratan como inmutables: quien los lea no debe
+    modificarlos, solo construir respuestas nuevas a partir de ellos.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Se incrementa en cada invalidación: una carga que empezó antes
+        # de invalidar no debe guardar datos viejos.
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        self._epoch += 1
+        self._inflight.pop(key, None)
+        if self._data.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self._epoch += 1
+        self._data.clear()
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Devuelve el valor en caché o lo carga con `loader`.
+        Las cargas concurrentes de la misma clave comparten una sola consulta.
+        Un resultado None (no existe) no se guarda.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        epoch = self._epoch
+        try:
+            value = await loader()
+        except Exception as exc:
+            fut.set_exception(exc)
+            # Evita el aviso "exception was never retrieved" si nadie esperaba
+            fut.exception()
+            raise
+        except BaseException:
+            fut.cancel()
+            raise
+        else:
+            if value is not None and epoch == self._epoch:
+                self.put(key, value)
+            fut.set_result(value)
+            return value
+        finally:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_sec": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
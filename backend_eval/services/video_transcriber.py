@@ -1,8 +1,13 @@
 # backend_eval/services/video_transcriber.py
+import json
 import os
-from typing import Optional
+import shutil
+from typing import TYPE_CHECKING, Any, Dict, Optional
 
-import whisper
+from services.audio_segments import read_wav_slice
+
+if TYPE_CHECKING:  # whisper solo se importa al cargar el modelo
+    import whisper
 
 # === Rutas base (igual estilo que doc_reader) ===
 
@@ -23,16 +28,21 @@ DEFAULT_VIDEOS_DIR = os.path.join(BACKEND_UPLOADS_DIR, "videos")
 VIDEOS_DIR = os.getenv("EVAL_UPLOADS_VIDEOS_DIR", DEFAULT_VIDEOS_DIR)
 
 # === Modelo Whisper local ===
-# Puedes cambiar "small" por "base", "medium" o "large" según tu máquina.
-# "small" suele ir bien para pruebas y no es tan pesado.
-_model: Optional[whisper.Whisper] = None
+# Puedes cambiar "small" por "base", "medium" o "large" según tu máquina
+# (EVAL_WHISPER_MODEL). "small" suele ir bien para pruebas y no es tan pesado.
+# El modelo vive en los procesos de services/transcription_pool, no en el API.
+WHISPER_MODEL = os.getenv("EVAL_WHISPER_MODEL", "small")
+
+_model: Optional["whisper.Whisper"] = None
 
 
-def _get_model() -> whisper.Whisper:
+def _get_model() -> "whisper.Whisper":
     global _model
     if _model is None:
+        import whisper
+
         # fp16=False para funcionar bien en CPU y en muchas GPUs de Windows.
-        _model = whisper.load_model("small")
+        _model = whisper.load_model(WHISPER_MODEL)
     return _model
 
 
@@ -76,16 +86,19 @@ def transcribe_video_if_needed(
     video_path: str,
     video_uri: Optional[str] = None,
     language: str = "es",
+    reuse_existing: bool = True,
 ) -> str:
     """
     Devuelve el texto de transcripción para un video, usando Whisper local.
 
-    1) Si ya existe un .txt para ese content_id o file_id, lo lee y devuelve.
+    1) Si ya existe un .txt para ese content_id o file_id, lo lee y devuelve
+       (salvo reuse_existing=False: el pool usa su caché por hash, ver
+       services/text_cache).
     2) Si no existe, transcribe el archivo de video con Whisper y guarda
        TRANSCRIPTS_DIR/<content_id>.txt para reutilizar en el futuro.
     """
     # 1) ¿Ya hay transcript?
-    existing = _find_existing_transcript(content_id, video_uri)
+    existing = _find_existing_transcript(content_id, video_uri) if reuse_existing else None
     if existing and os.path.exists(existing):
         return _read_text(existing)
 
@@ -112,10 +125,147 @@ def transcribe_video_if_needed(
     return text
 
 
+# === Transcripción por segmentos (ver services/transcription_pool) ===
+# Mientras se transcribe un video largo, los tramos terminados se guardan en
+#   TRANSCRIPTS_DIR/.work/<content_id>/segments.json   (para reanudar)
+#   TRANSCRIPTS_DIR/<content_id>.partial.txt           (texto contiguo desde el inicio)
+# Al terminar se escribe <content_id>.txt y se borran ambos. El manifiesto
+# guarda el SHA-256 del video: el parcial solo vale para ese mismo archivo.
+
+
+def work_dir(content_id: str) -> str:
+    return os.path.join(TRANSCRIPTS_DIR, ".work", content_id)
+
+
+def partial_transcript_path(content_id: str) -> str:
+    return os.path.join(TRANSCRIPTS_DIR, f"{content_id}.partial.txt")
+
+
+def read_partial_transcript(
+    content_id: str,
+    source_sha256: str,
+    language: str = "es",
+) -> Optional[str]:
+    """
+    Texto ya transcrito de un video en curso (los primeros minutos), o None.
+    routers/exam_from_video genera con esto si ya alcanza para el examen,
+    sin esperar a que termine el video.
+
+    Solo se devuelve si el manifiesto es del mismo archivo (`source_sha256`)
+    e idioma: si el video del contenido se reemplazó, el parcial es de otro
+    video y se ignora (el siguiente trabajo segmentado lo descarta).
+    """
+    manifest = load_segment_manifest(content_id)
+    if manifest.get("source_sha256") != source_sha256 or manifest.get("language") != language:
+        return None
+    path = partial_transcript_path(content_id)
+    return _read_text(path) if os.path.exists(path) else None
+
+
+def load_segment_manifest(content_id: str) -> Dict[str, Any]:
+    path = os.path.join(work_dir(content_id), "segments.json")
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_segment_manifest(content_id: str, manifest: Dict[str, Any]) -> None:
+    path = os.path.join(work_dir(content_id), "segments.json")
+    _write_text(path + ".tmp", json.dumps(manifest, ensure_ascii=False))
+    os.replace(path + ".tmp", path)
+
+
+def write_partial_transcript(content_id: str, text: str) -> None:
+    path = partial_transcript_path(content_id)
+    _write_text(path + ".tmp", text)
+    os.replace(path + ".tmp", path)
+
+
+def discard_segmented_work(content_id: str) -> None:
+    """Borra el parcial y los archivos de trabajo (manifiesto, audio)."""
+    path = partial_transcript_path(content_id)
+    if os.path.exists(path):
+        os.remove(path)
+    shutil.rmtree(work_dir(content_id), ignore_errors=True)
+
+
+def finish_segmented_transcript(content_id: str, text: str) -> None:
+    """Guarda el transcript final y limpia los archivos de trabajo."""
+    _write_text(os.path.join(TRANSCRIPTS_DIR, f"{content_id}.txt"), text)
+    discard_segmented_work(content_id)
+
+
+def transcribe_segment(
+    *,
+    wav_path: str,
+    start: float,
+    end: float,
+    language: str = "es",
+) -> str:
+    """Transcribe con Whisper el tramo [start, end) del WAV (corre en un worker)."""
+    import numpy as np  # dependencia de whisper
+
+    pcm = read_wav_slice(wav_path, start, end)
+    audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+    result = _get_model().transcribe(audio, language=language, fp16=False)
+    return (result.get("text", "") or "").strip()
+
+
+# Texto fijo para el transcriptor de prueba (EVAL_TRANSCRIBER=stub)
+STUB_TRANSCRIPT = (
+    "Docker empaqueta una aplicación junto con sus dependencias dentro de una imagen inmutable. "
+    "Un contenedor es una instancia en ejecución de esa imagen, aislada del resto del sistema. "
+    "Los volúmenes permiten persistir datos aunque el contenedor se elimine y se vuelva a crear. "
+    "Docker Compose describe varios servicios relacionados en un único archivo docker-compose.yml. "
+    "La instrucción CMD del Dockerfile define el comando que se ejecuta por defecto al arrancar. "
+)
+
+
+def stub_transcribe(
+    *,
+    content_id: str,
+    video_path: str,
+    video_uri: Optional[str] = None,
+    language: str = "es",
+    reuse_existing: bool = True,
+) -> str:
+    """
+    Transcriptor de prueba: mismas reglas de archivos que el real, pero sin
+    Whisper ni red. Útil en desarrollo y para probar la cola de trabajos.
+    """
+    existing = _find_existing_transcript(content_id, video_uri) if reuse_existing else None
+    if existing:
+        return _read_text(existing)
+    if not os.path.exists(video_path):
+        raise FileNotFoundError(f"Archivo de video no encontrado: {video_path}")
+    return STUB_TRANSCRIPT
+
+
+def stub_transcribe_segment(
+    *,
+    wav_path: str,
+    start: float,
+    end: float,
+    language: str = "es",
+) -> str:
+    """Tramo de prueba: comprueba que el WAV exista y devuelve texto fijo."""
+    if not os.path.exists(wav_path):
+        raise FileNotFoundError(f"Audio no encontrado: {wav_path}")
+    return f"Tramo {int(start)}-{int(end)}. " + STUB_TRANSCRIPT.strip()
+
+
 # Exportables que usan otros módulos
 __all__ = [
     "BACKEND_UPLOADS_DIR",
     "VIDEOS_DIR",
     "TRANSCRIPTS_DIR",
     "transcribe_video_if_needed",
+    "stub_transcribe",
+    "transcribe_segment",
+    "stub_transcribe_segment",
+    "read_partial_transcript",
 ]
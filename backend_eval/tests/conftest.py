@@ -0,0 +1,44 @@
+# backend_eval/tests/conftest.py
+"""
+Pruebas automáticas de las piezas con concurrencia (cola de trabajos, cola
+de transcripción, cliente de OpenAI). No necesitan BD, red, Whisper ni
+ffmpeg: usan el transcriptor de prueba y scripts/fake_openai_server.
+
+Uso (desde backend_eval/):
+    python -m pytest
+"""
+import os
+import sys
+import tempfile
+
+# Los módulos se importan como en el contenedor (services.x, routers.x)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Antes de importar nada del servicio: las rutas se leen al importar
+_TMP = tempfile.mkdtemp(prefix="eval-tests-")
+os.environ.setdefault("EVAL_APP_ROOT", _TMP)
+os.environ.setdefault("EVAL_TRANSCRIPTS_DIR", os.path.join(_TMP, "transcripts"))
+os.environ.setdefault("EVAL_TEXT_CACHE_DIR", os.path.join(_TMP, "by-hash"))
+os.environ["EVAL_TRANSCRIBER"] = "stub"
+os.environ.pop("OPENAI_API_KEY", None)
+
+import pytest  # noqa: E402
+
+from scripts.fake_openai_server import FakeState, serve  # noqa: E402
+
+
+@pytest.fixture
+def app_root() -> str:
+    return os.environ["EVAL_APP_ROOT"]
+
+
+@pytest.fixture
+def fake_openai():
+    """Servidor local que imita /v1/responses; devuelve (state, base_url)."""
+    state = FakeState(latency=0.05, fail_every=0, fail_status=503)
+    server = serve(0, state)
+    try:
+        yield state, f"http://127.0.0.1:{server.server_address[1]}/v1"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,76 @@
+# backend_eval/tests/test_admin_stats.py
+import asyncio
+from contextlib import asynccontextmanager
+
+from services import admin_stats
+
+
+class _FakeConn:
+    def __init__(self, name: str):
+        self.name = name
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+
+def test_sections_share_a_bounded_set_of_connections(monkeypatch):
+    acquired = []
+
+    @asynccontextmanager
+    async def fake_acquire():
+        conn = _FakeConn(f"pool-{len(acquired)}")
+        acquired.append(conn)
+        yield conn
+
+    monkeypatch.setattr(admin_stats, "acquire", fake_acquire)
+    monkeypatch.setattr(admin_stats, "ADMIN_STATS_CONCURRENCY", 3)
+
+    running = peak = 0
+    ran_on = {}
+
+    def section(name):
+        async def run(conn):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            ran_on[name] = conn.name
+            if name == "broken":
+                raise RuntimeError("timeout")
+            return {name: 1}
+        return run
+
+    names = ["a", "b", "c", "d", "broken", "e", "f"]
+    results = asyncio.run(admin_stats._run_sections(
+        _FakeConn("lock"), {n: section(n) for n in names}
+    ))
+
+    assert len(acquired) == 2  # la del lock + 2 del pool
+    assert peak == 3
+    assert set(results) == set(names)
+    assert isinstance(results["broken"], RuntimeError)
+    assert results["a"] == {"a": 1}
+    assert "lock" in ran_on.values()
+
+
+def test_concurrent_refreshes_share_one_run(monkeypatch):
+    st = admin_stats.AdminStatsSnapshot(interval=0)
+    calls = 0
+
+    async def fake_refresh(conn, *, max_age):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        return {"calls": calls}, None
+
+    monkeypatch.setattr(st, "_refresh", fake_refresh)
+
+    async def scenario():
+        return await asyncio.gather(*(st.refresh(_FakeConn(str(i))) for i in range(5)))
+
+    results = asyncio.run(scenario())
+    assert calls == 1
+    assert all(r == ({"calls": 1}, None) for r in results)
+    assert st._inflight is None
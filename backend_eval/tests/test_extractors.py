@@ -0,0 +1,42 @@
+# backend_eval/tests/test_extractors.py
+import os
+import stat
+import sys
+
+import pytest
+
+from services import extractors
+
+
+def _fake_antiword(tmp_path, body: str) -> str:
+    """Un 'antiword' en Python que ejecuta `body`."""
+    script = tmp_path / "antiword"
+    script.write_text(f"#!{sys.executable}\nimport sys\n{body}\n")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return str(script)
+
+
+def test_doc_lines_survive_lots_of_stderr(tmp_path, monkeypatch):
+    # Más avisos que el buffer de un pipe (64 KiB) antes de la salida
+    monkeypatch.setattr(extractors, "ANTIWORD_BIN", _fake_antiword(tmp_path, (
+        "sys.stderr.write('aviso\\n' * 200000); sys.stderr.flush()\n"
+        "print('uno'); print('dos')"
+    )))
+    assert list(extractors.iter_doc_lines(os.devnull)) == ["uno", "dos"]
+
+
+def test_doc_errors_report_stderr(tmp_path, monkeypatch):
+    monkeypatch.setattr(extractors, "ANTIWORD_BIN", _fake_antiword(tmp_path, (
+        "sys.stderr.write('no es un documento de Word'); sys.exit(1)"
+    )))
+    with pytest.raises(RuntimeError, match="no es un documento de Word"):
+        list(extractors.iter_doc_lines(os.devnull))
+
+
+def test_doc_lines_stop_early(tmp_path, monkeypatch):
+    monkeypatch.setattr(extractors, "ANTIWORD_BIN", _fake_antiword(tmp_path, (
+        "for i in range(10**7): print(i)"
+    )))
+    lines = extractors.iter_doc_lines(os.devnull)
+    assert [next(lines) for _ in range(3)] == ["0", "1", "2"]
+    lines.close()  # mata el proceso sin esperar al final
@@ -0,0 +1,102 @@
+# backend_eval/tests/test_jobs.py
+import asyncio
+
+from services.jobs import JobError, JobManager, report_progress
+
+
+def test_same_key_reuses_active_job():
+    async def scenario():
+        manager = JobManager(concurrency=2)
+        gate = asyncio.Event()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await gate.wait()
+            return {"n": calls}
+
+        first = manager.submit("video", work, key="exam-from-video:1")
+        second = manager.submit("video", work, key="exam-from-video:1")
+        other = manager.submit("video", work, key="exam-from-video:2")
+        assert second is first
+        assert other is not first
+        assert manager.find_active("exam-from-video:1") is first
+
+        gate.set()
+        await asyncio.sleep(0.01)
+        assert first.status == "done" and other.status == "done"
+        assert calls == 2
+
+        # Terminado el anterior, la misma clave lanza un trabajo nuevo
+        again = manager.submit("video", work, key="exam-from-video:1")
+        assert again is not first
+        await asyncio.sleep(0.01)
+        assert again.status == "done"
+
+    asyncio.run(scenario())
+
+
+def test_concurrency_is_bounded():
+    async def scenario():
+        manager = JobManager(concurrency=2)
+        running = peak = 0
+
+        async def work():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.02)
+            running -= 1
+            return {}
+
+        jobs = [manager.submit("video", work) for _ in range(6)]
+        await asyncio.sleep(0)
+        assert sum(j.status == "queued" for j in jobs) == 4
+        while any(j.active for j in jobs):
+            await asyncio.sleep(0.01)
+        assert peak == 2
+
+    asyncio.run(scenario())
+
+
+def test_errors_and_progress():
+    async def scenario():
+        manager = JobManager(concurrency=1)
+
+        async def fails_404():
+            report_progress(stage="transcribing", segments_done=1)
+            report_progress(segments_total=3)
+            raise JobError(404, "Video no encontrado.")
+
+        async def crashes():
+            raise RuntimeError("boom")
+
+        a = manager.submit("video", fails_404, key="k")
+        b = manager.submit("video", crashes)
+        while a.active or b.active:
+            await asyncio.sleep(0.01)
+
+        assert (a.status, a.error_code, a.error) == ("error", 404, "Video no encontrado.")
+        assert a.progress == {"stage": "transcribing", "segments_done": 1, "segments_total": 3}
+        assert (b.status, b.error_code, b.error) == ("error", 500, "boom")
+        assert manager.find_active("k") is None
+
+    asyncio.run(scenario())
+
+
+def test_finished_jobs_are_pruned():
+    async def scenario():
+        manager = JobManager(concurrency=4, keep=2)
+
+        async def work():
+            return {}
+
+        jobs = [manager.submit("video", work) for _ in range(4)]
+        await asyncio.sleep(0.01)
+        manager.submit("video", work)  # la poda corre al encolar
+        assert manager.get(jobs[0].id) is None
+        assert manager.get(jobs[1].id) is None
+        assert manager.get(jobs[3].id) is not None
+
+    asyncio.run(scenario())
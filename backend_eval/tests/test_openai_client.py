@@ -0,0 +1,167 @@
+# backend_eval/tests/test_openai_client.py
+import asyncio
+import time
+
+import openai
+import pytest
+
+from services import quiz_generator as qg
+from services.openai_client import OpenAIClient, TokenBucket
+from services.video_transcriber import STUB_TRANSCRIPT
+
+
+def _client(base_url: str, **kw) -> OpenAIClient:
+    kw = {"rps": 0, "backoff": 0.01, **kw}
+    return OpenAIClient(api_key="fake", base_url=base_url, **kw)
+
+
+def _run_with(monkeypatch, client: OpenAIClient, coro_fn):
+    """Ejecuta `coro_fn()` con `client` como cliente compartido de quiz_generator."""
+    monkeypatch.setattr(qg, "openai_client", client)
+
+    async def scenario():
+        try:
+            return await coro_fn()
+        finally:
+            await client.close()
+
+    return asyncio.run(scenario())
+
+
+async def _complete(client: OpenAIClient):
+    return await client.complete_json(
+        model="fake", system="s", user="genera EXACTAMENTE 2 preguntas"
+    )
+
+
+def test_token_bucket_spaces_requests():
+    async def scenario():
+        bucket = TokenBucket(rate=20, burst=1)
+        t0 = time.perf_counter()
+        for _ in range(5):
+            await bucket.acquire()
+        return time.perf_counter() - t0
+
+    # La primera pasa con la ráfaga; las otras 4, a 1/20 s cada una
+    assert asyncio.run(scenario()) >= 4 / 20 * 0.9
+
+
+def test_token_bucket_without_rate_never_waits():
+    async def scenario():
+        bucket = TokenBucket(rate=0, burst=1)
+        for _ in range(100):
+            await bucket.acquire()
+        return bucket.waited
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_transient_errors_are_retried(fake_openai):
+    state, base_url = fake_openai
+    state.requests, state.fail_every = 1, 2  # falla la primera, la segunda sale bien
+    client = _client(base_url, retries=3)
+
+    async def scenario():
+        try:
+            return await _complete(client)
+        finally:
+            await client.close()
+
+    data = asyncio.run(scenario())
+    assert len(data["questions"]) == 2
+    assert (client.requests, client.retried, client.failures) == (2, 1, 0)
+
+
+def test_retries_are_bounded(fake_openai):
+    state, base_url = fake_openai
+    state.fail_every = 1  # todas fallan con 503
+    client = _client(base_url, retries=2)
+
+    async def scenario():
+        try:
+            await _complete(client)
+        finally:
+            await client.close()
+
+    with pytest.raises(openai.InternalServerError):
+        asyncio.run(scenario())
+    assert (client.requests, client.retried, client.failures) == (3, 2, 1)
+
+
+def test_client_errors_are_not_retried(fake_openai):
+    state, base_url = fake_openai
+    state.fail_every, state.fail_status = 1, 400
+    client = _client(base_url, retries=3)
+
+    async def scenario():
+        try:
+            await _complete(client)
+        finally:
+            await client.close()
+
+    with pytest.raises(openai.BadRequestError):
+        asyncio.run(scenario())
+    assert (client.requests, client.retried) == (1, 0)
+
+
+def test_identical_generations_are_coalesced(fake_openai, monkeypatch):
+    state, base_url = fake_openai
+    state.latency = 0.2
+
+    results = _run_with(monkeypatch, _client(base_url), lambda: asyncio.gather(
+        *(qg.generate_questions("Texto corto de prueba para coalescer.", 5) for _ in range(10))
+    ))
+    assert state.requests == 1
+    assert all(r == results[0] for r in results)
+    assert len(results[0]["questions"]) == 5
+    assert not qg._openai_inflight
+
+
+def test_long_text_is_split_into_parallel_chunks(fake_openai, monkeypatch):
+    state, base_url = fake_openai
+    state.latency = 0.2
+    long_text = " ".join(f"Frase número {i} del documento largo de prueba." for i in range(2000))
+
+    gen = _run_with(monkeypatch, _client(base_url, concurrency=3),
+                    lambda: qg.generate_questions(long_text, 8))
+    assert state.requests == qg.OPENAI_MAX_CHUNKS
+    assert 1 < state.max_in_flight <= 3
+    assert len(gen["questions"]) == 8
+
+
+def test_rate_limit_applies_across_generations(fake_openai, monkeypatch):
+    state, base_url = fake_openai
+    state.latency = 0
+
+    async def five():
+        t0 = time.perf_counter()
+        await asyncio.gather(*(qg.generate_questions(f"Texto {i} distinto de prueba.", 3) for i in range(5)))
+        return time.perf_counter() - t0
+
+    elapsed = _run_with(monkeypatch, _client(base_url, rps=20, burst=1), five)
+    assert state.requests == 5
+    assert elapsed >= 4 / 20 * 0.9
+
+
+def test_failed_chunk_is_topped_up_with_its_own_fingerprint(fake_openai, monkeypatch):
+    state, base_url = fake_openai
+    state.fail_every, state.fail_status = 2, 400  # falla uno de los dos trozos
+    text = " ".join(f"La frase {i} explica cómo funciona el contenedor número {i}." for i in range(400))
+
+    gen = _run_with(monkeypatch, _client(base_url, retries=0),
+                    lambda: qg.generate_questions(text, 2))
+    assert state.requests == 2
+    assert len(gen["questions"]) == 2
+    assert gen["fingerprint"] == qg._make_fingerprint(text, 2, f"{qg._openai_engine()}:partial")
+
+
+def test_openai_down_falls_back_to_local(fake_openai, monkeypatch):
+    state, base_url = fake_openai
+    state.fail_every = 1
+    text = STUB_TRANSCRIPT * 3
+
+    gen = _run_with(monkeypatch, _client(base_url, retries=1),
+                    lambda: qg.generate_questions(text, 5))
+    assert state.requests == 2
+    assert len(gen["questions"]) == 5
+    assert gen == qg._generate_questions_local(text, 5)
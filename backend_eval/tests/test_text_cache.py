@@ -0,0 +1,48 @@
+# backend_eval/tests/test_text_cache.py
+import hashlib
+import os
+import uuid
+
+from services import text_cache as tc
+
+
+def _write(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_digest_is_memoized_until_the_file_changes(app_root, monkeypatch):
+    path = os.path.join(app_root, f"{uuid.uuid4().hex}.bin")
+    _write(path, b"a" * 1000)
+    expected = hashlib.sha256(b"a" * 1000).hexdigest()
+    assert tc.file_sha256(path) == expected
+
+    opened = []
+    real_open = open
+
+    def counting_open(p, *args, **kw):
+        opened.append(p)
+        return real_open(p, *args, **kw)
+
+    monkeypatch.setattr("builtins.open", counting_open)
+    assert tc.file_sha256(path) == expected
+    assert opened == []  # acierto: solo un stat
+
+    # Mismo tamaño, otro contenido y otro mtime: se vuelve a leer
+    _write(path, b"b" * 1000)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+    opened.clear()
+    assert tc.file_sha256(path) == hashlib.sha256(b"b" * 1000).hexdigest()
+    assert opened == [path]
+
+
+def test_digest_memo_is_bounded(app_root, monkeypatch):
+    monkeypatch.setattr(tc, "_DIGEST_MEMO_MAX", 2)
+    paths = []
+    for i in range(3):
+        paths.append(os.path.join(app_root, f"{uuid.uuid4().hex}.bin"))
+        _write(paths[-1], bytes([i]) * 10)
+        tc.file_sha256(paths[-1])
+    keys = [k[0] for k in tc._digest_memo]
+    assert os.path.abspath(paths[0]) not in keys
+    assert keys[-2:] == [os.path.abspath(p) for p in paths[1:]]
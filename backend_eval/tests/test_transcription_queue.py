@@ -0,0 +1,154 @@
+# backend_eval/tests/test_transcription_queue.py
+import asyncio
+import os
+import uuid
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import exam_from_video
+from services.jobs import JobManager
+from services.transcription_pool import TranscriptionPool, TranscriptionQueueFull
+from services.video_transcriber import STUB_TRANSCRIPT
+
+
+def _pool(queue_max: int = 1) -> TranscriptionPool:
+    # Un hilo, archivo entero (sin ffmpeg), transcriptor de prueba
+    return TranscriptionPool(workers=0, queue_max=queue_max, segment_sec=0, transcriber_name="stub")
+
+
+def _video(app_root: str) -> str:
+    """Un video nuevo (bytes únicos: no comparte entrada en text_cache)."""
+    folder = os.path.join(app_root, "uploads", "videos")
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{uuid.uuid4().hex}.mp4")
+    with open(path, "wb") as f:
+        f.write(os.urandom(256))
+    return path
+
+
+def test_reserve_is_bounded_and_release_idempotent():
+    pool = _pool(queue_max=1)
+    assert pool.capacity == 2
+    a = pool.reserve()
+    b = pool.reserve()
+    with pytest.raises(TranscriptionQueueFull):
+        pool.reserve()
+    assert pool.rejected == 1
+
+    a.release()
+    a.release()  # la segunda no libera otro lugar
+    c = pool.reserve()
+    with pytest.raises(TranscriptionQueueFull):
+        pool.reserve()
+    b.release()
+    c.release()
+    assert not pool.is_full()
+
+
+def test_concurrent_transcriptions_of_same_file_run_once(app_root):
+    async def scenario():
+        pool = _pool(queue_max=4)
+        path = _video(app_root)
+        calls = dict(content_id="c1", video_path=path, language="es")
+
+        texts = await asyncio.gather(*(pool.transcribe(**calls) for _ in range(3)))
+        assert texts == [STUB_TRANSCRIPT] * 3
+        assert pool.completed == 1
+
+        # Después, desde text_cache; el mismo archivo con otro content_id también
+        assert await pool.transcribe(**{**calls, "content_id": "c2"}) == STUB_TRANSCRIPT
+        assert pool.completed == 1
+        # Todas las reservas se devolvieron
+        assert pool._reserved == 0
+
+    asyncio.run(scenario())
+
+
+def test_transcribe_without_room_raises_queue_full(app_root):
+    async def scenario():
+        pool = _pool(queue_max=0)
+        held = pool.reserve()
+        with pytest.raises(TranscriptionQueueFull):
+            await pool.transcribe(content_id="c", video_path=_video(app_root))
+        held.release()
+        assert await pool.transcribe(content_id="c", video_path=_video(app_root)) == STUB_TRANSCRIPT
+
+    asyncio.run(scenario())
+
+
+class _FakeConn:
+    def __init__(self, uri: str):
+        self.uri = uri
+
+    async def fetchval(self, *args):
+        return 1
+
+    async def fetchrow(self, *args):
+        return {"uri": self.uri}
+
+
+@pytest.fixture
+def video_client(app_root, monkeypatch):
+    """POST /exam/from-video con la BD, el pool y la cola de trabajos de prueba."""
+    path = _video(app_root)
+    uri = "/" + os.path.relpath(path, app_root)
+
+    @asynccontextmanager
+    async def fake_acquire():
+        yield _FakeConn(uri)
+
+    pool = _pool(queue_max=0)
+    manager = JobManager(concurrency=1)
+    monkeypatch.setattr(exam_from_video, "acquire", fake_acquire)
+    monkeypatch.setattr(exam_from_video, "transcription_pool", pool)
+    monkeypatch.setattr(exam_from_video, "job_manager", manager)
+
+    app = FastAPI()
+    app.include_router(exam_from_video.router)
+    with TestClient(app) as client:
+        yield client, pool, manager
+
+
+def test_full_queue_answers_503_with_retry_after(video_client):
+    client, pool, _ = video_client
+    held = pool.reserve()
+
+    r = client.post(f"/exam/from-video/{uuid.uuid4()}")
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == str(exam_from_video.QUEUE_FULL_RETRY_AFTER)
+    assert pool.rejected == 1
+    held.release()
+
+
+def test_active_job_is_returned_without_reserving(video_client):
+    client, pool, manager = video_client
+    content_id = str(uuid.uuid4())
+    gate = asyncio.Event()
+
+    async def running():
+        await gate.wait()
+        return {}
+
+    held = pool.reserve()  # cola llena: solo puede salir bien si no reserva
+    job = client.portal.call(
+        lambda: _submit(manager, f"exam-from-video:{content_id}", running)
+    )
+
+    r = client.post(f"/exam/from-video/{content_id}")
+    assert r.status_code == 202
+    assert r.json()["job_id"] == job.id
+    assert pool.rejected == 0
+
+    client.portal.call(_set, gate)
+    held.release()
+
+
+async def _submit(manager: JobManager, key: str, func):
+    return manager.submit("exam-from-video", func, key=key)
+
+
+async def _set(event: asyncio.Event) -> None:
+    event.set()
@@ -0,0 +1,54 @@
+# backend_eval/tests/test_video_partial.py
+import asyncio
+import os
+import uuid
+
+from routers.exam_from_video import _partial_covering
+from services import video_transcriber as vt
+from services.text_budget import TextBudget
+from services.text_cache import file_sha256
+
+PARTIAL = vt.STUB_TRANSCRIPT * 2
+
+
+def _video(app_root: str, data: bytes) -> str:
+    path = os.path.join(app_root, f"{uuid.uuid4().hex}.mp4")
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def _leave_partial(content_id: str, video_path: str) -> None:
+    """Lo que deja una transcripción por tramos que paró por presupuesto."""
+    vt.save_segment_manifest(content_id, {
+        "source_sha256": file_sha256(video_path),
+        "language": "es",
+        "segments": [{"start": 0.0, "end": 30.0, "text": PARTIAL}, {"start": 30.0, "end": 60.0, "text": None}],
+    })
+    vt.write_partial_transcript(content_id, PARTIAL)
+
+
+def test_partial_is_only_used_for_the_same_video(app_root):
+    content_id = str(uuid.uuid4())
+    old_video = _video(app_root, os.urandom(128))
+    _leave_partial(content_id, old_video)
+    budget = TextBudget(max_chars=100)
+
+    assert asyncio.run(_partial_covering(content_id, old_video, budget)) == PARTIAL
+
+    # El contenido ahora apunta a otro archivo: el parcial viejo no sirve
+    new_video = _video(app_root, os.urandom(128))
+    assert vt.read_partial_transcript(content_id, file_sha256(new_video)) is None
+    assert asyncio.run(_partial_covering(content_id, new_video, budget)) is None
+    assert vt.read_partial_transcript(content_id, file_sha256(old_video), language="en") is None
+
+
+def test_partial_must_cover_the_budget(app_root):
+    content_id = str(uuid.uuid4())
+    video = _video(app_root, os.urandom(128))
+    _leave_partial(content_id, video)
+
+    assert asyncio.run(_partial_covering(content_id, video, TextBudget(max_chars=10 * len(PARTIAL)))) is None
+    vt.discard_segmented_work(content_id)
+    assert not os.path.exists(vt.partial_transcript_path(content_id))
+    assert asyncio.run(_partial_covering(content_id, video, TextBudget(max_chars=100))) is None
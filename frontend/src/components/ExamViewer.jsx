@@ -28,6 +28,25 @@ function getCurrentUser() {
 // Usamos la misma URL que el resto del frontend
 const API_EVAL = EVAL_API;
 
+// Sondea GET /exam/jobs/{id} hasta que el trabajo termine
+async function waitForJob(jobId, isAlive, intervalMs = 3000) {
+  while (isAlive()) {
+    const r = await fetch(
+      `${API_EVAL}/exam/jobs/${encodeURIComponent(jobId)}`
+    );
+    if (!r.ok) throw new Error(`No se pudo consultar el examen (job ${r.status})`);
+    const job = await r.json();
+    if (job.status === "done") return job.result;
+    if (job.status === "error") {
+      throw new Error(
+        `No se pudo crear el examen (video ${job.error_code || 500})`
+      );
+    }
+    await new Promise((res) => setTimeout(res, intervalMs));
+  }
+  return null;
+}
+
 export default function ExamViewer() {
   const [data, setData] = useState(null);
   const [answers, setAnswers] = useState({});
@@ -98,6 +117,9 @@ export default function ExamViewer() {
                 `No se pudo crear el examen (video ${make.status})`
               );
             }
+            // La transcripción corre en segundo plano: esperar al trabajo
+            const { job_id } = await make.json();
+            await waitForJob(job_id, () => alive);
           } else {
             // Documento: usar fileId (basename sin extensión)
             const make = await fetch(
@@ -153,7 +175,7 @@ export default function ExamViewer() {
     }
       const userId = me.id;
       
-      const r = await fetch(`${API_EVAL}/exam/submit`, {
+      const r = await fetch(`${API_EVAL}/exam/submit?details=true`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",